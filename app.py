@@ -1,33 +1,55 @@
 import os
 import sys
+import time
 import logging
-from logging.handlers import RotatingFileHandler
 from datetime import datetime
-from flask import Flask, render_template, request, send_file, jsonify, send_from_directory, abort, url_for, redirect, Response
+from flask import Flask, render_template, request, send_file, jsonify, send_from_directory, abort, url_for, redirect, Response, g, has_request_context
 from werkzeug.security import check_password_hash
 from werkzeug.utils import secure_filename
+from werkzeug.http import is_resource_modified
 from functools import wraps
-from file_manager import FileManager
-import matplotlib
-matplotlib.use('Agg')
-import pandas as pd
-import yfinance as yf
-import matplotlib.pyplot as plt
-import mplfinance as mpf
-from io import BytesIO
-import base64
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+import config
+from lazy import Lazy, LazyModule
+from logging_setup import configure_logging, RequestSummary, log_request_summary
+from instrumentation import Metrics, StageTimer, RequestProfiler
+from file_manager import FileManager, SORT_KEYS
+from file_index import FileIndex
+from chunked_upload import ChunkedUploads, UploadConflict
+from file_serving import send_ranged_file, content_disposition
+from zip_stream import stream_zip
+from thumbnails import ThumbnailCache
+from assets import AssetManifest, send_asset
+from compression import compress_response
+from single_flight import SingleFlight
+from chart_cache import ChartCache, make_key, data_version
+from chart_renderer import RenderPool, RendererBusy, RenderTimeout, render_price_chart, render_compare_chart
 from pathlib import Path
 
-# Configure logging
-log_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.log')
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        RotatingFileHandler(log_file, maxBytes=1024*1024, backupCount=5),
-        logging.StreamHandler()
-    ]
-)
+# The chart stack (pandas, NumPy) is imported on the first chart request, so file share
+# and health requests on a freshly started worker do not pay for it; matplotlib is only
+# imported by the render workers
+pd = LazyModule('pandas')
+indicator_lib = LazyModule('indicators')
+series_payload = LazyModule('series_payload')
+price_store_lib = LazyModule('price_store')
+resample_lib = LazyModule('resample')
+live_feed_lib = LazyModule('live_feed')
+CHART_MODULES = ('pandas', 'indicators', 'series_payload', 'resample', 'price_store', 'live_feed', 'market_data',
+                 'dataset_store')
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+# Configure logging; file I/O happens on a background thread
+configure_logging(
+    config.LOG_FILE,
+    level=config.LOG_LEVEL,
+    max_bytes=config.LOG_MAX_BYTES,
+    backup_count=config.LOG_BACKUPS)
+LOG_SAMPLE_RATE = config.LOG_SAMPLE_RATE
+LOG_SLOW_MS = config.LOG_SLOW_MS
+PROFILING_ENABLED = config.PROFILING_ENABLED
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
@@ -35,8 +57,8 @@ app = Flask(__name__)
 app.config['APPLICATION_ROOT'] = '/D8TAVu'
 
 # Initialize FileManager with the user files directory
-USER_FILES_PATH = "C:/Users/a-gon/OneDrive/Documents"
-VIRTUAL_DIR_URL = "/D8TAVu/share"
+USER_FILES_PATH = config.USER_FILES_PATH
+VIRTUAL_DIR_URL = config.VIRTUAL_DIR_URL
 try:
     # Ensure the directory exists
     if not os.path.exists(USER_FILES_PATH):
@@ -50,6 +72,114 @@ except Exception as e:
     logger.error(f"Error initializing FileManager: {str(e)}", exc_info=True)
     raise
 
+CACHE_DIR = config.CACHE_DIR
+
+def _create_price_store():
+    from market_data import MarketDataClient
+    # One pooled, rate-limited client for the whole process; every fetch goes through it
+    source = MarketDataClient(
+        config.MARKET_DATA_URL,
+        rate=config.UPSTREAM_RATE,
+        burst=config.UPSTREAM_BURST,
+        max_concurrency=config.UPSTREAM_CONCURRENCY,
+        retries=config.UPSTREAM_RETRIES,
+        timeout=config.UPSTREAM_TIMEOUT,
+        cooldown=config.UPSTREAM_COOLDOWN)
+    return price_store_lib.PriceStore(os.path.join(CACHE_DIR, 'price-history.db'), source,
+                                      tail_ttl=config.TAIL_TTL)
+
+def _create_dataset_store():
+    from dataset_store import DatasetStore
+    return DatasetStore(file_manager, config.DATASET_DIR)
+
+def _create_indicator_engine():
+    return indicator_lib.IndicatorEngine(max_entries=config.INDICATOR_CACHE)
+
+def _create_live_hub():
+    if config.LIVE_FEED == 'replay':
+        source = live_feed_lib.ReplayFeed(speed=config.LIVE_REPLAY_SPEED)
+    elif config.LIVE_FEED.startswith('replay:'):
+        source = live_feed_lib.ReplayFeed.from_dir(config.LIVE_FEED[len('replay:'):], speed=config.LIVE_REPLAY_SPEED)
+    else:
+        # Live polls share the price store's rate-limited upstream client
+        source = price_store.source
+    return live_feed_lib.LiveHub(
+        source,
+        max_subscribers=config.LIVE_MAX_SUBSCRIBERS,
+        max_bars=config.LIVE_MAX_BARS,
+        settle=config.LIVE_SETTLE)
+
+# Initialize the local price-history cache in front of the market data API
+price_store = Lazy(_create_price_store, 'price store')
+
+# CSV/Parquet files in the share can be charted in place of a ticker; CSVs are
+# converted once per version to memory-mapped column files
+dataset_store = Lazy(_create_dataset_store, 'dataset store')
+
+# Background index of the share tree for name search and recursive folder sizes;
+# the refresh thread starts with the first share request
+file_index = FileIndex(
+    USER_FILES_PATH,
+    os.path.join(CACHE_DIR, 'file-index.db'),
+    interval=config.INDEX_INTERVAL)
+
+# Resumable chunked uploads; per-upload state survives restarts
+chunked_uploads = ChunkedUploads(
+    file_manager,
+    os.path.join(CACHE_DIR, 'uploads'),
+    ttl_seconds=config.UPLOAD_TTL_HOURS * 3600)
+
+# Grid-view previews, rendered on demand and cached on disk by path, mtime and size
+thumbnails = ThumbnailCache(config.THUMBNAIL_DIR, workers=config.THUMBNAIL_WORKERS)
+
+# Bounded pool for fetching several tickers at once (compare endpoint)
+COMPARE_MAX_TICKERS = 50
+fetch_executor = ThreadPoolExecutor(
+    max_workers=config.FETCH_WORKERS,
+    thread_name_prefix='fetch')
+
+# Charts are rendered in a pool of pre-warmed worker processes
+render_pool = RenderPool(
+    workers=config.RENDER_WORKERS,
+    max_queue=config.RENDER_QUEUE,
+    timeout=config.RENDER_TIMEOUT)
+
+# Indicator checkpoints let appended bars update indicators without a full recompute
+indicator_engine = Lazy(_create_indicator_engine, 'indicator engine')
+
+# Live intraday streams: one upstream poller per ticker and interval, fanned out to all viewers
+live_hub = Lazy(_create_live_hub, 'live hub')
+
+# Concurrent identical fetches and renders wait on one in-flight computation
+fetch_flight = SingleFlight('fetch')
+render_flight = SingleFlight('render')
+
+# Rendered charts are cached in memory, and on disk when D8TAVU_CHART_CACHE_DIR is set
+chart_cache = ChartCache(
+    max_bytes=config.CHART_CACHE_MB * 1024 * 1024,
+    disk_dir=config.CHART_CACHE_DIR)
+
+# Latency histograms and counters exposed on /D8TAVu/metrics
+metrics = Metrics()
+
+# Content-hashed front-end bundles built by build_assets.py
+assets = AssetManifest(config.STATIC_DIR, '/D8TAVu/assets', dev=config.DEV_ASSETS)
+app.jinja_env.globals['assets'] = assets
+
+def preload_chart_stack():
+    """
+    Import the chart modules now rather than on the first chart request. Only modules are
+    imported (no threads, connections or pools), so this is safe before a pre-fork server forks.
+    """
+    for module in (pd, indicator_lib, series_payload, resample_lib, price_store_lib, live_feed_lib):
+        module.load()
+    for name in CHART_MODULES:
+        __import__(name)
+    logger.info('Chart stack preloaded')
+
+if config.PRELOAD_CHART_STACK:
+    preload_chart_stack()
+
 # Add error handling middleware
 @app.errorhandler(Exception)
 def handle_exception(e):
@@ -61,10 +191,73 @@ def handle_exception(e):
     }), 500
 
 @app.before_request
-def log_request():
-    """Log incoming request details"""
-    logger.info(f"Received {request.method} request to {request.path}")
-    logger.debug(f"Request headers: {dict(request.headers)}")
+def start_request_summary():
+    """Start collecting the one-line summary logged for this request"""
+    g.summary = RequestSummary(request.method, request.path)
+    g.timer = StageTimer(metrics)
+    if PROFILING_ENABLED and (request.args.get('_profile') or request.headers.get('X-Profile')):
+        g.profiler = RequestProfiler()
+    logger.debug('Request headers: %s', request.headers)
+
+def note(**fields):
+    """Add fields to the current request's summary line, if there is one"""
+    summary = g.get('summary') if has_request_context() else None
+    if summary is not None:
+        summary.add(**fields)
+
+def stage(name):
+    """Time a block as a named stage of the current request (no-op outside a request)"""
+    timer = g.get('timer') if has_request_context() else None
+    return timer.stage(name) if timer is not None else nullcontext()
+
+def record_stages(timings):
+    """Record stage timings measured elsewhere (e.g. in a render worker) on the current request"""
+    timer = g.get('timer') if has_request_context() else None
+    if timer is not None:
+        for name, duration_ms in timings.items():
+            timer.record(name, duration_ms)
+
+@app.after_request
+def log_request(response):
+    """Emit Server-Timing, update metrics and log one summary line per request"""
+    summary = g.get('summary')
+    timer = g.get('timer')
+    if summary is not None:
+        summary.finish(response.status_code)
+        if timer is not None:
+            response.headers['Server-Timing'] = ', '.join(
+                filter(None, [timer.server_timing(), f'total;dur={summary.duration_ms:.1f}']))
+            summary.add(**{f'{name}_ms': duration for name, duration in timer.stages})
+        metrics.observe(f'request_{request.endpoint or "unmatched"}', summary.duration_ms)
+        log_request_summary(logger, summary, LOG_SAMPLE_RATE, LOG_SLOW_MS)
+    metrics.inc(f'responses_{response.status_code // 100}xx')
+    if response.content_length:
+        metrics.inc('bytes_served', response.content_length)
+
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        logger.info('Profile for %s %s:\n%s', request.method, request.path, profiler.stop())
+    return response
+
+# Registered after log_request so it runs first, and the summary counts compressed bytes
+@app.after_request
+def compress_text_response(response):
+    """Compress JSON and HTML responses with brotli or gzip, as the client accepts"""
+    if request.method == 'HEAD':
+        return response
+    with stage('compress'):
+        return compress_response(
+            response,
+            request.accept_encodings,
+            min_bytes=config.COMPRESS_MIN_BYTES,
+            brotli_quality=config.BROTLI_QUALITY,
+            gzip_level=config.GZIP_LEVEL)
+
+@app.before_request
+def start_cache_warmer():
+    """Start the warmer's scheduler with the first request, after a pre-fork server has forked"""
+    if cache_warmer is not None:
+        cache_warmer.start()
 
 @app.before_request
 def check_share_access():
@@ -83,11 +276,18 @@ def check_share_access():
                 'error': 'Share directory is not available'
             }), 500
 
+@app.route('/D8TAVu/assets/<path:filename>')
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """Front-end scripts; built bundles are precompressed and cached immutably"""
+    return send_asset(config.STATIC_DIR, filename, request.accept_encodings)
+
 # Add static file serving for the share directory
 @app.route('/D8TAVu/share/static/<path:filename>')
 def serve_static(filename):
     try:
-        return send_from_directory(USER_FILES_PATH, filename, as_attachment=True)
+        file_path, mime_type = file_manager.get_file(filename)
+        return send_ranged_file(str(file_path), mime_type, as_attachment=True)
     except Exception as e:
         logger.error(f"Error serving static file: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 404
@@ -119,133 +319,466 @@ def authenticate():
 @app.route('/')
 def home():
     """Home page - Stock Data Visualization"""
-    logger.info('Accessing home page')
     # Always redirect to /D8TAVu/ to maintain consistency
     if request.path == '/':
         return redirect('/D8TAVu/')
-    return render_template('index.html')
+    return render_template('index.html', live_enabled=live_supported())
 
 @app.route('/D8TAVu/health')
 @app.route('/health')
 def health():
     """Health check endpoint"""
-    logger.info('Health check endpoint accessed')
-    return {'status': 'healthy'}, 200
+    return {
+        'status': 'healthy',
+        'coalescing': {'fetch': fetch_flight.stats(), 'render': render_flight.stats()}
+    }, 200
+
+@app.route('/D8TAVu/metrics')
+@app.route('/metrics')
+@requires_auth
+def get_metrics():
+    """Latency histograms, counters and cache statistics (JSON, or ?format=prometheus)"""
+    components = {
+        'chart_cache': chart_cache.stats(),
+        # Components of the chart stack are reported once a chart request has loaded them
+        'price_store': price_store.stats() if price_store.loaded else {},
+        'datasets': dataset_store.stats() if dataset_store.loaded else {},
+        'fetch_flight': fetch_flight.stats(),
+        'render_flight': render_flight.stats(),
+        'indicators': {'incremental_updates': indicator_engine.incremental_updates,
+                       'full_computations': indicator_engine.full_computations} if indicator_engine.loaded else {},
+        'live': live_hub.stats() if live_hub.loaded else {},
+        'file_index': file_index.stats(),
+        'thumbnails': thumbnails.stats(),
+    }
+    if request.args.get('format') == 'prometheus':
+        gauges = {f'{component}_{name}': value
+                  for component, values in components.items() for name, value in values.items()
+                  if isinstance(value, (int, float))}
+        return Response(metrics.prometheus(gauges=gauges), mimetype='text/plain; version=0.0.4')
+    return jsonify(dict(metrics.snapshot(), **components))
+
+@app.route('/D8TAVu/warmer/status')
+@app.route('/warmer/status')
+@requires_auth
+def get_warmer_status():
+    """Cache warmer schedule, last run and per-ticker freshness"""
+    if cache_warmer is None:
+        return jsonify({'error': 'Cache warmer is not configured'}), 404
+    return jsonify(cache_warmer.status())
+
+CHART_FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+    'webp': 'image/webp',
+}
+
+def _parse_bool(value):
+    """Parse a boolean from JSON (bool) or a query string ('true', '1', ...)"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+def _parse_int(values, name, default):
+    """An integer option, or ValueError naming the option"""
+    try:
+        return int(values.get(name, default))
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid {name} option: must be a whole number')
+
+def _parse_common_params(values):
+    """Parse the date range and image options shared by single and comparison charts"""
+    start_date = values.get('startDate')
+    end_date = values.get('endDate')
+
+    # Input validation
+    if not all([start_date, end_date]):
+        raise ValueError('Missing required parameters')
+
+    try:
+        # Parse dates in YYYY-MM-DD format
+        start_date = pd.to_datetime(start_date)
+        end_date = pd.to_datetime(end_date)
+    except ValueError:
+        raise ValueError('Invalid date format. Use YYYY-MM-DD')
+
+    fmt = str(values.get('format', 'png')).lower()
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f'Unsupported chart format: {fmt}')
+
+    return {
+        'startDate': start_date.date().isoformat(),
+        'endDate': end_date.date().isoformat(),
+        'width': _clamp(_parse_int(values, 'width', 1200), 200, 4000),
+        'height': _clamp(_parse_int(values, 'height', 800), 150, 4000),
+        'dpi': _clamp(_parse_int(values, 'dpi', 100), 50, 300),
+        'format': fmt,
+    }
+
+def parse_chart_params(values):
+    """
+    Normalize chart parameters from a JSON body or query string
+    :param values: Mapping with ticker, startDate, endDate and optional chart options
+    :return: Dict of normalized parameters, also used as the chart cache key
+    """
+    # A share file can be charted instead of a ticker; it is labelled with its file name
+    source = (values.get('source') or '').strip().strip('/') or None
+    ticker = values.get('ticker') or (source and Path(source).stem)
+    if not ticker:
+        raise ValueError('Missing required parameters')
+
+    show_ma = _parse_bool(values.get('showMA', False))
+    params = {
+        'ticker': ticker.strip().upper(),
+        'source': source,
+        'plotType': values.get('plotType', 'line'),
+        'showMA': show_ma,
+        'maPeriod': _parse_int(values, 'maPeriod', 20) if show_ma else None,
+        'showVolume': _parse_bool(values.get('showVolume', False)),
+    }
+    # The legacy showMA/maPeriod options are a simple moving average indicator
+    indicators = indicator_lib.parse_indicators(values.get('indicators'))
+    if show_ma:
+        indicators = indicator_lib.parse_indicators([f"sma:{params['maPeriod']}"] + [i.key for i in indicators])
+    params['indicators'] = ','.join(i.key for i in indicators) or None
+    params.update(_parse_common_params(values))
+    # 'auto' is resolved here so chart URLs and cache keys name a concrete interval
+    interval = resample_lib.parse_interval(values.get('interval'))
+    if interval == resample_lib.AUTO:
+        interval = resample_lib.choose_interval(params['startDate'], params['endDate'])
+    params['interval'] = interval
+    return params
+
+def parse_compare_params(values):
+    """
+    Normalize comparison chart parameters from a JSON body or query string
+    :param values: Mapping with tickers (list or comma-separated string), startDate and endDate
+    :return: Dict of normalized parameters, with tickers as a comma-separated string
+    """
+    tickers = values.get('tickers') or []
+    if isinstance(tickers, str):
+        tickers = tickers.split(',')
+    # Normalize and de-duplicate while keeping the requested order
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+    if not tickers:
+        raise ValueError('Missing required parameters')
+    if len(tickers) > COMPARE_MAX_TICKERS:
+        raise ValueError(f'At most {COMPARE_MAX_TICKERS} tickers can be compared at once')
+
+    params = {'tickers': ','.join(tickers)}
+    params.update(_parse_common_params(values))
+    return params
+
+# Downsampling keeps at least the first, last and one interior point
+MAX_POINTS_RANGE = (3, 100000)
+
+def parse_downsample_params(values):
+    """
+    Parse the downsampling options of a columnar payload
+    :return: (maxPoints, or None to send every bar; downsampling method)
+    """
+    try:
+        max_points = int(values['maxPoints']) if values.get('maxPoints') else None
+    except (TypeError, ValueError):
+        raise ValueError('Invalid maxPoints option')
+    low, high = MAX_POINTS_RANGE
+    if max_points is not None and not low <= max_points <= high:
+        raise ValueError(f'maxPoints must be between {low} and {high}')
+    downsample = values.get('downsample', 'lttb')
+    if downsample not in series_payload.DOWNSAMPLE_METHODS:
+        raise ValueError('Invalid downsample option')
+    return max_points, downsample
+
+def chart_url(params, path='/D8TAVu/stock-chart'):
+    """URL of a binary chart endpoint for a set of normalized chart parameters"""
+    query = {k: v for k, v in params.items() if v is not None}
+    return f'{path}?' + urlencode(query)
+
+def fetch_histories(tickers, start_date, end_date):
+    """
+    Fetch price history for several tickers concurrently through the bounded fetch pool
+    :return: ({ticker: DataFrame}, {ticker: error message}) in the requested ticker order
+    """
+    futures = {
+        ticker: fetch_executor.submit(load_history, ticker, start_date, end_date)
+        for ticker in tickers
+    }
+    histories, errors = {}, {}
+    unavailable = None
+    # Pool threads have no request context, so the whole fan-out is timed here
+    with stage('fetch'):
+        for ticker, future in futures.items():
+            try:
+                hist = future.result()
+            except price_store_lib.UpstreamUnavailable as e:
+                logger.warning(f'Market data unavailable for {ticker}: {e}')
+                errors[ticker] = str(e)
+                unavailable = e
+                continue
+            except Exception as e:
+                logger.error(f'Error fetching stock data for {ticker}: {str(e)}', exc_info=True)
+                errors[ticker] = str(e)
+                continue
+            if hist.empty:
+                errors[ticker] = 'No data found for the specified stock and date range'
+            else:
+                histories[ticker] = hist
+    # Nothing to show because upstream is down: let the caller answer 503 rather than 404
+    if not histories and unavailable is not None:
+        raise unavailable
+    return histories, errors
+
+def load_history(ticker, start_date, end_date, source=None, interval='daily'):
+    """
+    Get price history; concurrent identical requests share one fetch
+    :param source: Optional share path of a CSV/Parquet dataset to read instead of the ticker
+    :param interval: Bar interval; coarser bars come from the price store's stored rollups
+    """
+    if source:
+        key = ('dataset', source, str(start_date), str(end_date), interval)
+        with stage('fetch'):
+            return fetch_flight.do(key, dataset_store.get_history, source, start_date, end_date, interval)
+    key = (ticker.strip().upper(), str(start_date), str(end_date), interval)
+    with stage('fetch'):
+        return fetch_flight.do(key, price_store.get_history, ticker, start_date, end_date, interval)
+
+def history_scope(params):
+    """Indicator checkpoint scope: datasets must not share checkpoints with a ticker of the same name"""
+    scope = f"dataset:{params['source']}" if params['source'] else params['ticker']
+    return scope if params['interval'] == 'daily' else f"{scope}@{params['interval']}"
+
+def source_authorized(params):
+    """Charting a share file exposes its contents, so it needs the share credentials"""
+    if not params.get('source'):
+        return True
+    auth = request.authorization
+    return bool(auth and check_auth(auth.username, auth.password))
+
+def render_cached(cache_key, fn, *args):
+    """
+    Render a chart through the chart cache; concurrent identical renders share one job
+    :param cache_key: Chart cache key
+    :param fn: Function producing the chart's render arguments and render function
+    """
+    timings = {}
+
+    def render():
+        # A render that finished just before we joined may already have filled the cache
+        image_bytes = chart_cache.get(cache_key)
+        if image_bytes is None:
+            render_fn, render_args = fn(*args)
+            image_bytes = render_pool.render(render_fn, *render_args, timings=timings)
+            chart_cache.put(cache_key, image_bytes)
+        return image_bytes
+    with stage('render'):
+        image_bytes = render_flight.do(cache_key, render)
+    # Only the request that ran the job gets the worker's draw/savefig breakdown
+    record_stages(timings)
+    return image_bytes
+
+def get_chart(hist, params):
+    """
+    Return rendered chart bytes and their cache key, rendering only on a cache miss
+    :param hist: Price history to chart
+    :param params: Normalized chart parameters from parse_chart_params
+    :return: (image bytes, cache key)
+    """
+    # Serve identical requests from the chart cache without touching pyplot
+    with stage('cache_key'):
+        cache_key = make_key(params, data_version(hist))
+    image_bytes = chart_cache.get(cache_key)
+    if image_bytes is None:
+        note(chart_cache='miss')
+        metrics.inc('chart_cache_misses')
+
+        def prepare():
+            with stage('indicators'):
+                indicators = indicator_lib.parse_indicators(params['indicators'])
+                enriched = indicator_engine.apply(history_scope(params), hist, indicators)
+            return render_price_chart, (enriched, params)
+        image_bytes = render_cached(cache_key, prepare)
+    else:
+        note(chart_cache='hit')
+        metrics.inc('chart_cache_hits')
+    return image_bytes, cache_key
+
+def get_compare_chart(histories, params):
+    """Return comparison chart bytes and their cache key, rendering only on a cache miss"""
+    with stage('cache_key'):
+        version = '-'.join(data_version(hist) for hist in histories.values())
+        cache_key = make_key(params, version)
+    image_bytes = chart_cache.get(cache_key)
+    if image_bytes is None:
+        note(chart_cache='miss')
+        metrics.inc('chart_cache_misses')
+        image_bytes = render_cached(cache_key, lambda: (render_compare_chart, (histories, params)))
+    else:
+        note(chart_cache='hit')
+        metrics.inc('chart_cache_hits')
+    return image_bytes, cache_key
+
+def warm_ticker(ticker, requests):
+    """
+    Cache warmer callback: refresh a ticker's history and pre-render its preset charts
+    :param requests: /stock-data request bodies, one per preset
+    :return: Last daily bar, charts rendered and whether upstream was unavailable
+    """
+    charts, last_bar, stale = 0, None, False
+    # Longest range first, so one upstream fetch fills the history the other presets need
+    for values in sorted(requests, key=lambda v: v['startDate']):
+        params = parse_chart_params(values)
+        hist = load_history(params['ticker'], params['startDate'], params['endDate'], params['source'],
+                            params['interval'])
+        if hist.empty:
+            raise ValueError('No data found for the specified stock and date range')
+        stale = stale or bool(hist.attrs.get('stale'))
+        if params['interval'] == 'daily':
+            last_bar = max(last_bar or '', hist.index[-1].date().isoformat())
+        for attempt in range(3):
+            try:
+                get_chart(hist, params)
+                break
+            except RendererBusy as e:
+                # Interactive requests come first; back off while the render queue is full
+                if attempt == 2:
+                    raise
+                time.sleep(e.retry_after)
+        charts += 1
+    return {'last_bar': last_bar, 'charts': charts, 'stale': stale}
+
+# Refreshes a watchlist's history and pre-renders its standard charts after each refresh window
+cache_warmer = None
+if config.WARMER_CONFIG:
+    from cache_warmer import CacheWarmer, WarmerConfig
+    cache_warmer = CacheWarmer(WarmerConfig.load(config.WARMER_CONFIG), warm_ticker,
+                               os.path.join(CACHE_DIR, 'warmer'))
+
+def renderer_unavailable(e):
+    """Response for a render job that was rejected (503) or timed out (504)"""
+    if isinstance(e, RendererBusy):
+        logger.warning('Chart renderer saturated; rejecting request')
+        response = jsonify({'error': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    return jsonify({'error': str(e)}), 504
+
+def upstream_unavailable(e):
+    """Response for a fetch that failed because market data is unavailable and nothing is cached"""
+    metrics.inc('upstream_unavailable')
+    response = jsonify({'error': str(e)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def image_response(image_bytes, cache_key, params, stale=False):
+    """
+    Wrap chart bytes in a cacheable, conditional response
+    :param stale: The chart was drawn from cached bars because upstream was unavailable
+    """
+    response = Response(image_bytes, mimetype=CHART_FORMATS[params['format']])
+    response.set_etag(cache_key)
+    if params.get('source'):
+        # Charts of share files must not be stored by shared caches
+        response.cache_control.private = True
+    else:
+        response.cache_control.public = True
+    # Closed date ranges do not change; ranges reaching today pick up new bars
+    if stale:
+        # Let clients come back for fresh bars soon after upstream recovers
+        response.headers['X-Data-Stale'] = '1'
+        response.cache_control.max_age = 30
+    elif pd.Timestamp(params['endDate']).date() < datetime.now().date():
+        response.cache_control.max_age = 86400
+    else:
+        response.cache_control.max_age = 60
+    return response.make_conditional(request)
 
 @app.route('/D8TAVu/stock-data', methods=['POST'])
 @app.route('/stock-data', methods=['POST'])
 def get_stock_data():
-    logger.info('Stock data endpoint accessed')
     try:
         data = request.get_json()
-        logger.debug(f'Received data: {data}')
-        
-        # Extract parameters
-        ticker = data.get('ticker')
-        start_date = data.get('startDate')
-        end_date = data.get('endDate')
-        plot_type = data.get('plotType', 'line')
-        show_ma = data.get('showMA', False)
-        show_volume = data.get('showVolume', False)
-        ma_period = int(data.get('maPeriod', 20))
-
-        # Input validation
-        if not all([ticker, start_date, end_date]):
-            logger.error('Missing required parameters')
-            return jsonify({'error': 'Missing required parameters'}), 400
-
-        # Convert dates to datetime objects
+        logger.debug('Received data: %s', data)
+
         try:
-            # Parse dates in YYYY-MM-DD format
-            start_date = pd.to_datetime(start_date)
-            end_date = pd.to_datetime(end_date)
+            params = parse_chart_params(data)
+            max_points, downsample = parse_downsample_params(data)
         except ValueError as e:
-            logger.error(f'Invalid date format: {e}')
-            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
+            logger.error(f'Invalid stock data request: {e}')
+            return jsonify({'error': str(e)}), 400
+
+        if not source_authorized(params):
+            return authenticate()
+
+        ticker = params['ticker']
+        show_ma = params['showMA']
+        show_volume = params['showVolume']
+
+        # Payload options: 'records' keeps the per-date dict, 'columnar' sends parallel arrays
+        data_format = data.get('dataFormat', 'records')
+        if data_format not in ('records', 'columnar'):
+            logger.error(f'Invalid data format option: {data_format}')
+            return jsonify({'error': 'Invalid dataFormat option'}), 400
 
         # Get stock data
-        logger.info(f'Fetching stock data for {ticker} from {start_date} to {end_date}')
+        note(ticker=ticker)
         try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(start=start_date, end=end_date)
+            hist = load_history(ticker, params['startDate'], params['endDate'], params['source'], params['interval'])
             
             if hist.empty:
                 logger.warning(f'No data found for {ticker}')
                 return jsonify({'error': 'No data found for the specified stock and date range'}), 404
+            stale = bool(hist.attrs.get('stale'))
 
-            # Convert DataFrame to dictionary with date strings as keys
-            hist_dict = hist.to_dict('index')
-            formatted_data = {
-                k.strftime('%Y-%m-%d'): {
-                    'Close': float(v['Close']),
-                    'Volume': int(v['Volume']) if show_volume else None,
-                    'MA': float(v['MA']) if show_ma and 'MA' in v else None
-                }
-                for k, v in hist_dict.items()
-            }
-
-            # Calculate moving average if requested
-            if show_ma:
-                hist['MA'] = hist['Close'].rolling(window=ma_period).mean()
-
-            # Create plot based on type
-            logger.info(f'Creating {plot_type} plot')
-            
-            if plot_type in ['candlestick', 'ohlc']:
-                # Use mplfinance for candlestick/OHLC charts
-                fig, axes = mpf.plot(
-                    hist,
-                    type='candle' if plot_type == 'candlestick' else 'ohlc',
-                    volume=show_volume,
-                    style='yahoo',
-                    title=f'{ticker} Stock Price',
-                    ylabel='Price ($)',
-                    ylabel_lower='Volume' if show_volume else '',
-                    returnfig=True
-                )
-                
-                # Add moving average if requested
-                if show_ma:
-                    ax = axes[0]
-                    ax.plot(hist.index, hist['MA'], label=f'{ma_period}-day MA', color='red')
-                    ax.legend()
-            
-            else:  # Line plot
-                fig, ax1 = plt.subplots(figsize=(12, 8))
-                
-                # Plot price
-                ax1.plot(hist.index, hist['Close'], label='Close Price', color='blue')
-                
-                if show_ma:
-                    ax1.plot(hist.index, hist['MA'], label=f'{ma_period}-day MA', color='red')
-                
-                ax1.set_title(f'{ticker} Stock Price')
-                ax1.set_xlabel('Date')
-                ax1.set_ylabel('Price ($)')
-                ax1.grid(True)
-                ax1.legend()
-                
-                # Add volume subplot if requested
-                if show_volume:
-                    ax2 = ax1.twinx()
-                    ax2.bar(hist.index, hist['Volume'], alpha=0.3, color='gray')
-                    ax2.set_ylabel('Volume')
-                    
-                plt.tight_layout()
-
-            # Save plot to base64 string
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.getvalue()).decode()
-            plt.close()
-
-            logger.info('Successfully generated plot')
-            return jsonify({
-                'plot': image_base64,
-                'data': formatted_data
-            })
+            # Calculate requested indicators, incrementally when only new bars were appended
+            indicators = indicator_lib.parse_indicators(params['indicators'])
+            with stage('indicators'):
+                hist = indicator_engine.apply(history_scope(params), hist, indicators)
+            indicator_columns = {col: key for i in indicators for col, key in i.outputs().items()}
+            ma_column = indicator_lib.SMA(params['maPeriod']).label if show_ma else None
+
+            with stage('format'):
+                if data_format == 'columnar':
+                    # Parallel arrays, optionally downsampled to what the chart can show
+                    formatted_data = series_payload.to_columnar(
+                        hist,
+                        columns=['Open', 'High', 'Low', 'Close'] + (['Volume'] if show_volume else []),
+                        extra=dict(indicator_columns, **({ma_column: 'ma'} if show_ma else {})),
+                        max_points=max_points,
+                        method=downsample)
+                else:
+                    # Convert DataFrame to dictionary with date strings as keys
+                    hist_dict = hist.to_dict('index')
+                    formatted_data = {
+                        k.strftime('%Y-%m-%d'): {
+                            'Close': float(v['Close']),
+                            'Volume': int(v['Volume']) if show_volume else None,
+                            'MA': float(v[ma_column]) if show_ma and pd.notna(v[ma_column]) else None,
+                            **{key: float(v[col]) if pd.notna(v[col]) else None
+                               for col, key in indicator_columns.items()}
+                        }
+                        for k, v in hist_dict.items()
+                    }
 
+            # The chart itself is fetched separately from the binary chart endpoint
+            with stage('encode'):
+                return jsonify({
+                    'chart_url': chart_url(params),
+                    'interval': params['interval'],
+                    'data': formatted_data,
+                    'stale': stale
+                })
+
+        except price_store_lib.UpstreamUnavailable as e:
+            logger.warning(f'Market data unavailable for {ticker}: {e}')
+            return upstream_unavailable(e)
+        except ValueError as e:
+            logger.error(f'Error fetching stock data: {str(e)}')
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             logger.error(f'Error fetching stock data: {str(e)}', exc_info=True)
             return jsonify({'error': str(e)}), 500
@@ -254,6 +787,205 @@ def get_stock_data():
         logger.error(f'Error processing request: {str(e)}', exc_info=True)
         return jsonify({'error': str(e)}), 500
 
+@app.route('/D8TAVu/stock-chart')
+@app.route('/stock-chart')
+def get_stock_chart():
+    """Serve a rendered chart as raw image bytes with ETag/Cache-Control"""
+    try:
+        params = parse_chart_params(request.args)
+    except ValueError as e:
+        logger.error(f'Invalid stock chart request: {e}')
+        return jsonify({'error': str(e)}), 400
+    if not source_authorized(params):
+        return authenticate()
+
+    try:
+        hist = load_history(params['ticker'], params['startDate'], params['endDate'], params['source'],
+                            params['interval'])
+        if hist.empty:
+            logger.warning(f"No data found for {params['ticker']}")
+            return jsonify({'error': 'No data found for the specified stock and date range'}), 404
+
+        image_bytes, cache_key = get_chart(hist, params)
+    except (RendererBusy, RenderTimeout) as e:
+        return renderer_unavailable(e)
+    except price_store_lib.UpstreamUnavailable as e:
+        logger.warning(f"Market data unavailable for {params['ticker']}: {e}")
+        return upstream_unavailable(e)
+    except ValueError as e:
+        logger.error(f'Error rendering stock chart: {str(e)}')
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f'Error rendering stock chart: {str(e)}', exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+    return image_response(image_bytes, cache_key, params, stale=bool(hist.attrs.get('stale')))
+
+@app.route('/D8TAVu/stock-data/compare', methods=['POST'])
+@app.route('/stock-data/compare', methods=['POST'])
+def compare_stocks():
+    """Fetch several tickers concurrently and return their relative performance"""
+    try:
+        data = request.get_json()
+        logger.debug('Received data: %s', data)
+
+        try:
+            params = parse_compare_params(data)
+            max_points, downsample = parse_downsample_params(data)
+        except ValueError as e:
+            logger.error(f'Invalid stock compare request: {e}')
+            return jsonify({'error': str(e)}), 400
+
+        tickers = params['tickers'].split(',')
+        try:
+            histories, errors = fetch_histories(tickers, params['startDate'], params['endDate'])
+        except price_store_lib.UpstreamUnavailable as e:
+            return upstream_unavailable(e)
+        note(tickers=len(tickers), failed=len(errors))
+        if not histories:
+            logger.warning(f'No data found for any of {tickers}')
+            return jsonify({'error': 'No data found for the specified stocks and date range',
+                            'errors': errors}), 404
+
+        series = {}
+        with stage('format'):
+            for ticker, hist in histories.items():
+                hist = hist[['Close']].assign(Performance=series_payload.relative_performance(hist['Close']))
+                series[ticker] = series_payload.to_columnar(hist, columns=['Close'], extra={'Performance': 'performance'},
+                                             max_points=max_points, method=downsample)
+
+        # Only tickers that returned data are charted
+        chart_params = dict(params, tickers=','.join(histories))
+        with stage('encode'):
+            return jsonify({
+                'chart_url': chart_url(chart_params, '/D8TAVu/stock-chart/compare'),
+                'series': series,
+                'errors': errors,
+                'stale': [ticker for ticker, hist in histories.items() if hist.attrs.get('stale')]
+            })
+
+    except Exception as e:
+        logger.error(f'Error processing compare request: {str(e)}', exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/D8TAVu/stock-chart/compare')
+@app.route('/stock-chart/compare')
+def get_compare_chart_image():
+    """Serve a relative performance chart for several tickers as raw image bytes"""
+    try:
+        params = parse_compare_params(request.args)
+    except ValueError as e:
+        logger.error(f'Invalid stock compare chart request: {e}')
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        histories, errors = fetch_histories(params['tickers'].split(','), params['startDate'], params['endDate'])
+        if not histories:
+            return jsonify({'error': 'No data found for the specified stocks and date range',
+                            'errors': errors}), 404
+        image_bytes, cache_key = get_compare_chart(histories, params)
+    except (RendererBusy, RenderTimeout) as e:
+        return renderer_unavailable(e)
+    except price_store_lib.UpstreamUnavailable as e:
+        return upstream_unavailable(e)
+    except ValueError as e:
+        logger.error(f'Error rendering compare chart: {str(e)}')
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f'Error rendering compare chart: {str(e)}', exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+    stale = any(hist.attrs.get('stale') for hist in histories.values())
+    return image_response(image_bytes, cache_key, params, stale=stale)
+
+# Browsers wait this long before reconnecting a dropped live stream
+LIVE_RETRY_MS = 5000
+
+def live_supported() -> bool:
+    """
+    Whether this server can hold live streams. Each stream occupies a thread for up to
+    LIVE_MAX_SECONDS, and the hub and its pollers live in one process, so streams need a
+    multithreaded server (gunicorn gthread). Under IIS/wfastcgi every stream would pin a
+    process and start its own pollers.
+    """
+    return config.LIVE_ENABLED and bool(request.environ.get('wsgi.multithread'))
+
+@app.route('/D8TAVu/stock-live')
+@app.route('/stock-live')
+def stream_live_bars():
+    """
+    Live intraday chart data as Server-Sent Events: a snapshot of recent bars, then each
+    newly closed bar with its incrementally updated indicator values
+    """
+    if not live_supported():
+        return jsonify({'error': 'Live charts are not available on this server'}), 501
+    try:
+        ticker = (request.args.get('ticker') or '').strip().upper()
+        if not ticker:
+            raise ValueError('Missing required parameters')
+        interval = live_feed_lib.parse_intraday_interval(request.args.get('interval'))
+        indicators = indicator_lib.parse_indicators(request.args.get('indicators'))
+        # A reconnecting EventSource sends the id of the last event it received: its last bar's time
+        since = request.headers.get('Last-Event-ID') or request.args.get('since')
+        since = int(since) if since else None
+    except ValueError as e:
+        logger.error(f'Invalid live stream request: {e}')
+        return jsonify({'error': str(e)}), 400
+
+    note(ticker=ticker, interval=interval)
+    try:
+        subscription = live_hub.subscribe(ticker, interval, indicators, since)
+    except live_feed_lib.LiveHubFull as e:
+        logger.warning('Live stream limit reached; rejecting request')
+        response = jsonify({'error': str(e)})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response
+    except price_store_lib.UpstreamUnavailable as e:
+        logger.warning(f'Market data unavailable for {ticker}: {e}')
+        return upstream_unavailable(e)
+    except Exception as e:
+        logger.error(f'Error starting live stream: {str(e)}', exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+    def events():
+        deadline = time.monotonic() + config.LIVE_MAX_SECONDS
+        try:
+            yield f'retry: {LIVE_RETRY_MS}\n\n'
+            while time.monotonic() < deadline:
+                message = subscription.next(config.LIVE_HEARTBEAT)
+                if message is None:
+                    # A client too slow to keep up is dropped; it reconnects and catches up
+                    if subscription.dropped:
+                        break
+                    # Comments keep proxies from closing an idle stream and reveal disconnected clients
+                    message = ': keepalive\n\n'
+                yield message
+        finally:
+            live_hub.unsubscribe(subscription)
+
+    response = Response(events(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Ask nginx-style proxies not to buffer the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+LISTING_PAGE_SIZE = 200
+LISTING_MAX_PAGE_SIZE = 1000
+
+def parse_listing_params(values):
+    """Normalize sort and pagination options for a directory listing"""
+    sort = values.get('sort', 'name')
+    order = values.get('order', 'asc')
+    if sort not in SORT_KEYS or order not in ('asc', 'desc'):
+        raise ValueError('Invalid sort or order option')
+    try:
+        page = max(1, int(values.get('page', 1)))
+        per_page = _clamp(int(values.get('per_page', LISTING_PAGE_SIZE)), 1, LISTING_MAX_PAGE_SIZE)
+    except ValueError:
+        raise ValueError('Invalid page or per_page option')
+    return {'sort': sort, 'order': order, 'page': page, 'per_page': per_page}
+
 @app.route('/D8TAVu/share/')
 @app.route('/D8TAVu/share/<path:subpath>')
 @app.route('/share/')
@@ -261,49 +993,86 @@ def get_stock_data():
 @requires_auth
 def browse_files(subpath=''):
     """Browse files in the share directory"""
-    logger.info(f'Accessing share directory with subpath: {subpath}')
     try:
         # Normalize subpath to handle both /D8TAVu/share and /share URLs
         if subpath.startswith('D8TAVu/share/'):
             subpath = subpath[len('D8TAVu/share/'):]
         elif subpath.startswith('share/'):
             subpath = subpath[len('share/'):]
-            
-        # Log the actual paths being used
-        logger.info(f'Normalized subpath: {subpath}')
-        logger.info(f'Root path: {file_manager.root_path}')
-        logger.info(f'Full requested path: {file_manager.root_path / subpath if subpath else file_manager.root_path}')
-        
+        logger.debug('Browsing share subpath %r under %s', subpath, file_manager.root_path)
+
         # Test directory access
         access_result = file_manager.check_access()
-        logger.info(f'Directory access check result: {access_result}')
-        
         if not access_result:
             logger.error(f"Permission denied accessing share directory: {USER_FILES_PATH}")
             return jsonify({
                 'error': 'Access to share directory is not available. Please contact administrator.'
             }), 500
 
+        try:
+            listing = parse_listing_params(request.args)
+        except ValueError as e:
+            logger.error(f'Invalid listing request: {e}')
+            return jsonify({'error': str(e)}), 400
+
+        file_index.start()
+
+        # An unchanged folder (same mtime, same page, same index) revalidates without a listing
+        with stage('stat'):
+            modified = file_manager.directory_mtime(subpath)
+        last_refresh = file_index.last_refresh
+        indexed = last_refresh.timestamp() if last_refresh else 0
+        etag = (f"{modified.timestamp()}-{indexed}-"
+                f"{listing['sort']}-{listing['order']}-{listing['page']}-{listing['per_page']}")
+        if not is_resource_modified(request.environ, etag=etag, last_modified=modified):
+            note(not_modified=True)
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
         # Try to list files
         try:
-            files = file_manager.list_directory(subpath)
-            logger.info(f'Successfully listed {len(files)} files')
+            with stage('fs'):
+                files = file_manager.list_directory(subpath, listing['sort'], listing['order'] == 'desc')
+            note(entries=len(files))
         except Exception as e:
             logger.error(f'Error listing directory: {str(e)}', exc_info=True)
             raise
 
+        total = len(files)
+        pages = max(1, -(-total // listing['per_page']))
+        page = min(listing['page'], pages)
+        offset = (page - 1) * listing['per_page']
+
         # Try to get breadcrumbs
         try:
             breadcrumbs = file_manager.get_breadcrumbs(subpath)
-            logger.info(f'Successfully generated breadcrumbs')
         except Exception as e:
             logger.error(f'Error generating breadcrumbs: {str(e)}', exc_info=True)
             raise
 
-        return render_template('file_browser.html',
-                             files=files,
-                             breadcrumbs=breadcrumbs,
-                             current_path=subpath)
+        # Recursive folder sizes come from the background index, when it has reached them
+        page_files = files[offset:offset + listing['per_page']]
+        with stage('index'):
+            folder_stats = file_index.folder_stats(f.path for f in page_files if f.is_dir)
+
+        with stage('template'):
+            html = render_template('file_browser.html',
+                                   files=page_files,
+                                   folder_stats=folder_stats,
+                                   thumbnails=thumbnails,
+                                   breadcrumbs=breadcrumbs,
+                                   current_path=subpath,
+                                   total=total,
+                                   pages=pages,
+                                   **dict(listing, page=page))
+        response = Response(html, mimetype='text/html')
+        response.set_etag(etag)
+        response.last_modified = modified
+        # Always revalidate: the ETag only tracks entries being added, removed or renamed
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        return response
     except ValueError as e:
         logger.error(f"ValueError browsing files: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 404
@@ -311,15 +1080,47 @@ def browse_files(subpath=''):
         logger.error(f"Unexpected error browsing files: {str(e)}", exc_info=True)
         return jsonify({'error': 'An unexpected error occurred', 'details': str(e)}), 500
 
+@app.route('/D8TAVu/share/search')
+@app.route('/share/search')
+@requires_auth
+def search_files():
+    """Search file and folder names in the share index by prefix, substring and/or extension"""
+    file_index.start()
+    try:
+        with stage('index'):
+            results = file_index.search(
+                query=request.args.get('q', ''),
+                mode=request.args.get('mode', 'substring'),
+                ext=request.args.get('ext'),
+                path=request.args.get('path', ''),
+                limit=int(request.args.get('limit', 100)))
+    except ValueError as e:
+        logger.error(f'Invalid search request: {e}')
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f'Error searching files: {str(e)}', exc_info=True)
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+    note(results=len(results))
+    last_refresh = file_index.last_refresh
+    return jsonify({
+        'results': results,
+        'indexed_at': last_refresh.isoformat(timespec='seconds') if last_refresh else None
+    })
+
 @app.route('/D8TAVu/share/download/<path:filepath>')
 @app.route('/share/download/<path:filepath>')
 @requires_auth
 def download_file(filepath):
-    logger.info(f'File download requested: {filepath}')
+    logger.debug('File download requested: %s', filepath)
     try:
         file_path, mime_type = file_manager.get_file(filepath)
         logger.debug(f'Sending file: {file_path} (type: {mime_type})')
-        return send_file(file_path, mimetype=mime_type, as_attachment=True)
+        # ?inline=1 lets browsers play media in place (seeking uses Range requests)
+        inline = _parse_bool(request.args.get('inline', False))
+        response = send_ranged_file(str(file_path), mime_type, as_attachment=not inline)
+        note(bytes=response.content_length)
+        return response
     except ValueError as e:
         logger.error(f"Error downloading file: {str(e)}", exc_info=True)
         return jsonify({'error': str(e)}), 404
@@ -327,6 +1128,58 @@ def download_file(filepath):
         logger.error(f"Unexpected error downloading file: {str(e)}", exc_info=True)
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
+@app.route('/D8TAVu/share/thumbnail/<path:filepath>')
+@app.route('/share/thumbnail/<path:filepath>')
+@requires_auth
+def get_thumbnail(filepath):
+    """
+    Thumbnail of an image, the first page of a PDF or the head of a CSV file. Links carry
+    the file's mtime and size (?v=...), so responses can be cached for a year.
+    """
+    try:
+        file_path, mime_type = file_manager.get_file(filepath)
+        with stage('thumbnail'):
+            image_bytes, content_type, key = thumbnails.get(filepath, str(file_path), os.stat(file_path), mime_type)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    except Exception as e:
+        logger.error(f"Unexpected error generating thumbnail: {str(e)}", exc_info=True)
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+    response = Response(image_bytes, mimetype=content_type)
+    response.set_etag(key)
+    response.cache_control.private = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+@app.route('/D8TAVu/share/zip/')
+@app.route('/D8TAVu/share/zip/<path:subpath>')
+@app.route('/share/zip/')
+@app.route('/share/zip/<path:subpath>')
+@requires_auth
+def download_folder(subpath=''):
+    """Download a folder as a ZIP archive generated while it is sent"""
+    try:
+        # Fails fast (404) for missing folders before any bytes are sent
+        entries = file_manager.walk(subpath)
+        next_entry = next(entries, None)
+    except ValueError as e:
+        logger.error(f"Error downloading folder: {str(e)}")
+        return jsonify({'error': str(e)}), 404
+
+    def all_entries():
+        if next_entry is not None:
+            yield next_entry
+            yield from entries
+
+    name = subpath.strip('/').rsplit('/', 1)[-1] or 'share'
+    logger.info(f'Folder download started: {subpath or "/"}')
+    response = Response(stream_zip(all_entries()), mimetype='application/zip', direct_passthrough=True)
+    response.headers['Content-Disposition'] = content_disposition(f'{name}.zip', as_attachment=True)
+    response.cache_control.no_store = True
+    return response
+
 @app.route('/D8TAVu/share/upload', methods=['POST'])
 @app.route('/share/upload', methods=['POST'])
 @requires_auth
@@ -360,6 +1213,91 @@ def upload_file():
         logger.error(f"Unexpected error uploading file: {str(e)}", exc_info=True)
         return jsonify({'error': 'An unexpected error occurred'}), 500
 
+def parse_byte_count(value, name):
+    """A non-negative whole number of bytes from a request, or ValueError naming the field"""
+    if isinstance(value, bool) or value is None or value == '':
+        raise ValueError(f'Missing {name}')
+    try:
+        count = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Invalid {name}: must be a whole number of bytes')
+    if count < 0 or (isinstance(value, float) and value != count):
+        raise ValueError(f'Invalid {name}: must be a whole number of bytes')
+    return count
+
+@app.route('/D8TAVu/share/uploads', methods=['POST'])
+@app.route('/share/uploads', methods=['POST'])
+@requires_auth
+def init_upload():
+    """Start a chunked upload: JSON {path, filename, size, sha256?} -> {upload_id, offset, chunk_size}"""
+    try:
+        data = request.get_json() or {}
+        filename = secure_filename(data.get('filename', ''))
+        if not filename:
+            return jsonify({'error': 'No file selected'}), 400
+        path = data.get('path', '')
+        upload_path = f"{path}/{filename}" if path else filename
+        status = chunked_uploads.init(upload_path, parse_byte_count(data.get('size'), 'size'), data.get('sha256'))
+        return jsonify(status), 201
+    except ValueError as e:
+        logger.error(f"Error starting upload: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Unexpected error starting upload: {str(e)}", exc_info=True)
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+@app.route('/D8TAVu/share/uploads/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+@app.route('/share/uploads/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+@requires_auth
+def upload_chunk(upload_id):
+    """
+    GET: current offset (to resume). PUT ?offset=N: append the raw request body,
+    optionally checked against an X-Chunk-SHA256 header. DELETE: abort the upload.
+    """
+    try:
+        if request.method == 'GET':
+            return jsonify(chunked_uploads.status(upload_id))
+        if request.method == 'DELETE':
+            chunked_uploads.abort(upload_id)
+            return jsonify({'message': 'Upload aborted'})
+
+        status = chunked_uploads.write_chunk(
+            upload_id,
+            parse_byte_count(request.args.get('offset'), 'offset'),
+            request.stream,
+            length=request.content_length,
+            sha256=request.headers.get('X-Chunk-SHA256'))
+        note(chunk_bytes=request.content_length)
+        return jsonify(status)
+    except KeyError:
+        return jsonify({'error': 'Unknown upload'}), 404
+    except UploadConflict as e:
+        return jsonify({'error': str(e), 'offset': e.offset}), 409
+    except ValueError as e:
+        logger.error(f"Error writing upload chunk: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Unexpected error writing upload chunk: {str(e)}", exc_info=True)
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
+@app.route('/D8TAVu/share/uploads/<upload_id>/finalize', methods=['POST'])
+@app.route('/share/uploads/<upload_id>/finalize', methods=['POST'])
+@requires_auth
+def finalize_upload(upload_id):
+    """Verify size and checksum ({sha256?}) and move the upload into place"""
+    try:
+        data = request.get_json(silent=True) or {}
+        result = chunked_uploads.finalize(upload_id, data.get('sha256'))
+        return jsonify(dict(result, message='File uploaded successfully'))
+    except KeyError:
+        return jsonify({'error': 'Unknown upload'}), 404
+    except ValueError as e:
+        logger.error(f"Error finalizing upload: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logger.error(f"Unexpected error finalizing upload: {str(e)}", exc_info=True)
+        return jsonify({'error': 'An unexpected error occurred'}), 500
+
 @app.route('/D8TAVu/share/create-directory', methods=['POST'])
 @app.route('/share/create-directory', methods=['POST'])
 @requires_auth
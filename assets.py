@@ -0,0 +1,83 @@
+import os
+import json
+import logging
+import mimetypes
+from typing import List, Optional
+
+from flask import Response, send_file, abort
+from werkzeug.datastructures import Accept
+from werkzeug.security import safe_join
+
+from compression import negotiate
+
+logger = logging.getLogger(__name__)
+
+# Front-end bundles and the JSX sources they are built from, in load order.
+# build_assets.py compiles each into static/dist/<name>.<hash>.js
+BUNDLES = {
+    'app.js': ('js/liveChart.js', 'js/stockForm.js', 'js/app.js'),
+}
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+class AssetManifest:
+    def __init__(self, static_dir: str, url_prefix: str, dev: bool = False):
+        """
+        Initialize AssetManifest
+        :param static_dir: Directory holding the static files and dist/
+        :param url_prefix: URL the static directory is served under
+        :param dev: Serve the JSX sources (compiled in the browser) even if a build exists
+        """
+        self.static_dir = static_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        self.dev = dev
+        self.bundles = {}
+        manifest_path = os.path.join(static_dir, DIST_DIR, MANIFEST)
+        if not dev and os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                self.bundles = json.load(f)
+        if self.bundles:
+            logger.info(f'AssetManifest loaded {len(self.bundles)} bundle(s) from {manifest_path}')
+        else:
+            logger.warning('No front-end build found; serving JSX sources compiled in the browser. '
+                           'Run build_assets.py for production.')
+
+    def bundle_url(self, name: str) -> Optional[str]:
+        """URL of a built bundle, or None when running from sources"""
+        built = self.bundles.get(name)
+        return f'{self.url_prefix}/{DIST_DIR}/{built}' if built else None
+
+    def source_urls(self, name: str) -> List[str]:
+        """URLs of a bundle's JSX sources, for development without a build"""
+        return [f'{self.url_prefix}/{source}' for source in BUNDLES[name]]
+
+
+def send_asset(static_dir: str, filename: str, accept_encodings: Accept) -> Response:
+    """
+    Serve a static file, preferring a precompressed .br/.gz sibling the client accepts.
+    Built files (content-hashed names under dist/) are cached by clients for a year.
+    """
+    path = safe_join(static_dir, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    hashed = filename.startswith(f'{DIST_DIR}/') and os.path.basename(filename) != MANIFEST
+
+    # Without max_age, send_file marks the response no-cache (revalidate by ETag)
+    max_age = 31536000 if hashed else None
+
+    available = tuple(coding for coding, suffix in PRECOMPRESSED if os.path.isfile(path + suffix))
+    coding = negotiate(accept_encodings, available) if available else None
+    if coding:
+        suffix = dict(PRECOMPRESSED)[coding]
+        response = send_file(path + suffix, mimetype=mimetype, conditional=True, etag=True, max_age=max_age)
+        response.headers['Content-Encoding'] = coding
+    else:
+        response = send_file(path, mimetype=mimetype, conditional=True, etag=True, max_age=max_age)
+    if available:
+        response.vary.add('Accept-Encoding')
+    if hashed:
+        response.cache_control.immutable = True
+    return response
@@ -0,0 +1,109 @@
+"""
+Download throughput and memory benchmark for file_serving.send_ranged_file.
+
+Creates a sparse file (default 8 GiB, set --size-gb above the machine's RAM to
+check that memory stays flat) and streams it through a minimal Flask app as a
+full download, as random single ranges and as multi-range requests.
+
+    python benchmarks/bench_downloads.py --size-gb 8
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask  # noqa: E402
+from file_serving import send_ranged_file  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def _consume(client, path, headers=None):
+    response = client.get(path, headers=headers or {}, buffered=False)
+    received = 0
+    for block in response.response:
+        received += len(block)
+    response.close()
+    return response.status_code, received
+
+
+def run(size_gb, ranges, range_kb):
+    app = Flask(__name__)
+    fd, path = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    size = int(size_gb * 1024 ** 3)
+    with open(path, 'wb') as f:
+        f.truncate(size)  # sparse: no disk space or page cache needed
+
+    @app.route('/file')
+    def serve():
+        return send_ranged_file(path, 'application/octet-stream')
+
+    client = app.test_client()
+    results = []
+    tracemalloc.start()
+    try:
+        started = time.perf_counter()
+        status, received = _consume(client, '/file')
+        elapsed = time.perf_counter() - started
+        assert status == 200 and received == size
+        results.append(('full download', received, elapsed))
+
+        rng = random.Random(0)
+        span = range_kb * 1024
+        received_total = 0
+        started = time.perf_counter()
+        for _ in range(ranges):
+            start = rng.randrange(0, size - span)
+            status, received = _consume(client, '/file', {'Range': f'bytes={start}-{start + span - 1}'})
+            assert status == 206 and received == span
+            received_total += received
+        results.append((f'{ranges} single ranges', received_total, time.perf_counter() - started))
+
+        received_total = 0
+        started = time.perf_counter()
+        for _ in range(ranges):
+            starts = sorted(rng.randrange(0, size - span) for _ in range(4))
+            spec = ','.join(f'{s}-{s + span - 1}' for s in starts)
+            status, received = _consume(client, '/file', {'Range': f'bytes={spec}'})
+            assert status == 206
+            received_total += received
+        results.append((f'{ranges} 4-part multi-ranges', received_total, time.perf_counter() - started))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        os.remove(path)
+
+    print(f'file size: {size / 1024 ** 3:.1f} GiB')
+    for name, received, elapsed in results:
+        print(f'{name:>28}: {received / 1024 ** 2:10.1f} MiB in {elapsed:7.2f} s '
+              f'({received / 1024 ** 2 / elapsed:8.1f} MiB/s)')
+    print(f'peak Python allocations: {peak / 1024 ** 2:.1f} MiB')
+    rss = _max_rss_mb()
+    if rss is not None:
+        print(f'max RSS: {rss:.1f} MiB')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-gb', type=float, default=8.0, help='size of the generated sparse file')
+    parser.add_argument('--ranges', type=int, default=200, help='number of range requests of each kind')
+    parser.add_argument('--range-kb', type=int, default=512, help='size of each requested range')
+    args = parser.parse_args()
+    run(args.size_gb, args.ranges, args.range_kb)
@@ -0,0 +1,126 @@
+"""
+Fan-out benchmark for live intraday streams (live_feed.LiveHub) on a replayed feed.
+
+Opens many subscriptions to a few tickers and lets the replay run for a while. It reports
+upstream polls per ticker, event sizes, and how long a closed bar takes to reach every
+subscriber. --check asserts the fan-out invariants: one poll per bar per ticker, whatever
+the number of subscribers, and no subscriber missing a bar.
+
+    python benchmarks/bench_live.py --subscribers 200 --tickers 4 --bars 20
+    python benchmarks/bench_live.py --check
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indicators import parse_indicators  # noqa: E402
+from live_feed import LiveHub, ReplayFeed  # noqa: E402
+from run_suite import percentile  # noqa: E402
+
+# Indicator sets spread over the subscribers; each distinct set is encoded once per bar
+INDICATOR_SETS = ('', 'sma:20', 'sma:20,rsi', 'ema:9,macd,vwap')
+
+
+def run(subscribers: int, tickers: int, bars: int, speed: float) -> dict:
+    feed = ReplayFeed(speed=speed)
+    origin = time.perf_counter()
+    hub = LiveHub(feed, max_subscribers=subscribers, settle=0.0, max_queue=bars + 10)
+    names = [f'LIVE{i}' for i in range(tickers)]
+
+    started = time.perf_counter()
+    subs = [hub.subscribe(names[i % tickers], '1m',
+                          parse_indicators(INDICATOR_SETS[i // tickers % len(INDICATOR_SETS)]))
+            for i in range(subscribers)]
+    subscribe_ms = (time.perf_counter() - started) * 1000
+
+    received = [[] for _ in subs]
+    stop = threading.Event()
+
+    def reader(i):
+        while not stop.is_set():
+            message = subs[i].next(0.1)
+            if message is not None:
+                received[i].append((time.perf_counter(), message))
+
+    threads = [threading.Thread(target=reader, args=(i,), daemon=True) for i in range(len(subs))]
+    for thread in threads:
+        thread.start()
+    # Each replayed minute is 60 / speed real seconds
+    time.sleep(bars * 60 / speed + 0.5)
+    # Unsubscribing stops the pollers; then whatever is still queued is drained
+    stats = hub.stats()
+    for subscription in subs:
+        hub.unsubscribe(subscription)
+    feed_minutes = (time.perf_counter() - origin) * speed / 60
+    stop.set()
+    for thread in threads:
+        thread.join()
+    for subscription, messages in zip(subs, received):
+        message = subscription.next(0)
+        while message is not None:
+            messages.append((time.perf_counter(), message))
+            message = subscription.next(0)
+
+    # Delivery spread: from the first subscriber receiving a bar to the last one
+    arrivals = {}
+    event_bytes, gaps, last_bars = [], 0, {}
+    for subscription, messages in zip(subs, received):
+        timestamps = []
+        for at, message in messages:
+            event, data = message.split('\nevent: ')[1].split('\ndata: ', 1)
+            payload = json.loads(data)
+            timestamps.extend(payload['bars']['timestamp'])
+            if event == 'bars':
+                arrivals.setdefault((payload['ticker'], timestamps[-1]), []).append(at)
+                event_bytes.append(len(message))
+        # The replayed feed has a bar every minute, so anything else is a missed or repeated bar
+        gaps += sum(1 for a, b in zip(timestamps, timestamps[1:]) if b - a != 60)
+        last_bars.setdefault(subscription.key[0], set()).add(timestamps[-1] if timestamps else None)
+    spread_ms = [(max(times) - min(times)) * 1000 for times in arrivals.values()]
+    snapshot_bytes = [len(messages[0][1]) for messages in received if messages]
+    return {
+        'subscribers': subscribers,
+        'tickers': tickers,
+        'subscribe_ms': round(subscribe_ms, 1),
+        'feed_minutes': round(feed_minutes, 1),
+        'polls': stats['polls'],
+        'events_encoded': stats['events'],
+        'dropped': stats['dropped'],
+        'bars_streamed': len(arrivals),
+        'gaps': gaps,
+        # Every subscriber of a ticker should end on the same bar
+        'last_bar_agrees': all(len(last) == 1 and None not in last for last in last_bars.values()),
+        'snapshot_bytes_p50': percentile(snapshot_bytes, 50),
+        'event_bytes_p50': percentile(event_bytes, 50),
+        'fanout_spread_ms_p50': round(percentile(spread_ms, 50), 2),
+        'fanout_spread_ms_p95': round(percentile(spread_ms, 95), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, default=200)
+    parser.add_argument('--tickers', type=int, default=4)
+    parser.add_argument('--bars', type=int, default=10, help='Bars to replay')
+    parser.add_argument('--speed', type=float, default=120, help='Replay speed (feed seconds per second)')
+    parser.add_argument('--check', action='store_true', help='Assert the fan-out invariants and exit')
+    args = parser.parse_args()
+
+    result = run(args.subscribers, args.tickers, args.bars, args.speed)
+    print(json.dumps(result, indent=2))
+    if args.check:
+        # One load plus one poll per replayed minute for each ticker, not per subscriber
+        assert result['polls'] <= args.tickers * (result['feed_minutes'] + 2), 'pollers are not shared'
+        assert result['dropped'] == 0, 'subscribers were dropped'
+        assert result['bars_streamed'] > 0 and result['gaps'] == 0 and result['last_bar_agrees'], \
+            'subscribers missed bars'
+        print('ok')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Cold-start benchmark: how long a fresh worker process takes to import the app and answer
+its first requests, and how much resident memory it holds afterwards.
+
+Each profile runs in a new interpreter against a temporary share and cache directory:
+
+    share    import app, then /health and a share listing (file-share-only worker)
+    chart    as share, then a chart data request and an in-process chart render
+    preload  import app with D8TAVU_PRELOAD=1 (what a gunicorn master pays once)
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import os
+import sys
+import json
+import argparse
+import datetime
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the measured interpreter; prints one JSON line
+CHILD = r'''
+import os, sys, time, json
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app
+imported = time.perf_counter()
+profile = {profile!r}
+client = app.app.test_client()
+auth = {{'Authorization': 'Basic YWRtaW46YWRtaW4='}}
+assert client.get('/D8TAVu/health').status_code == 200
+if profile in ('share', 'chart'):
+    assert client.get('/D8TAVu/share/', headers=auth).status_code == 200
+if profile == 'chart':
+    body = {{'source': 'prices.csv', 'startDate': '2015-01-01', 'endDate': '2020-01-01',
+            'dataFormat': 'columnar', 'maxPoints': 500, 'indicators': 'sma:20,rsi:14'}}
+    response = client.post('/D8TAVu/stock-data', json=body, headers=auth)
+    assert response.status_code == 200, response.data
+    assert client.get(response.json['chart_url'], headers=auth).status_code == 200
+ready = time.perf_counter()
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+print(json.dumps({{
+    'import_s': imported - started,
+    'ready_s': ready - started,
+    'rss_mb': rss_mb(),
+    'pandas_loaded': 'pandas' in sys.modules,
+    'matplotlib_loaded': 'matplotlib' in sys.modules,
+}}))
+app.render_pool.shutdown()
+'''
+
+
+def _make_share(path):
+    """A few folders of files and a daily-bar CSV dataset"""
+    for i in range(5):
+        folder = os.path.join(path, f'folder{i}')
+        os.makedirs(folder)
+        for j in range(50):
+            with open(os.path.join(folder, f'file{j}.txt'), 'w') as f:
+                f.write('x' * j)
+    with open(os.path.join(path, 'prices.csv'), 'w') as f:
+        f.write('Date,Open,High,Low,Close,Volume\n')
+        price = 100.0
+        for day in range(365 * 12):
+            price *= 1.0003 if day % 7 else 0.998
+            date = datetime.date(2010, 1, 1) + datetime.timedelta(days=day)
+            f.write(f'{date},{price:.2f},{price * 1.01:.2f},{price * 0.99:.2f},{price:.2f},{1000 + day}\n')
+
+
+def run_profile(profile, share, cache, runs):
+    env = dict(os.environ,
+               D8TAVU_USER_FILES=share,
+               D8TAVU_CACHE_DIR=cache,
+               D8TAVU_LOG_FILE=os.path.join(cache, 'bench.log'),
+               D8TAVU_LOG_LEVEL='WARNING',
+               D8TAVU_INDEX_INTERVAL='0',
+               # Render in the measured process so the plotting stack is counted
+               D8TAVU_RENDER_WORKERS='0')
+    env.pop('D8TAVU_PRELOAD', None)
+    if profile == 'preload':
+        env['D8TAVU_PRELOAD'] = '1'
+    results = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD.format(root=ROOT, profile=profile)],
+            env=env, cwd=cache, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes per profile')
+    parser.add_argument('--profiles', default='share,chart,preload')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as share, tempfile.TemporaryDirectory() as cache:
+        _make_share(share)
+        print(f'{"profile":<10}{"import ms":>12}{"ready ms":>12}{"RSS MiB":>10}  loaded')
+        for profile in args.profiles.split(','):
+            results = run_profile(profile, share, cache, args.runs)
+            loaded = [name for name in ('pandas', 'matplotlib') if results[-1][f'{name}_loaded']]
+            print(f'{profile:<10}'
+                  f'{statistics.median(r["import_s"] for r in results) * 1000:>12.0f}'
+                  f'{statistics.median(r["ready_s"] for r in results) * 1000:>12.0f}'
+                  f'{statistics.median(r["rss_mb"] for r in results):>10.1f}'
+                  f'  {", ".join(loaded) or "-"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,332 @@
+"""
+Offline benchmark suite for the chart and file-share hot paths.
+
+Runs the real Flask app against a temporary share and cache, with a synthetic price
+source in place of the market data API, and reports p50/p95 latency and peak Python
+memory per case:
+
+    stock_data   POST /stock-data plus the chart GET, per plot type and range length
+                 (the chart cache is cleared before every iteration)
+    listing      FileManager.list_directory (cold and cached) and the share page,
+                 for folders of 10^2..10^5 entries
+    safe_path    FileManager.get_safe_path, per call
+    transfer     chunked upload, full download and 1 MiB range requests (with MB/s)
+
+    python benchmarks/run_suite.py --output baseline.json
+    python benchmarks/run_suite.py --compare baseline.json   # exits 1 on a p50 regression
+    python benchmarks/run_suite.py --quick --only listing,safe_path
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import datetime
+import platform
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+import warnings
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+AUTH = {'Authorization': 'Basic YWRtaW46YWRtaW4='}
+MIB = 1024 * 1024
+RANGE_END = '2024-12-31'
+RANGES = {'1m': 31, '1y': 365, '5y': 5 * 365, '20y': 20 * 365}
+PLOT_TYPES = ('line', 'candlestick', 'ohlc')
+SIZES = (100, 1000, 10_000, 100_000)
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def max_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return rss / MIB if sys.platform == 'darwin' else rss / 1024
+
+
+class Suite:
+    def __init__(self, iterations: int, warmup: int = 1):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.results: Dict[str, dict] = {}
+
+    def measure(self, name: str, fn: Callable[[], object], setup: Optional[Callable[[], None]] = None,
+                ops: int = 1, iterations: Optional[int] = None, throughput: bool = False) -> dict:
+        """
+        Time fn over several iterations, then run it once more under tracemalloc
+        :param fn: The operation
+        :param setup: Run before every call, outside the timed region
+        :param ops: Operations per call; latencies are reported per operation
+        :param throughput: fn returns the bytes it transferred; report MB/s
+        """
+        iterations = iterations or self.iterations
+        for _ in range(self.warmup):
+            if setup:
+                setup()
+            fn()
+        latencies, transferred = [], 0
+        for _ in range(iterations):
+            if setup:
+                setup()
+            started = time.perf_counter()
+            nbytes = fn()
+            elapsed = time.perf_counter() - started
+            latencies.append(elapsed / ops)
+            if throughput:
+                transferred += nbytes
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            fn()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        result = {
+            'iterations': iterations,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'mean_ms': statistics.fmean(latencies) * 1000,
+            'peak_kib': peak / 1024,
+        }
+        if throughput:
+            result['mb_per_s'] = transferred / MIB / (sum(latencies) * ops)
+        self.results[name] = result
+        rate = f"{result['mb_per_s']:>9.1f} MB/s" if throughput else ''
+        print(f"{name:<44}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}{result['peak_kib']:>12.0f}{rate}",
+              flush=True)
+        return result
+
+
+def bench_stock_data(suite, client, app, ranges, plot_types):
+    for range_name in ranges:
+        start = (datetime.date.fromisoformat(RANGE_END) - datetime.timedelta(days=RANGES[range_name])).isoformat()
+        # Long ranges are also measured with automatic interval selection (stored rollups)
+        intervals = ('daily', 'auto') if RANGES[range_name] > 365 else ('daily',)
+        for plot_type in plot_types:
+            for interval in intervals:
+                body = {'ticker': 'SYN', 'startDate': start, 'endDate': RANGE_END, 'plotType': plot_type,
+                        'showVolume': True, 'indicators': 'sma:20,rsi', 'interval': interval}
+
+                def request(body=body):
+                    response = client.post('/D8TAVu/stock-data', json=body)
+                    assert response.status_code == 200, response.data
+                    chart = client.get(response.json['chart_url'])
+                    assert chart.status_code == 200, chart.data
+                name = f'{plot_type},{range_name}' + (f',{interval}' if interval != 'daily' else '')
+                suite.measure(f'stock_data[{name}]', request, setup=app.chart_cache.clear)
+
+
+def bench_listing(suite, client, share, sizes):
+    from file_manager import FileManager
+    from synthetic import make_flat_dir
+
+    for size in sizes:
+        started = time.perf_counter()
+        folder = make_flat_dir(share, size)
+        print(f'  (generated {folder} in {time.perf_counter() - started:.1f}s)', flush=True)
+        iterations = max(3, min(suite.iterations, 200_000 // size))
+
+        def cold():
+            # A new manager has an empty listing cache
+            FileManager(share).list_directory(folder)
+        suite.measure(f'list_directory[{size},cold]', cold, iterations=iterations)
+
+        manager = FileManager(share)
+        suite.measure(f'list_directory[{size},cached]', lambda: manager.list_directory(folder), iterations=iterations)
+
+        def page():
+            response = client.get(f'/D8TAVu/share/{folder}', headers=AUTH)
+            assert response.status_code == 200
+        suite.measure(f'share_page[{size}]', page, iterations=iterations)
+
+
+def bench_safe_path(suite, share):
+    from file_manager import FileManager
+    from synthetic import make_flat_dir
+
+    folder = make_flat_dir(share, 100)
+    manager = FileManager(share)
+    batch = 1000
+    paths = [f'{folder}/file_{i:06d}.txt' for i in range(batch)]
+    suite.measure('get_safe_path[valid]', lambda: [manager.get_safe_path(p) for p in paths], ops=batch)
+
+    def rejected():
+        for _ in range(batch):
+            try:
+                manager.get_safe_path(f'{folder}/../../etc/passwd')
+            except ValueError:
+                pass
+    suite.measure('get_safe_path[rejected]', rejected, ops=batch)
+
+
+def bench_transfer(suite, client, share, size_mb):
+    from synthetic import make_file
+
+    size = size_mb * MIB
+    chunk_size = 8 * MIB
+    chunk = os.urandom(MIB) * (chunk_size // MIB)
+    digest = hashlib.sha256(chunk).hexdigest()
+
+    def upload():
+        response = client.post('/D8TAVu/share/uploads', headers=AUTH,
+                               json={'filename': 'upload.bin', 'size': size})
+        assert response.status_code == 201, response.data
+        upload_id = response.json['upload_id']
+        for offset in range(0, size, chunk_size):
+            data = chunk[:min(chunk_size, size - offset)]
+            headers = dict(AUTH, **({'X-Chunk-SHA256': digest} if len(data) == chunk_size else {}))
+            response = client.put(f'/D8TAVu/share/uploads/{upload_id}?offset={offset}', data=data, headers=headers)
+            assert response.status_code == 200, response.data
+        response = client.post(f'/D8TAVu/share/uploads/{upload_id}/finalize', headers=AUTH)
+        assert response.status_code == 200, response.data
+        return size
+    suite.measure(f'upload[chunked,{size_mb}MiB]', upload, iterations=max(3, suite.iterations // 4), throughput=True)
+
+    name = make_file(share, 'download.bin', size)
+
+    def download():
+        response = client.get(f'/D8TAVu/share/download/{name}', headers=AUTH, buffered=False)
+        received = sum(len(block) for block in response.response)
+        response.close()
+        assert received == size
+        return received
+    suite.measure(f'download[full,{size_mb}MiB]', download, iterations=max(3, suite.iterations // 4), throughput=True)
+
+    rng = random.Random(0)
+
+    def ranged():
+        start = rng.randrange(0, size - MIB)
+        response = client.get(f'/D8TAVu/share/download/{name}', buffered=False,
+                              headers=dict(AUTH, Range=f'bytes={start}-{start + MIB - 1}'))
+        received = sum(len(block) for block in response.response)
+        response.close()
+        assert response.status_code == 206 and received == MIB
+        return received
+    suite.measure('download[range,1MiB]', ranged, throughput=True)
+
+
+def compare(results: Dict[str, dict], baseline_path: str, threshold: float) -> bool:
+    """Print p50 changes against a saved baseline; returns True if any case regressed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    print(f'\nCompared with {baseline_path} (regression: p50 more than {threshold:.0%} slower)')
+    regressed = False
+    for name, result in results.items():
+        old = baseline.get(name)
+        if old is None:
+            continue
+        change = result['p50_ms'] / old['p50_ms'] - 1 if old['p50_ms'] else 0.0
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressed = True
+        print(f"{name:<44}{old['p50_ms']:>10.3f} -> {result['p50_ms']:>10.3f}  {change:+7.1%}{flag}")
+    return regressed
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, help='Timed iterations per case (default 20)')
+    parser.add_argument('--only', default='stock_data,listing,safe_path,transfer', help='Groups to run')
+    parser.add_argument('--sizes', help=f'Folder sizes for the listing group (default {",".join(map(str, SIZES))})')
+    parser.add_argument('--ranges', help=f'Range lengths (default {",".join(RANGES)})')
+    parser.add_argument('--plot-types', default=','.join(PLOT_TYPES))
+    parser.add_argument('--transfer-mb', type=int, help='Upload/download size in MiB (default 256)')
+    parser.add_argument('--render-workers', default='0',
+                        help='Render processes (0 renders in this process, so its cost is in the latency '
+                             'and memory figures)')
+    parser.add_argument('--quick', action='store_true', help='Smaller defaults and few iterations (smoke run)')
+    parser.add_argument('--output', help='Write results as JSON (a baseline for --compare)')
+    parser.add_argument('--compare', help='Baseline JSON to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed p50 slowdown for --compare')
+    args = parser.parse_args()
+    args.iterations = args.iterations or (5 if args.quick else 20)
+    args.sizes = args.sizes or ('100,1000' if args.quick else ','.join(map(str, SIZES)))
+    args.ranges = args.ranges or ('1m,1y' if args.quick else ','.join(RANGES))
+    args.transfer_mb = args.transfer_mb or (32 if args.quick else 256)
+
+    groups = args.only.split(',')
+    # Long candlestick ranges make mplfinance warn on every render
+    warnings.filterwarnings('ignore', category=UserWarning, module='mplfinance')
+    with tempfile.TemporaryDirectory() as share, tempfile.TemporaryDirectory() as cache:
+        # The app reads its settings at import time
+        os.environ.update({
+            'D8TAVU_USER_FILES': share,
+            'D8TAVU_CACHE_DIR': cache,
+            'D8TAVU_LOG_FILE': os.path.join(cache, 'bench.log'),
+            # Rejected paths log an error each; keep them out of the output
+            'D8TAVU_LOG_LEVEL': 'CRITICAL',
+            'D8TAVU_INDEX_INTERVAL': '0',
+            'D8TAVU_RENDER_WORKERS': args.render_workers,
+        })
+        import app
+        from synthetic import SyntheticSource
+        app.price_store.source = SyntheticSource()
+        client = app.app.test_client()
+        suite = Suite(args.iterations)
+
+        print(f'{"case":<44}{"p50 ms":>10}{"p95 ms":>10}{"peak KiB":>12}')
+        try:
+            if 'stock_data' in groups:
+                bench_stock_data(suite, client, app, args.ranges.split(','), args.plot_types.split(','))
+            if 'listing' in groups:
+                bench_listing(suite, client, share, [int(s) for s in args.sizes.split(',')])
+            if 'safe_path' in groups:
+                bench_safe_path(suite, share)
+            if 'transfer' in groups:
+                bench_transfer(suite, client, share, args.transfer_mb)
+        finally:
+            app.render_pool.shutdown()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'max_rss_mb': max_rss_mb(),
+            'args': vars(args),
+        },
+        'results': suite.results,
+    }
+    print(f"\nPeak RSS: {report['meta']['max_rss_mb']:.0f} MiB" if report['meta']['max_rss_mb'] else '')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Results written to {args.output}')
+    if args.compare and compare(suite.results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
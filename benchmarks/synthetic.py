@@ -0,0 +1,95 @@
+"""
+Offline stand-ins for the benchmark suite: a deterministic price source and generated share trees.
+"""
+import os
+import time
+import zlib
+import datetime
+import threading
+
+import numpy as np
+import pandas as pd
+
+from price_store import PriceSource
+
+# Synthetic history covers business days in this window
+EPOCH = datetime.date(1990, 1, 1)
+HORIZON = datetime.date(2030, 12, 31)
+
+
+class SyntheticSource(PriceSource):
+    """
+    Deterministic random-walk OHLCV bars. A ticker's bar for a given day is the same whatever
+    range is requested, so incremental fetches by the price store stay consistent.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        """
+        Initialize SyntheticSource
+        :param latency: Seconds to sleep per fetch, to imitate an upstream round trip
+        """
+        self.latency = latency
+        self.fetches = 0
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _history(self, ticker: str) -> pd.DataFrame:
+        with self._lock:
+            hist = self._series.get(ticker)
+            if hist is None:
+                index = pd.bdate_range(EPOCH, HORIZON, name='Date')
+                rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+                close = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, len(index))))
+                spread = close * rng.uniform(0.002, 0.02, len(index))
+                open_ = close + rng.normal(0, 0.5, len(index)) * spread
+                hist = pd.DataFrame({
+                    'Open': open_,
+                    'High': np.maximum(open_, close) + spread,
+                    'Low': np.minimum(open_, close) - spread,
+                    'Close': close,
+                    'Volume': rng.integers(100_000, 10_000_000, len(index)),
+                    'Dividends': 0.0,
+                    'Stock Splits': 0.0,
+                }, index=index)
+                self._series[ticker] = hist
+            self.fetches += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return hist
+
+    def fetch(self, ticker: str, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+        hist = self._history(ticker)
+        return hist[(hist.index >= pd.Timestamp(start)) & (hist.index < pd.Timestamp(end))]
+
+
+def make_flat_dir(root: str, entries: int) -> str:
+    """
+    Create flat_<entries>/ under root holding that many entries: about one folder per
+    ten files, with a mix of extensions and sizes
+    :return: The directory's path relative to root
+    """
+    name = f'flat_{entries}'
+    path = os.path.join(root, name)
+    if os.path.isdir(path):
+        return name
+    os.makedirs(path)
+    extensions = ('txt', 'csv', 'pdf', 'jpg', 'xlsx', 'zip', 'log', 'py')
+    for i in range(entries):
+        if i % 10 == 9:
+            os.mkdir(os.path.join(path, f'folder_{i:06d}'))
+            continue
+        with open(os.path.join(path, f'file_{i:06d}.{extensions[i % len(extensions)]}'), 'wb') as f:
+            f.write(b'x' * (i % 4096))
+    # Listings of folders modified in the last moments are not cached; age the folder
+    # so the cached case measures the cache
+    settled = time.time() - 60
+    os.utime(path, (settled, settled))
+    return name
+
+
+def make_file(root: str, name: str, size: int) -> str:
+    """Create a sparse file of the given size (no disk space or page cache used)"""
+    path = os.path.join(root, name)
+    with open(path, 'wb') as f:
+        f.truncate(size)
+    return name
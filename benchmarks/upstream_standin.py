@@ -0,0 +1,181 @@
+"""
+Local stand-in for the market data chart API, so the upstream client can be exercised
+offline: daily bars come from SyntheticSource and minute bars from a ReplayFeed, and
+throttling, failures and latency can be injected.
+
+    python benchmarks/upstream_standin.py --port 8765 --fail-rate 0.2
+    D8TAVU_MARKET_DATA_URL=http://127.0.0.1:8765 python app.py
+
+    python benchmarks/upstream_standin.py --check   # self-test of retry and stale fallback
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import datetime
+import threading
+from typing import Optional
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from synthetic import SyntheticSource
+from live_feed import ReplayFeed
+
+
+class StandInState:
+    """Failure injection settings, adjustable while the server runs"""
+
+    def __init__(self, fail_rate: float = 0.0, status: int = 503, latency: float = 0.0):
+        self.fail_rate = fail_rate
+        self.status = status
+        self.latency = latency
+        self.down = False
+        self.fail_next = 0
+        self.requests = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            fail = self.down or self.fail_next > 0 or random.random() < self.fail_rate
+            self.fail_next = max(0, self.fail_next - 1)
+            if fail:
+                self.failed += 1
+            return fail
+
+
+def chart_payload(hist: pd.DataFrame, intraday: bool = False) -> dict:
+    """A chart API response for daily bars (New York timestamps, unadjusted prices) or intraday bars (UTC)"""
+    if hist.empty:
+        return {'chart': {'result': [{'meta': {'exchangeTimezoneName': 'America/New_York'}}], 'error': None}}
+    if intraday:
+        index = hist.index
+    else:
+        index = hist.index.tz_localize('America/New_York') + pd.Timedelta(hours=9, minutes=30)
+    return {'chart': {'result': [{
+        'meta': {'exchangeTimezoneName': 'America/New_York'},
+        'timestamp': [int(ts.timestamp()) for ts in index],
+        'indicators': {
+            'quote': [{
+                'open': hist['Open'].round(4).tolist(),
+                'high': hist['High'].round(4).tolist(),
+                'low': hist['Low'].round(4).tolist(),
+                'close': hist['Close'].round(4).tolist(),
+                'volume': hist['Volume'].astype(int).tolist(),
+            }],
+            'adjclose': [{'adjclose': hist['Close'].round(4).tolist()}],
+        },
+    }], 'error': None}}
+
+
+def make_server(host: str, port: int, state: StandInState, source: SyntheticSource,
+                intraday: Optional[ReplayFeed] = None) -> ThreadingHTTPServer:
+    intraday = intraday or ReplayFeed()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            prefix = '/v8/finance/chart/'
+            if not url.path.startswith(prefix):
+                return self._send(404, {'error': 'not found'})
+            if state.latency:
+                time.sleep(state.latency)
+            if state.should_fail():
+                headers = {'Retry-After': '1'} if state.status == 429 else None
+                return self._send(state.status, {'error': 'injected failure'}, headers)
+            ticker = unquote(url.path[len(prefix):]).upper()
+            query = parse_qs(url.query)
+            interval = query.get('interval', ['1d'])[0]
+            if interval != '1d':
+                start = pd.Timestamp(int(query['period1'][0]), unit='s', tz='UTC')
+                return self._send(200, chart_payload(intraday.fetch_intraday(ticker, interval, start), intraday=True))
+            start = datetime.datetime.fromtimestamp(int(query['period1'][0]), datetime.timezone.utc).date()
+            end = datetime.datetime.fromtimestamp(int(query['period2'][0]), datetime.timezone.utc).date()
+            self._send(200, chart_payload(source.fetch(ticker, start, end)))
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def check():
+    """Throttled requests are retried; an outage serves cached bars as stale, or 503 with nothing cached"""
+    from price_store import PriceStore, UpstreamUnavailable
+    from market_data import MarketDataClient
+
+    state = StandInState()
+    server = make_server('127.0.0.1', 0, state, SyntheticSource())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    client = MarketDataClient(url, rate=50, burst=10, retries=4, timeout=5, backoff=0.05,
+                              max_backoff=0.2, cooldown=2)
+    with tempfile.TemporaryDirectory() as cache:
+        store = PriceStore(os.path.join(cache, 'prices.db'), client)
+        start, end = datetime.date(2020, 1, 1), datetime.date(2021, 1, 1)
+
+        state.fail_next, state.status = 2, 429
+        hist = store.get_history('AAA', start, end)
+        assert len(hist) > 250 and not hist.attrs.get('stale'), 'throttled fetch did not recover'
+        print(f'throttled upstream: {len(hist)} bars after {client.retried} retries')
+
+        state.status, state.down = 503, True
+        hist = store.get_history('AAA', start, datetime.date(2021, 6, 1))
+        assert hist.attrs.get('stale') and len(hist) > 250, 'outage did not serve stale bars'
+        print(f'outage: {len(hist)} stale bars served from cache')
+        try:
+            store.get_history('BBB', start, end)
+            raise AssertionError('uncached ticker did not raise during outage')
+        except UpstreamUnavailable as e:
+            print(f'outage, nothing cached: unavailable (retry after {e.retry_after}s)')
+
+        state.down = False
+        time.sleep(client.cooldown)
+        hist = store.get_history('AAA', start, datetime.date(2021, 6, 1))
+        assert not hist.attrs.get('stale'), 'did not recover after cooldown'
+        print(f'recovered: {len(hist)} fresh bars; client stats {client.stats()}')
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    parser.add_argument('--status', type=int, default=503, help='HTTP status of injected failures')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every request')
+    parser.add_argument('--check', action='store_true', help='Run the retry/stale self-test and exit')
+    args = parser.parse_args()
+
+    if args.check:
+        check()
+        return
+    state = StandInState(args.fail_rate, args.status, args.latency)
+    server = make_server(args.host, args.port, state, SyntheticSource())
+    print(f'Serving stand-in chart API on http://{args.host}:{args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
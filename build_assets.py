@@ -0,0 +1,118 @@
+"""
+Build the front-end bundles listed in assets.BUNDLES: compile the JSX sources ahead of time
+with esbuild, minify, name each output by content hash and precompress it (.gz, and .br when
+the brotli package is installed). static/dist/manifest.json maps bundle names to built files.
+
+    npm install              # once; installs esbuild from package.json
+    python build_assets.py
+
+Set ESBUILD to use an esbuild binary from elsewhere. Without a build the pages fall back to
+compiling the sources in the browser.
+"""
+import os
+import sys
+import json
+import gzip
+import shutil
+import hashlib
+import logging
+import argparse
+import subprocess
+
+from assets import BUNDLES, DIST_DIR, MANIFEST
+from compression import brotli
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+# Browsers the bundle must run in (const/let, arrow functions, async/await)
+TARGET = 'es2017'
+
+
+def find_esbuild() -> str:
+    """The esbuild executable: $ESBUILD, then node_modules, then PATH"""
+    candidates = [os.environ.get('ESBUILD'),
+                  os.path.join(BASE_DIR, 'node_modules', '.bin', 'esbuild.cmd' if os.name == 'nt' else 'esbuild'),
+                  shutil.which('esbuild')]
+    for candidate in candidates:
+        if candidate and os.path.isfile(candidate):
+            return candidate
+    raise FileNotFoundError('esbuild not found; run "npm install" or set ESBUILD')
+
+
+def compile_bundle(esbuild: str, sources) -> bytes:
+    """
+    Compile JSX sources into one minified script. The sources are plain scripts sharing one
+    scope (as when loaded one after another in the page), so they are joined before compiling;
+    the IIFE keeps their names out of the global scope.
+    """
+    code = '\n;\n'.join(open(os.path.join(STATIC_DIR, source), encoding='utf-8').read() for source in sources)
+    result = subprocess.run(
+        [esbuild, '--loader=jsx', '--format=iife', '--minify', f'--target={TARGET}',
+         '--jsx-factory=React.createElement', '--jsx-fragment=React.Fragment', '--legal-comments=none'],
+        input=code.encode('utf-8'), capture_output=True, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f'esbuild failed:\n{result.stderr.decode(errors="replace")}')
+    return result.stdout
+
+
+def precompress(path: str) -> None:
+    """Write the .gz (and .br) siblings served to clients that accept them"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(data, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+    else:
+        logger.warning('brotli is not installed; writing gzip only')
+
+
+def build(out_dir: str) -> dict:
+    """
+    Build every bundle into out_dir and remove outputs of earlier builds
+    :return: The manifest written ({bundle name: built file name})
+    """
+    esbuild = find_esbuild()
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        code = compile_bundle(esbuild, sources)
+        stem, ext = os.path.splitext(name)
+        built = f'{stem}.{hashlib.sha256(code).hexdigest()[:12]}{ext}'
+        path = os.path.join(out_dir, built)
+        with open(path, 'wb') as f:
+            f.write(code)
+        precompress(path)
+        manifest[name] = built
+        source_bytes = sum(os.path.getsize(os.path.join(STATIC_DIR, source)) for source in sources)
+        logger.info(f'{name}: {source_bytes} bytes of JSX -> {built} ({len(code)} bytes, '
+                    f'{os.path.getsize(path + ".gz")} gzipped)')
+
+    current = set(manifest.values())
+    for entry in os.listdir(out_dir):
+        base = entry[:-3] if entry.endswith(('.gz', '.br')) else entry
+        if entry != MANIFEST and base not in current:
+            os.remove(os.path.join(out_dir, entry))
+    # Written last, so a failed build leaves the previous manifest in place
+    with open(os.path.join(out_dir, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out', default=os.path.join(STATIC_DIR, DIST_DIR), help='Output directory')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    try:
+        build(args.out)
+    except (FileNotFoundError, RuntimeError) as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
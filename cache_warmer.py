@@ -0,0 +1,298 @@
+"""
+Scheduled cache warmer: after each configured refresh window, refresh the price history of a
+watchlist and pre-render its standard charts, so the first requests of the day are cache hits.
+
+The watchlist is a JSON file named by D8TAVU_WARMER_CONFIG (see warmer.example.json). In the
+app the scheduler starts with the first request; for testing, run one pass from the command line:
+
+    python cache_warmer.py --once [--config warmer.json] [--tickers AAPL,MSFT]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+STATUS_FILE = 'warmer-status.json'
+# Run claims older than this are removed
+CLAIM_RETENTION_DAYS = 7
+
+
+@dataclass
+class Preset:
+    """A standard chart: a trailing date range ending today and chart options as sent to /stock-data"""
+    name: str
+    days: int
+    options: Dict[str, object] = field(default_factory=dict)
+
+    def request(self, ticker: str, today: datetime.date) -> dict:
+        """The /stock-data request body this preset stands for on a given day"""
+        return dict(self.options,
+                    ticker=ticker,
+                    startDate=(today - datetime.timedelta(days=self.days)).isoformat(),
+                    endDate=today.isoformat())
+
+
+@dataclass
+class WarmerConfig:
+    tickers: List[str]
+    windows: List[datetime.time]
+    presets: List[Preset]
+    days: List[int] = field(default_factory=lambda: list(range(5)))
+    workers: int = 4
+    # Chart sizes (width, height) rendered for each preset that does not set its own
+    sizes: List[Tuple[int, int]] = field(default_factory=list)
+
+    def requests(self, ticker: str, today: datetime.date) -> List[dict]:
+        """The /stock-data request bodies of every preset, one per chart size"""
+        bodies = []
+        for preset in self.presets:
+            body = preset.request(ticker, today)
+            if 'width' in body or 'height' in body or not self.sizes:
+                bodies.append(body)
+            else:
+                bodies.extend(dict(body, width=width, height=height) for width, height in self.sizes)
+        return bodies
+
+    @classmethod
+    def load(cls, path: str) -> 'WarmerConfig':
+        """
+        Read a watchlist file
+        :param path: JSON file with tickers, windows ("HH:MM" local times), presets and
+            optionally days (e.g. ["mon", "tue"]), workers and sizes ([[width, height], ...])
+        :raises ValueError: If the file is malformed
+        """
+        with open(path, encoding='utf-8') as f:
+            raw = json.load(f)
+        try:
+            tickers = list(dict.fromkeys(t.strip().upper() for t in raw['tickers'] if t.strip()))
+            windows = sorted(datetime.time.fromisoformat(w) for w in raw['windows'])
+            presets = [Preset(p['name'], int(p['days']), {k: v for k, v in p.items() if k not in ('name', 'days')})
+                       for p in raw['presets']]
+            days = [WEEKDAYS.index(d.strip().lower()[:3]) for d in raw.get('days', WEEKDAYS[:5])]
+            workers = int(raw.get('workers', 4))
+            sizes = [(int(width), int(height)) for width, height in raw.get('sizes', [])]
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f'Invalid warmer config {path}: {e}')
+        if not tickers or not windows or not presets:
+            raise ValueError(f'Invalid warmer config {path}: tickers, windows and presets must not be empty')
+        return cls(tickers, windows, presets, days, max(1, workers), sizes)
+
+
+class CacheWarmer:
+    def __init__(self, config: WarmerConfig, warm: Callable[[str, List[dict]], dict], state_dir: str):
+        """
+        Initialize CacheWarmer
+        :param config: Watchlist, refresh windows and chart presets
+        :param warm: Refreshes one ticker and pre-renders its charts. Called with the ticker and
+            its preset request bodies; returns a dict of details (e.g. last_bar, charts, stale)
+        :param state_dir: Directory for run claims and the status file, shared by all worker
+            processes so each window is warmed once
+        """
+        self.config = config
+        self.warm = warm
+        self.state_dir = state_dir
+        self.running = False
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._status_lock = threading.Lock()
+        self._stop = threading.Event()
+        os.makedirs(state_dir, exist_ok=True)
+        logger.info(f'CacheWarmer initialized with {len(config.tickers)} tickers, '
+                    f'{len(config.presets)} presets, windows {[w.strftime("%H:%M") for w in config.windows]}')
+
+    def start(self) -> None:
+        """Start the scheduler thread (idempotent)"""
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='cache-warmer', daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def last_window(self, now: datetime.datetime) -> Optional[datetime.datetime]:
+        """The most recent refresh window at or before now (within the past week)"""
+        for offset in range(8):
+            day = now.date() - datetime.timedelta(days=offset)
+            if day.weekday() not in self.config.days:
+                continue
+            for window in reversed(self.config.windows):
+                moment = datetime.datetime.combine(day, window)
+                if moment <= now:
+                    return moment
+        return None
+
+    def next_window(self, now: datetime.datetime) -> Optional[datetime.datetime]:
+        """The first refresh window after now"""
+        for offset in range(8):
+            day = now.date() + datetime.timedelta(days=offset)
+            if day.weekday() not in self.config.days:
+                continue
+            for window in self.config.windows:
+                moment = datetime.datetime.combine(day, window)
+                if moment > now:
+                    return moment
+        return None
+
+    def _run(self) -> None:
+        # A window that passed while no process was running (e.g. a restart) is caught up on
+        window = self.last_window(datetime.datetime.now())
+        while not self._stop.is_set():
+            if window is not None and self._claim(window):
+                try:
+                    self.run_once(window=window)
+                except Exception as e:
+                    logger.error(f'Error warming caches: {str(e)}', exc_info=True)
+            window = self.next_window(datetime.datetime.now())
+            if window is None:
+                return
+            self._stop.wait(max(0.0, (window - datetime.datetime.now()).total_seconds()))
+
+    def _claim(self, window: datetime.datetime) -> bool:
+        """Claim a window for this process; False if another process (or an earlier run) has it"""
+        name = f'warm-{window:%Y%m%d-%H%M}.claim'
+        try:
+            fd = os.open(os.path.join(self.state_dir, name), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        cutoff = time.time() - CLAIM_RETENTION_DAYS * 86400
+        for entry in os.scandir(self.state_dir):
+            if entry.name.endswith('.claim') and entry.name != name and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        return True
+
+    def run_once(self, tickers: Optional[List[str]] = None,
+                 window: Optional[datetime.datetime] = None) -> dict:
+        """
+        Warm every watchlist ticker now, at most config.workers at a time
+        :param tickers: Tickers to warm instead of the watchlist
+        :param window: Refresh window this run belongs to, for the status report
+        :return: The run summary written to the status file
+        """
+        tickers = tickers or self.config.tickers
+        today = datetime.date.today()
+        run = {
+            'window': window.isoformat() if window else None,
+            'started': datetime.datetime.now().isoformat(timespec='seconds'),
+            'finished': None,
+            'tickers': len(tickers),
+            'ok': 0,
+            'failed': 0,
+        }
+        self.running = True
+        self._update_status(run=run)
+        started = time.perf_counter()
+        logger.info(f'Warming {len(tickers)} tickers with {len(self.config.presets)} presets')
+
+        def warm_one(ticker):
+            ticker_started = time.perf_counter()
+            entry = {'refreshed_at': datetime.datetime.now().isoformat(timespec='seconds')}
+            try:
+                entry.update(self.warm(ticker, self.config.requests(ticker, today)))
+                entry['error'] = None
+            except Exception as e:
+                logger.warning(f'Error warming {ticker}: {str(e)}')
+                entry['error'] = str(e)
+            entry['duration_ms'] = round((time.perf_counter() - ticker_started) * 1000, 1)
+            with self._status_lock:
+                run['ok' if entry['error'] is None else 'failed'] += 1
+            self._update_status(ticker=ticker, entry=entry)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.config.workers, thread_name_prefix='warm') as pool:
+                list(pool.map(warm_one, tickers))
+        finally:
+            self.running = False
+            run['finished'] = datetime.datetime.now().isoformat(timespec='seconds')
+            run['duration_s'] = round(time.perf_counter() - started, 1)
+            self._update_status(run=run)
+        logger.info(f"Warmed {run['ok']} of {len(tickers)} tickers in {run['duration_s']}s "
+                    f"({run['failed']} failed)")
+        return run
+
+    def _read_status(self) -> dict:
+        try:
+            with open(os.path.join(self.state_dir, STATUS_FILE), encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {'last_run': None, 'tickers': {}}
+
+    def _update_status(self, run: Optional[dict] = None, ticker: Optional[str] = None,
+                       entry: Optional[dict] = None) -> None:
+        """Merge a run summary or one ticker's result into the status file (written atomically)"""
+        with self._status_lock:
+            status = self._read_status()
+            if run is not None:
+                status['last_run'] = dict(run)
+            if ticker is not None:
+                status['tickers'][ticker] = entry
+            path = os.path.join(self.state_dir, STATUS_FILE)
+            tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(status, f, indent=1)
+            os.replace(tmp_path, path)
+
+    def status(self) -> dict:
+        """Last run, next window and, per watchlist ticker, when it was refreshed and whether that is current"""
+        now = datetime.datetime.now()
+        status = self._read_status()
+        last_window = self.last_window(now)
+        next_window = self.next_window(now)
+        tickers = {}
+        for ticker in self.config.tickers:
+            entry = dict(status['tickers'].get(ticker) or {'refreshed_at': None})
+            refreshed = entry['refreshed_at']
+            entry['age_s'] = round((now - datetime.datetime.fromisoformat(refreshed)).total_seconds()) if refreshed else None
+            # Fresh: warmed without error since the most recent window began
+            entry['fresh'] = bool(refreshed and not entry.get('error') and last_window is not None
+                                  and datetime.datetime.fromisoformat(refreshed) >= last_window)
+            tickers[ticker] = entry
+        return {
+            'running': self.running,
+            'last_run': status['last_run'],
+            'last_window': last_window.isoformat() if last_window else None,
+            'next_window': next_window.isoformat() if next_window else None,
+            'fresh': sum(1 for entry in tickers.values() if entry['fresh']),
+            'tickers': tickers,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--once', action='store_true', help='Warm the watchlist once now and exit')
+    parser.add_argument('--config', help='Watchlist file (default: D8TAVU_WARMER_CONFIG)')
+    parser.add_argument('--tickers', help='Comma-separated tickers to warm instead of the watchlist')
+    args = parser.parse_args()
+    if not args.once:
+        parser.error('the scheduler runs inside the app; use --once to run a single pass')
+    if args.config:
+        os.environ['D8TAVU_WARMER_CONFIG'] = args.config
+
+    import app
+    if app.cache_warmer is None:
+        parser.error('no watchlist configured; pass --config or set D8TAVU_WARMER_CONFIG')
+    tickers = [t.strip().upper() for t in args.tickers.split(',')] if args.tickers else None
+    try:
+        run = app.cache_warmer.run_once(tickers)
+    finally:
+        app.render_pool.shutdown()
+    print(json.dumps(run, indent=2))
+    sys.exit(1 if run['failed'] else 0)
+
+
+if __name__ == '__main__':
+    main()
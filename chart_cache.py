@@ -0,0 +1,118 @@
+import os
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def data_version(df: 'pd.DataFrame') -> str:
+    """Fingerprint of a DataFrame's index and values, used to invalidate rendered charts"""
+    # pandas is imported here so the cache itself can be created without the chart stack
+    import pandas as pd
+    hashed = pd.util.hash_pandas_object(df, index=True).values
+    return hashlib.blake2b(hashed.tobytes(), digest_size=16).hexdigest()
+
+
+def make_key(params: dict, version: str) -> str:
+    """Build a cache key from normalized request parameters and the data version"""
+    normalized = '&'.join(f'{k}={params[k]}' for k in sorted(params))
+    return hashlib.sha256(f'{normalized}|{version}'.encode()).hexdigest()
+
+
+class ChartCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, disk_dir: Optional[str] = None):
+        """
+        Initialize ChartCache
+        :param max_bytes: Byte budget for the in-process LRU tier
+        :param disk_dir: Directory for the on-disk tier, or None to keep charts in memory only
+        """
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+        logger.info(f'ChartCache initialized with max_bytes: {max_bytes}, disk_dir: {disk_dir}')
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached chart bytes, promoting disk hits into memory"""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = None
+            except OSError as e:
+                logger.warning(f'Error reading chart cache entry {key}: {str(e)}')
+                data = None
+            if data is not None:
+                self._remember(key, data)
+                with self._lock:
+                    self.hits += 1
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store chart bytes in memory and, if configured, on disk"""
+        self._remember(key, data)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f'Error writing chart cache entry {key}: {str(e)}')
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def stats(self) -> dict:
+        """Hit/miss counts and the size of the in-memory tier"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._size,
+            }
+
+    def clear(self) -> None:
+        """Drop the in-memory tier"""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
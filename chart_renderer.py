@@ -0,0 +1,305 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# Stage timings recorded by the render job currently running in this thread
+_job = threading.local()
+
+
+def _mark(name: str, started: float) -> float:
+    """Record the time since started under name for the current job; returns now"""
+    now = time.perf_counter()
+    timings = getattr(_job, 'timings', None)
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + (now - started) * 1000.0
+    return now
+
+
+def _run_job(fn: Callable[..., bytes], args: tuple):
+    """Run a render function and return (image bytes, {stage: milliseconds})"""
+    _job.timings = {}
+    try:
+        return fn(*args), _job.timings
+    finally:
+        _job.timings = None
+
+
+class RendererBusy(Exception):
+    """Raised when the render queue is full; the client should retry later"""
+
+    def __init__(self, retry_after: int):
+        super().__init__('Chart renderer is busy, please retry shortly')
+        self.retry_after = retry_after
+
+
+class RenderTimeout(Exception):
+    """Raised when a render job does not finish within the per-job timeout"""
+
+
+def _new_figure(params: dict):
+    """Create a Figure bound to an Agg canvas, without touching pyplot"""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    dpi = params['dpi']
+    fig = Figure(figsize=(params['width'] / dpi, params['height'] / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def _save(fig, params: dict, started: float) -> bytes:
+    """Save the figure; time since started counts as 'draw', the save itself as 'savefig'"""
+    if params['format'] not in fig.canvas.get_supported_filetypes():
+        raise ValueError(f"Chart format {params['format']} is not available on this server")
+    started = _mark('draw', started)
+    buffer = BytesIO()
+    fig.savefig(buffer, format=params['format'], dpi=params['dpi'])
+    _mark('savefig', started)
+    return buffer.getvalue()
+
+
+OVERLAY_COLORS = ['red', 'darkorange', 'purple', 'teal', 'brown', 'olive', 'magenta']
+
+
+def render_price_chart(hist, params: dict) -> bytes:
+    """
+    Render a single-ticker price chart to image bytes in the requested format and size.
+    Indicator columns listed in params['indicators'] must already be present in hist.
+    """
+    import mplfinance as mpf
+    from matplotlib.lines import Line2D
+    from indicators import parse_indicators
+
+    started = time.perf_counter()
+    ticker = params['ticker']
+    plot_type = params['plotType']
+    show_volume = params['showVolume']
+    indicators = parse_indicators(params.get('indicators'))
+    overlays = [i for i in indicators if i.panel == 'price']
+    # One extra panel per oscillator type, in request order
+    panels = list(dict.fromkeys(i.panel for i in indicators if i.panel != 'price'))
+
+    fig = _new_figure(params)
+    rows = ['price'] + (['volume'] if show_volume else []) + panels
+    axes = fig.subplots(len(rows), 1, sharex=True, squeeze=False,
+                        gridspec_kw={'height_ratios': [3] + [1] * (len(rows) - 1)})[:, 0]
+    ax_for = dict(zip(rows, axes))
+    ax1 = ax_for['price']
+
+    # (column, axes, color, style) for every indicator line
+    lines = []
+    color_index = 0
+    for indicator in overlays:
+        color = OVERLAY_COLORS[color_index % len(OVERLAY_COLORS)]
+        color_index += 1
+        for col in indicator.outputs():
+            lines.append((col, ax1, color, 'dashed' if col.endswith(('upper', 'lower')) else 'solid'))
+    bars = []
+    for indicator in indicators:
+        if indicator.panel == 'price':
+            continue
+        ax = ax_for[indicator.panel]
+        for col, color in zip(indicator.outputs(), ['blue', 'red', 'gray']):
+            if col.endswith(' hist'):
+                bars.append((col, ax))
+            else:
+                lines.append((col, ax, color, 'solid'))
+
+    if plot_type in ['candlestick', 'ohlc']:
+        # Use mplfinance in external-axes mode for candlestick/OHLC charts
+        addplot = [mpf.make_addplot(hist[col], ax=ax, color=color, linestyle=style)
+                   for col, ax, color, style in lines]
+        addplot += [mpf.make_addplot(hist[col], ax=ax, type='bar', color='gray') for col, ax in bars]
+        mpf.plot(
+            hist,
+            type='candle' if plot_type == 'candlestick' else 'ohlc',
+            ax=ax1,
+            volume=ax_for['volume'] if show_volume else False,
+            style='yahoo',
+            ylabel='Price ($)',
+            ylabel_lower='Volume' if show_volume else '',
+            addplot=addplot
+        )
+        handles = {}
+        for col, ax, color, style in lines:
+            handles.setdefault(ax, []).append(Line2D([], [], color=color, linestyle=style, label=col))
+        for ax, ax_handles in handles.items():
+            ax.legend(handles=ax_handles, fontsize='small')
+
+    else:  # Line plot
+        # Plot price
+        ax1.plot(hist.index, hist['Close'], label='Close Price', color='blue')
+        ax1.set_ylabel('Price ($)')
+
+        for col, ax, color, style in lines:
+            ax.plot(hist.index, hist[col], label=col, color=color, linestyle=style, linewidth=1)
+        for col, ax in bars:
+            ax.bar(hist.index, hist[col], color='gray', label=col)
+
+        # Add volume subplot if requested
+        if show_volume:
+            ax_for['volume'].bar(hist.index, hist['Volume'], color='gray')
+            ax_for['volume'].set_ylabel('Volume')
+
+        for ax in axes:
+            ax.grid(True)
+        ax1.legend(fontsize='small')
+        for panel in panels:
+            ax_for[panel].legend(fontsize='small')
+        axes[-1].set_xlabel('Date')
+
+    for panel in panels:
+        ax_for[panel].set_ylabel(panel.upper())
+    if 'rsi' in ax_for:
+        for level in (30, 70):
+            ax_for['rsi'].axhline(level, color='gray', linewidth=0.8, linestyle='dotted')
+
+    interval = params.get('interval', 'daily')
+    ax1.set_title(f'{ticker} Stock Price' + (f' ({interval.capitalize()})' if interval != 'daily' else ''))
+    fig.tight_layout()
+    return _save(fig, params, started)
+
+
+def render_compare_chart(histories: dict, params: dict) -> bytes:
+    """Render the relative performance of several tickers to image bytes"""
+    from series_payload import relative_performance
+
+    started = time.perf_counter()
+    fig = _new_figure(params)
+    ax = fig.subplots(1, 1)
+
+    for ticker, hist in histories.items():
+        ax.plot(hist.index, relative_performance(hist['Close']), label=ticker, linewidth=1)
+
+    ax.axhline(0, color='gray', linewidth=0.8)
+    ax.set_title('Relative Performance')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Change (%)')
+    ax.grid(True)
+    ax.legend(ncol=max(1, len(histories) // 10), fontsize='small')
+    fig.tight_layout()
+    return _save(fig, params, started)
+
+
+def _warm_up() -> None:
+    """Worker initializer: import the plotting stack and build the font cache once"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import mplfinance  # noqa: F401
+    fig = _new_figure({'width': 200, 'height': 150, 'dpi': 100})
+    ax = fig.subplots(1, 1)
+    ax.plot([0, 1], [0, 1])
+    ax.set_title('warm-up')
+    fig.savefig(BytesIO(), format='png')
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+class RenderPool:
+    def __init__(self, workers: int = 2, max_queue: int = 8, timeout: float = 30.0):
+        """
+        Initialize RenderPool
+        :param workers: Number of pre-warmed render processes; 0 renders in the calling thread
+        :param max_queue: Jobs allowed to wait for a worker before requests are rejected
+        :param timeout: Seconds to wait for a single render job
+        """
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(1, workers) + max_queue)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+        logger.info(f'RenderPool initialized with workers: {workers}, max_queue: {max_queue}, timeout: {timeout}')
+
+    def start(self) -> None:
+        """Start and pre-warm the worker processes (otherwise done on the first render)"""
+        with self._lock:
+            if self._executor is None and self.workers > 0:
+                self._start()
+
+    def _start(self) -> None:
+        # spawn avoids forking a multi-threaded web worker
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_warm_up)
+        # Start and warm every worker now instead of on the first request
+        for _ in range(self.workers):
+            self._executor.submit(_ping)
+
+    def render(self, fn: Callable[..., bytes], *args, timings: Optional[dict] = None) -> bytes:
+        """
+        Run a render function in the pool
+        :param timings: Optional dict that receives the job's stage timings (draw, savefig)
+        :raises RendererBusy: If all workers are busy and the queue is full
+        :raises RenderTimeout: If the job does not finish within the timeout. This is best-effort:
+            a running job cannot be cancelled, so the pool is replaced and its workers killed,
+            and any other job running on them fails with RendererBusy
+        """
+        if not self._slots.acquire(blocking=False):
+            raise RendererBusy(retry_after=max(1, int(self.timeout // 4)))
+
+        if self._executor is None and self.workers > 0:
+            self.start()
+
+        if self._executor is None:
+            try:
+                image_bytes, job_timings = _run_job(fn, args)
+            finally:
+                self._slots.release()
+            if timings is not None:
+                timings.update(job_timings)
+            return image_bytes
+
+        executor = self._executor
+        try:
+            future = executor.submit(_run_job, fn, args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._restart(executor)
+            raise
+        # The slot is held until the job really finishes, even if we stop waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            image_bytes, job_timings = future.result(timeout=self.timeout)
+        except FuturesTimeoutError:
+            logger.error(f'Render job timed out after {self.timeout}s; replacing the pool')
+            self._restart(executor)
+            raise RenderTimeout(f'Chart rendering timed out after {self.timeout}s')
+        except (BrokenProcessPool, CancelledError):
+            if self._executor is not executor:
+                # Queued or running on a pool replaced after another job's timeout
+                raise RendererBusy(retry_after=1)
+            logger.error('Render worker died; restarting pool', exc_info=True)
+            self._restart(executor)
+            raise
+        if timings is not None:
+            timings.update(job_timings)
+        return image_bytes
+
+    def _restart(self, old: ProcessPoolExecutor) -> None:
+        """Replace a broken or stuck pool with a new one, unless another caller already did"""
+        with self._lock:
+            if self._executor is not old:
+                return
+            self._start()
+        # Futures cannot stop a running job, so the old workers are killed (Python 3.14 adds
+        # terminate_workers() for this); the slots of their jobs are released as they fail
+        processes = list((getattr(old, '_processes', None) or {}).values())
+        old.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,255 @@
+import os
+import re
+import json
+import time
+import hashlib
+import secrets
+import logging
+from typing import BinaryIO, Optional
+
+from file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+# Read/write buffer for streaming chunks and hashing; bounds memory per request
+BUFFER_SIZE = 1024 * 1024
+# Chunk size suggested to clients
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+
+class UploadConflict(Exception):
+    """Raised when a chunk does not start at the upload's current offset"""
+
+    def __init__(self, offset: int):
+        super().__init__(f'Chunk must start at offset {offset}')
+        self.offset = offset
+
+
+def _check_sha256(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if not _SHA256.match(value):
+        raise ValueError('Invalid SHA-256 checksum')
+    return value
+
+
+class ChunkedUploads:
+    def __init__(self, file_manager, state_dir: str, ttl_seconds: float = 24 * 3600):
+        """
+        Initialize ChunkedUploads
+        :param file_manager: FileManager used to resolve and validate target paths
+        :param state_dir: Directory holding one JSON state file and one lock file per upload in progress
+        :param ttl_seconds: Uploads untouched for this long are discarded
+        """
+        self.file_manager = file_manager
+        self.state_dir = state_dir
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(state_dir, exist_ok=True)
+        logger.info(f'ChunkedUploads initialized with state_dir: {state_dir}')
+
+    def _state_path(self, upload_id: str) -> str:
+        if not _UPLOAD_ID.match(upload_id or ''):
+            raise ValueError('Invalid upload id')
+        return os.path.join(self.state_dir, f'{upload_id}.json')
+
+    def _lock(self, upload_id: str) -> FileLock:
+        """Lock of one upload, shared by every worker process (retried chunks may reach any of them)"""
+        self._state_path(upload_id)  # validates the id
+        return FileLock(os.path.join(self.state_dir, f'{upload_id}.lock'))
+
+    def _remove_lock(self, upload_id: str) -> None:
+        # After release: Windows cannot delete a file that is still open
+        try:
+            os.remove(os.path.join(self.state_dir, f'{upload_id}.lock'))
+        except FileNotFoundError:
+            pass
+
+    def _load(self, upload_id: str) -> dict:
+        try:
+            with open(self._state_path(upload_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(upload_id)
+
+    def _save(self, state: dict) -> None:
+        path = self._state_path(state['id'])
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    def _status(self, state: dict) -> dict:
+        try:
+            offset = os.path.getsize(state['part_path'])
+        except FileNotFoundError:
+            offset = 0
+        return {
+            'upload_id': state['id'],
+            'path': state['path'],
+            'size': state['size'],
+            'offset': offset,
+            'chunk_size': DEFAULT_CHUNK_SIZE,
+        }
+
+    def init(self, rel_path: str, size: int, sha256: Optional[str] = None) -> dict:
+        """
+        Start an upload. The data is written to a hidden temp file next to the target
+        so that finalize can move it into place with an atomic rename.
+        :param rel_path: Target file path relative to the share root
+        :param size: Total size in bytes
+        :param sha256: Optional expected SHA-256 of the whole file (hex)
+        :return: Upload status (upload_id, offset, size, chunk_size)
+        """
+        if size < 0:
+            raise ValueError('Invalid upload size')
+        sha256 = _check_sha256(sha256)
+        target = self.file_manager.get_safe_path(rel_path)
+        if not target.parent.is_dir():
+            raise ValueError('Target directory does not exist')
+        if target.is_dir():
+            raise ValueError('A folder with that name already exists')
+        self.cleanup()
+
+        upload_id = secrets.token_hex(16)
+        part_path = str(target.parent / f'.{target.name}.{upload_id}.part')
+        open(part_path, 'wb').close()
+        state = {
+            'id': upload_id,
+            'path': rel_path.strip('/'),
+            'target': str(target),
+            'part_path': part_path,
+            'size': size,
+            'sha256': sha256,
+            'created': time.time(),
+        }
+        self._save(state)
+        logger.info(f'Upload {upload_id} started for {state["path"]} ({size} bytes)')
+        return self._status(state)
+
+    def status(self, upload_id: str) -> dict:
+        """Current offset of an upload, used by clients to resume after an interruption"""
+        return self._status(self._load(upload_id))
+
+    def write_chunk(self, upload_id: str, offset: int, stream: BinaryIO, length: Optional[int] = None,
+                    sha256: Optional[str] = None) -> dict:
+        """
+        Append a chunk read from stream, in BUFFER_SIZE pieces
+        :param offset: Where the chunk starts; must equal the bytes already received
+        :param length: Chunk length if known (Content-Length)
+        :param sha256: Optional SHA-256 of this chunk; on mismatch the chunk is discarded
+        :raises UploadConflict: If offset is not the current end of the upload
+        """
+        sha256 = _check_sha256(sha256)
+        with self._lock(upload_id):
+            state = self._load(upload_id)
+            part_path = state['part_path']
+            current = os.path.getsize(part_path)
+            if offset != current:
+                raise UploadConflict(current)
+            remaining = state['size'] - current
+            if length is not None and length > remaining:
+                raise ValueError('Chunk extends past the declared upload size')
+
+            digest = hashlib.sha256()
+            written = 0
+            try:
+                with open(part_path, 'r+b') as f:
+                    f.seek(current)
+                    while True:
+                        buffer = stream.read(min(BUFFER_SIZE, remaining - written + 1))
+                        if not buffer:
+                            break
+                        written += len(buffer)
+                        if written > remaining:
+                            raise ValueError('Chunk extends past the declared upload size')
+                        digest.update(buffer)
+                        f.write(buffer)
+                    if sha256 is not None and digest.hexdigest() != sha256:
+                        raise ValueError('Chunk checksum mismatch')
+            except BaseException:
+                # Drop the partial chunk so the client can resend it from the same offset
+                with open(part_path, 'r+b') as f:
+                    f.truncate(current)
+                raise
+
+            state['updated'] = time.time()
+            self._save(state)
+            return self._status(state)
+
+    def finalize(self, upload_id: str, sha256: Optional[str] = None) -> dict:
+        """
+        Verify the size and checksum, then atomically move the file into place
+        :param sha256: Expected SHA-256 of the whole file, if not given at init
+        :return: The final path and the file's SHA-256
+        """
+        sha256 = _check_sha256(sha256)
+        with self._lock(upload_id):
+            state = self._load(upload_id)
+            part_path = state['part_path']
+            received = os.path.getsize(part_path)
+            if received != state['size']:
+                raise ValueError(f'Upload incomplete: received {received} of {state["size"]} bytes')
+
+            digest = hashlib.sha256()
+            with open(part_path, 'rb') as f:
+                for buffer in iter(lambda: f.read(BUFFER_SIZE), b''):
+                    digest.update(buffer)
+                os.fsync(f.fileno())
+            actual = digest.hexdigest()
+            expected = sha256 or state.get('sha256')
+            if expected and actual != expected:
+                self._discard(state)
+                raise ValueError('Checksum mismatch; the upload was discarded')
+
+            os.replace(part_path, state['target'])
+            os.remove(self._state_path(upload_id))
+        self._remove_lock(upload_id)
+        logger.info(f'Upload {upload_id} committed to {state["path"]}')
+        return {'path': state['path'], 'size': received, 'sha256': actual}
+
+    def abort(self, upload_id: str) -> None:
+        """Discard an upload and its temp file"""
+        with self._lock(upload_id):
+            self._discard(self._load(upload_id))
+        self._remove_lock(upload_id)
+
+    def _discard(self, state: dict) -> None:
+        for path in (state['part_path'], self._state_path(state['id'])):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def cleanup(self) -> int:
+        """Discard uploads that have not received data within the TTL; returns how many"""
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        for name in os.listdir(self.state_dir):
+            upload_id, ext = os.path.splitext(name)
+            if ext == '.lock' and not os.path.exists(os.path.join(self.state_dir, f'{upload_id}.json')):
+                # Left behind by a worker that stopped mid-request
+                try:
+                    if os.path.getmtime(os.path.join(self.state_dir, name)) < cutoff:
+                        self._remove_lock(upload_id)
+                except OSError:
+                    pass
+                continue
+            if ext != '.json' or not _UPLOAD_ID.match(upload_id):
+                continue
+            try:
+                with self._lock(upload_id):
+                    state = self._load(upload_id)
+                    if state.get('updated', state['created']) >= cutoff:
+                        continue
+                    self._discard(state)
+            except (KeyError, ValueError, OSError):
+                continue
+            self._remove_lock(upload_id)
+            removed += 1
+        if removed:
+            logger.info('Discarded %d expired uploads', removed)
+        return removed
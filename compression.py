@@ -0,0 +1,92 @@
+import gzip
+import logging
+from typing import Optional, Tuple
+
+from flask import Response
+from werkzeug.datastructures import Accept
+
+logger = logging.getLogger(__name__)
+
+# Text responses worth compressing; images and archives are already compressed
+COMPRESSIBLE_TYPES = frozenset({
+    'application/json',
+    'application/javascript',
+    'text/javascript',
+    'text/html',
+    'text/css',
+    'text/csv',
+    'text/plain',
+    'image/svg+xml',
+})
+
+
+def _brotli():
+    """The brotli module (brotli or brotlicffi, which share an API), or None if neither is installed"""
+    for module in ('brotli', 'brotlicffi'):
+        try:
+            return __import__(module)
+        except ImportError:
+            continue
+    return None
+
+
+brotli = _brotli()
+# Codings that can be produced on the fly, in order of preference
+DYNAMIC_CODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate(accept_encodings: Accept, available: Tuple[str, ...] = DYNAMIC_CODINGS) -> Optional[str]:
+    """
+    Pick the content coding to send
+    :param accept_encodings: The request's parsed Accept-Encoding header
+    :param available: Codings on offer, in order of preference
+    :return: 'br', 'gzip' or None (send uncompressed)
+    """
+    best, best_quality = None, 0
+    for coding in available:
+        quality = accept_encodings.quality(coding)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(data: bytes, coding: str, brotli_quality: int = 5, gzip_level: int = 6) -> bytes:
+    if coding == 'br':
+        return brotli.compress(data, quality=brotli_quality)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def compress_response(response: Response, accept_encodings: Accept, min_bytes: int = 1024,
+                      brotli_quality: int = 5, gzip_level: int = 6) -> Response:
+    """
+    Compress a buffered text response with the best coding the client accepts
+    :param response: Response to compress in place
+    :param accept_encodings: The request's parsed Accept-Encoding header
+    :param min_bytes: Smaller bodies are sent as they are (compression would not pay for itself)
+    :param brotli_quality: Brotli quality for dynamic responses (0-11; mid values are fast)
+    :param gzip_level: gzip level when brotli is not accepted or not installed
+    :return: The same response
+    """
+    if response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+    # Files and streams (downloads, ZIP archives, precompressed assets) are left alone
+    if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    response.vary.add('Accept-Encoding')
+    coding = negotiate(accept_encodings)
+    if coding is None:
+        return response
+    data = response.get_data()
+    if len(data) < min_bytes:
+        return response
+
+    response.set_data(compress(data, coding, brotli_quality, gzip_level))
+    response.headers['Content-Encoding'] = coding
+    # The compressed body is a different byte sequence; a weak ETag still validates it
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,101 @@
+import os
+
+# All deployment settings come from the environment (D8TAVU_*). Under IIS they are set as
+# appSettings in web.config; under gunicorn in the service environment or gunicorn.conf.py.
+# This module only reads strings, so it is cheap to import before forking workers.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _str(name: str, default: str) -> str:
+    return os.environ.get(name) or default
+
+
+def _int(name: str, default: int) -> int:
+    return int(os.environ.get(name) or default)
+
+
+def _float(name: str, default: float) -> float:
+    return float(os.environ.get(name) or default)
+
+
+def _bool(name: str, default: bool = False) -> bool:
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+# Share
+USER_FILES_PATH = _str('D8TAVU_USER_FILES', 'C:/Users/a-gon/OneDrive/Documents')
+VIRTUAL_DIR_URL = '/D8TAVu/share'
+
+# Logging
+LOG_FILE = _str('D8TAVU_LOG_FILE', os.path.join(BASE_DIR, 'app.log'))
+LOG_LEVEL = _str('D8TAVU_LOG_LEVEL', 'INFO')
+LOG_MAX_BYTES = _int('D8TAVU_LOG_MAX_BYTES', 10 * 1024 * 1024)
+LOG_BACKUPS = _int('D8TAVU_LOG_BACKUPS', 5)
+LOG_SAMPLE_RATE = _float('D8TAVU_LOG_SAMPLE_RATE', 1.0)
+LOG_SLOW_MS = _float('D8TAVU_LOG_SLOW_MS', 1000)
+# Per-request cProfile runs (?_profile=1 or X-Profile header) are only honoured when enabled
+PROFILING_ENABLED = _bool('D8TAVU_PROFILING')
+
+# Caches; everything lives under CACHE_DIR unless a directory is given explicitly
+CACHE_DIR = _str('D8TAVU_CACHE_DIR', os.path.join(BASE_DIR, 'py-yfinance'))
+DATASET_DIR = _str('D8TAVU_DATASET_DIR', os.path.join(CACHE_DIR, 'datasets'))
+THUMBNAIL_DIR = _str('D8TAVU_THUMBNAIL_DIR', os.path.join(CACHE_DIR, 'thumbnails'))
+THUMBNAIL_WORKERS = _int('D8TAVU_THUMBNAIL_WORKERS', 2)
+INDEX_INTERVAL = _float('D8TAVU_INDEX_INTERVAL', 300)
+# Seconds a fetch of today's still-forming bar is reused before asking upstream again
+TAIL_TTL = _float('D8TAVU_TAIL_TTL', 60)
+UPLOAD_TTL_HOURS = _float('D8TAVU_UPLOAD_TTL_HOURS', 24)
+INDICATOR_CACHE = _int('D8TAVU_INDICATOR_CACHE', 256)
+CHART_CACHE_MB = _int('D8TAVU_CHART_CACHE_MB', 64)
+CHART_CACHE_DIR = os.environ.get('D8TAVU_CHART_CACHE_DIR') or None
+
+# Market data API; point D8TAVU_MARKET_DATA_URL at a local stand-in server for testing
+MARKET_DATA_URL = _str('D8TAVU_MARKET_DATA_URL', 'https://query2.finance.yahoo.com')
+UPSTREAM_RATE = _float('D8TAVU_UPSTREAM_RATE', 2.0)
+UPSTREAM_BURST = _int('D8TAVU_UPSTREAM_BURST', 5)
+UPSTREAM_CONCURRENCY = _int('D8TAVU_UPSTREAM_CONCURRENCY', 4)
+UPSTREAM_RETRIES = _int('D8TAVU_UPSTREAM_RETRIES', 3)
+UPSTREAM_TIMEOUT = _float('D8TAVU_UPSTREAM_TIMEOUT', 10)
+UPSTREAM_COOLDOWN = _float('D8TAVU_UPSTREAM_COOLDOWN', 30)
+
+# Watchlist file for the scheduled cache warmer (see warmer.example.json); empty disables it
+WARMER_CONFIG = _str('D8TAVU_WARMER_CONFIG', '')
+
+# Live intraday charts (Server-Sent Events). The feed is the market data API, or 'replay'
+# (synthetic bars) / 'replay:<dir of TICKER.csv recordings>' to run offline and in tests
+# Streams are only served by multithreaded servers (gunicorn gthread); under IIS/wfastcgi,
+# which runs one request per process, live mode is off whatever this says
+LIVE_ENABLED = _bool('D8TAVU_LIVE', True)
+LIVE_FEED = _str('D8TAVU_LIVE_FEED', '')
+LIVE_REPLAY_SPEED = _float('D8TAVU_LIVE_REPLAY_SPEED', 1.0)
+# Each open stream holds a server thread; further clients get HTTP 503. The default leaves
+# half of each worker's threads (D8TAVU_THREADS, see gunicorn.conf.py) for other requests
+LIVE_MAX_SUBSCRIBERS = _int('D8TAVU_LIVE_MAX_SUBSCRIBERS', max(1, _int('D8TAVU_THREADS', 8) // 2))
+LIVE_MAX_BARS = _int('D8TAVU_LIVE_MAX_BARS', 500)
+# Seconds after a bar closes before it is fetched, so upstream has its final values
+LIVE_SETTLE = _float('D8TAVU_LIVE_SETTLE', 5)
+LIVE_HEARTBEAT = _float('D8TAVU_LIVE_HEARTBEAT', 15)
+# Streams are closed after this long; browsers reconnect and resume from the last bar they have
+LIVE_MAX_SECONDS = _float('D8TAVU_LIVE_MAX_SECONDS', 3600)
+
+# Front-end assets and response compression
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+# Serve the JSX sources compiled in the browser even when a build (build_assets.py) exists
+DEV_ASSETS = _bool('D8TAVU_DEV_ASSETS')
+COMPRESS_MIN_BYTES = _int('D8TAVU_COMPRESS_MIN_BYTES', 1024)
+BROTLI_QUALITY = _int('D8TAVU_BROTLI_QUALITY', 5)
+GZIP_LEVEL = _int('D8TAVU_GZIP_LEVEL', 6)
+
+# Worker pools
+FETCH_WORKERS = _int('D8TAVU_FETCH_WORKERS', 8)
+RENDER_WORKERS = _int('D8TAVU_RENDER_WORKERS', 2)
+RENDER_QUEUE = _int('D8TAVU_RENDER_QUEUE', 8)
+RENDER_TIMEOUT = _float('D8TAVU_RENDER_TIMEOUT', 30)
+
+# Import the chart stack (pandas, NumPy) at startup instead of on the first chart request.
+# With gunicorn's preload_app this happens once in the master and is shared by the workers.
+PRELOAD_CHART_STACK = _bool('D8TAVU_PRELOAD')
@@ -0,0 +1,237 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import logging
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from price_store import BAR_COLUMNS, _to_date
+from resample import DAILY, period_bounds, resample_bars
+from file_lock import FileLock
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+DATASET_EXTENSIONS = ('.csv', '.parquet')
+# Rows parsed per CSV chunk while converting; bounds memory for very large files
+CSV_CHUNK_ROWS = 1_000_000
+# Bump when the cache layout changes
+CACHE_VERSION = 1
+
+_DATE_NAMES = ('date', 'datetime', 'timestamp', 'time', 'day')
+_COLUMN_ALIASES = {
+    'Open': ('open',),
+    'High': ('high',),
+    'Low': ('low',),
+    'Close': ('close', 'adj close', 'adj_close', 'adjclose', 'price', 'value'),
+    'Volume': ('volume', 'vol'),
+}
+
+
+def map_columns(names: List[str]) -> Dict[str, str]:
+    """
+    Map a file's column names to 'Date' and BAR_COLUMNS names (case-insensitive aliases).
+    The first column is used as the date if none is named like one.
+    :return: {bar column name: file column name}
+    """
+    lower = {str(name).strip().lower(): name for name in names}
+    mapping = {}
+    date = next((lower[n] for n in _DATE_NAMES if n in lower), names[0] if names else None)
+    if date is None:
+        raise ValueError('Dataset has no columns')
+    mapping['Date'] = date
+    for bar_column, aliases in _COLUMN_ALIASES.items():
+        found = next((lower[a] for a in aliases if a in lower), None)
+        if found is not None and found != date:
+            mapping[bar_column] = found
+    if 'Close' not in mapping:
+        raise ValueError('Dataset needs a Close (or Price/Value) column')
+    return mapping
+
+
+def _to_bars(frame: pd.DataFrame) -> pd.DataFrame:
+    """Fill in the bar columns a dataset does not provide so every chart type can draw it"""
+    for column in ('Open', 'High', 'Low'):
+        if column not in frame:
+            frame[column] = frame['Close']
+    for column in ('Volume', 'Dividends', 'Stock Splits'):
+        if column not in frame:
+            frame[column] = 0
+    return frame[BAR_COLUMNS]
+
+
+class DatasetStore:
+    def __init__(self, file_manager, cache_dir: str):
+        """
+        Initialize DatasetStore
+        :param file_manager: FileManager used to validate dataset paths inside the share
+        :param cache_dir: Directory holding the columnar (memory-mapped NumPy) copies of CSV files
+        """
+        self.file_manager = file_manager
+        self.cache_dir = cache_dir
+        self._flight = SingleFlight('dataset')
+        self.conversions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        logger.info(f'DatasetStore initialized with cache_dir: {cache_dir}')
+
+    def resolve(self, rel_path: str):
+        """Validate a share path and return (physical path, stat result)"""
+        path = self.file_manager.get_safe_path(rel_path)
+        if path.suffix.lower() not in DATASET_EXTENSIONS:
+            raise ValueError(f'Unsupported dataset type: {path.suffix or rel_path}')
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise ValueError(f'Dataset not found: {rel_path}')
+        return path, st
+
+    def get_history(self, rel_path: str, start, end, interval: str = DAILY) -> pd.DataFrame:
+        """
+        Bars from a CSV or Parquet file in the share for [start, end)
+        :param rel_path: File path relative to the share root
+        :param interval: 'daily' or a coarser interval, aggregated from the rows on the fly
+        :return: DataFrame indexed by date with BAR_COLUMNS, like PriceStore.get_history
+        """
+        path, st = self.resolve(rel_path)
+        # Whole periods, as PriceStore returns them
+        start, end = period_bounds(_to_date(start), _to_date(end), interval)
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if path.suffix.lower() == '.parquet':
+            hist = self._read_parquet(str(path), start, end)
+        else:
+            cache_path = self._flight.do(str(path), self._ensure_converted, str(path), st)
+            try:
+                hist = self._read_columnar(cache_path, start, end)
+            except FileNotFoundError:
+                # The file changed and its new copy replaced this one; read the new copy
+                path, st = self.resolve(rel_path)
+                cache_path = self._flight.do(str(path), self._ensure_converted, str(path), st)
+                hist = self._read_columnar(cache_path, start, end)
+        return resample_bars(hist, interval)
+
+    def _read_parquet(self, path: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError('Parquet datasets require the pyarrow package')
+        mapping = map_columns(pq.read_schema(path).names)
+        frame = pd.read_parquet(path, columns=list(dict.fromkeys(mapping.values())))
+        frame = frame.rename(columns={v: k for k, v in mapping.items()})
+        frame['Date'] = pd.to_datetime(frame['Date'])
+        frame = frame[(frame['Date'] >= start) & (frame['Date'] < end)].sort_values('Date')
+        return _to_bars(frame.set_index('Date'))
+
+    # Columnar cache of CSV files: one raw .bin array per column plus meta.json,
+    # stored under sha256(path)-mtime_ns-size so an edited file gets a fresh copy
+
+    def _cache_path(self, path: str, st: os.stat_result) -> str:
+        prefix = hashlib.sha256(path.encode()).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f'{prefix}-{st.st_mtime_ns}-{st.st_size}-v{CACHE_VERSION}')
+
+    def _ensure_converted(self, path: str, st: os.stat_result) -> str:
+        cache_path = self._cache_path(path, st)
+        if os.path.exists(os.path.join(cache_path, 'meta.json')):
+            return cache_path
+
+        # SingleFlight coalesces threads; the lock file serializes conversions across workers
+        prefix = os.path.basename(cache_path).split('-')[0]
+        with FileLock(os.path.join(self.cache_dir, f'{prefix}.lock')):
+            if os.path.exists(os.path.join(cache_path, 'meta.json')):
+                return cache_path
+            tmp_path = f'{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+            try:
+                self._convert_csv(path, tmp_path)
+                try:
+                    os.replace(tmp_path, cache_path)
+                except OSError:
+                    # Another worker's copy is already in place
+                    if not os.path.exists(os.path.join(cache_path, 'meta.json')):
+                        raise
+            finally:
+                shutil.rmtree(tmp_path, ignore_errors=True)
+            self.conversions += 1
+
+            # Drop copies of older versions of the same file, but not conversions in progress
+            for name in os.listdir(self.cache_dir):
+                if (name.startswith(prefix + '-') and not name.endswith('.tmp')
+                        and name != os.path.basename(cache_path)):
+                    shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+        return cache_path
+
+    def _convert_csv(self, path: str, out_dir: str) -> None:
+        """Parse a CSV in chunks into one raw array file per column, sorted by date"""
+        os.makedirs(out_dir)
+        header = pd.read_csv(path, nrows=0).columns.tolist()
+        mapping = map_columns(header)
+        files = {column: open(os.path.join(out_dir, f'{column}.bin'), 'wb') for column in mapping}
+        rows = 0
+        ordered = True
+        last_date = None
+        try:
+            reader = pd.read_csv(path, usecols=list(dict.fromkeys(mapping.values())), chunksize=CSV_CHUNK_ROWS)
+            for chunk in reader:
+                dates = pd.to_datetime(chunk[mapping['Date']], errors='coerce').to_numpy('datetime64[ns]')
+                valid = ~np.isnat(dates)
+                dates = dates[valid]
+                if dates.size == 0:
+                    continue
+                if ordered:
+                    ordered = bool(np.all(dates[1:] >= dates[:-1])) and (last_date is None or dates[0] >= last_date)
+                last_date = dates[-1]
+                files['Date'].write(dates.view('int64').tobytes())
+                for column, source in mapping.items():
+                    if column != 'Date':
+                        values = pd.to_numeric(chunk[source], errors='coerce').to_numpy('float64')[valid]
+                        files[column].write(values.tobytes())
+                rows += dates.size
+        finally:
+            for f in files.values():
+                f.close()
+
+        if not ordered:
+            self._sort_columns(out_dir, list(mapping), rows)
+        with open(os.path.join(out_dir, 'meta.json'), 'w') as f:
+            json.dump({'rows': rows, 'columns': list(mapping), 'source': path}, f)
+        logger.info(f'Converted dataset {path} to columnar cache ({rows} rows)')
+
+    @staticmethod
+    def _sort_columns(out_dir: str, columns: List[str], rows: int) -> None:
+        """Reorder every column by date, one column at a time"""
+        dates = np.fromfile(os.path.join(out_dir, 'Date.bin'), dtype='int64')
+        order = np.argsort(dates, kind='stable')
+        del dates
+        for column in columns:
+            dtype = 'int64' if column == 'Date' else 'float64'
+            column_path = os.path.join(out_dir, f'{column}.bin')
+            values = np.memmap(column_path, dtype=dtype, mode='r', shape=(rows,))
+            np.take(values, order).tofile(column_path + '.sorted')
+            del values
+            os.replace(column_path + '.sorted', column_path)
+
+    @staticmethod
+    def _read_columnar(cache_path: str, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+        with open(os.path.join(cache_path, 'meta.json')) as f:
+            meta = json.load(f)
+        rows = meta['rows']
+        if rows == 0:
+            return _to_bars(pd.DataFrame({'Close': []}, index=pd.DatetimeIndex([], name='Date')))
+
+        def column(name, dtype):
+            return np.memmap(os.path.join(cache_path, f'{name}.bin'), dtype=dtype, mode='r', shape=(rows,))
+
+        # Only the pages holding the requested date range are read from disk
+        dates = column('Date', 'int64')
+        lo, hi = np.searchsorted(dates, [start.value, end.value], side='left')
+        index = pd.DatetimeIndex(np.array(dates[lo:hi]).view('datetime64[ns]'), name='Date')
+        frame = pd.DataFrame(
+            {name: np.array(column(name, 'float64')[lo:hi]) for name in meta['columns'] if name != 'Date'},
+            index=index)
+        return _to_bars(frame)
+
+    def stats(self) -> dict:
+        """CSV conversions since startup"""
+        return {'conversions': self.conversions, **self._flight.stats()}
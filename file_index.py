@@ -0,0 +1,306 @@
+import os
+import json
+import stat
+import time
+import sqlite3
+import datetime
+import threading
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MODES = ('substring', 'prefix')
+SEARCH_MAX_LIMIT = 500
+# Refresh claims older than this many intervals are removed
+CLAIM_RETENTION_INTERVALS = 12
+
+
+def _join(parent: str, name: str) -> str:
+    return f'{parent}/{name}' if parent else name
+
+
+def _like_escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class FileIndex:
+    def __init__(self, root_path: str, db_path: str, interval: float = 300.0, full_rescan_every: int = 12):
+        """
+        Initialize FileIndex
+        :param root_path: Physical path of the tree to index
+        :param db_path: Path to the SQLite database holding the index
+        :param interval: Seconds between background refreshes (0 disables the background thread).
+            Every process sharing db_path runs the thread, but each interval is claimed through a
+            file next to the database, so only one of them refreshes the index
+        :param full_rescan_every: Re-list every directory on every Nth refresh, to pick up files
+            changed in place (which does not change their directory's mtime)
+        """
+        self.root_path = os.path.abspath(root_path)
+        self.db_path = db_path
+        self.interval = interval
+        self.full_rescan_every = full_rescan_every
+        self.claim_dir = os.path.abspath(db_path) + '.claims'
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._refresh_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS entries (
+                    path TEXT PRIMARY KEY,
+                    parent TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    name_lower TEXT NOT NULL,
+                    ext TEXT NOT NULL,
+                    is_dir INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS entries_parent ON entries (parent);
+                CREATE INDEX IF NOT EXISTS entries_name ON entries (name_lower);
+                CREATE INDEX IF NOT EXISTS entries_ext ON entries (ext, name_lower);
+                CREATE TABLE IF NOT EXISTS dirs (
+                    path TEXT PRIMARY KEY,
+                    mtime_ns INTEGER NOT NULL,
+                    own_size INTEGER NOT NULL,
+                    own_files INTEGER NOT NULL,
+                    total_size INTEGER NOT NULL,
+                    total_files INTEGER NOT NULL
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS last_refresh (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    finished REAL NOT NULL,
+                    stats TEXT NOT NULL
+                );
+            ''')
+        logger.info(f'FileIndex initialized with root_path: {self.root_path}, db_path: {db_path}')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def start(self) -> None:
+        """Start the background refresh thread (idempotent)"""
+        if self.interval <= 0 or self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='file-index', daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            # Intervals are numbered from the epoch, so every process agrees on them
+            slot = int(time.time() // self.interval)
+            try:
+                if self._claim(slot):
+                    self.refresh(full=self.full_rescan_every > 0 and slot % self.full_rescan_every == 0)
+            except Exception as e:
+                logger.error(f'Error refreshing file index: {str(e)}', exc_info=True)
+            # Wake at the start of the next interval, together with the other processes
+            self._stop.wait(self.interval - time.time() % self.interval)
+
+    def _claim(self, slot: int) -> bool:
+        """Claim an interval's refresh for this process; False if another process has it"""
+        os.makedirs(self.claim_dir, exist_ok=True)
+        name = f'refresh-{slot}.claim'
+        try:
+            fd = os.open(os.path.join(self.claim_dir, name), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        for entry in os.scandir(self.claim_dir):
+            stem = entry.name[len('refresh-'):-len('.claim')]
+            if stem.isdigit() and int(stem) < slot - CLAIM_RETENTION_INTERVALS:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+        return True
+
+    def refresh(self, full: bool = False) -> dict:
+        """
+        Bring the index up to date. Only directories whose mtime changed are re-listed;
+        unchanged directories are descended into using the subdirectories already indexed.
+        :param full: Re-list every directory regardless of its mtime
+        :return: Counts of scanned and unchanged directories and the elapsed time
+        """
+        with self._refresh_lock:
+            started = time.perf_counter()
+            counts = {'scanned': 0, 'unchanged': 0, 'removed': 0}
+            with self._connect() as conn:
+                known = {path: (mtime_ns, own_size, own_files) for path, mtime_ns, own_size, own_files
+                         in conn.execute('SELECT path, mtime_ns, own_size, own_files FROM dirs')}
+                seen = set()
+                self._refresh_dir(conn, '', known, seen, counts, full)
+                removed = [path for path in known if path not in seen]
+                for path in removed:
+                    conn.execute('DELETE FROM dirs WHERE path = ?', (path,))
+                    conn.execute('DELETE FROM entries WHERE parent = ?', (path,))
+                counts['removed'] = len(removed)
+                stats = dict(counts, duration_ms=round((time.perf_counter() - started) * 1000.0, 1))
+                # Recorded in the index so every process reports (and keys its ETags on) the same refresh
+                conn.execute('INSERT OR REPLACE INTO last_refresh (id, finished, stats) VALUES (1, ?, ?)',
+                             (time.time(), json.dumps(stats)))
+            logger.info('File index refreshed: %s', stats)
+            return stats
+
+    def _last_refresh(self) -> Tuple[Optional[datetime.datetime], dict]:
+        with self._connect() as conn:
+            row = conn.execute('SELECT finished, stats FROM last_refresh WHERE id = 1').fetchone()
+        if row is None:
+            return None, {}
+        return datetime.datetime.fromtimestamp(row[0]), json.loads(row[1])
+
+    @property
+    def last_refresh(self) -> Optional[datetime.datetime]:
+        """When the index was last refreshed, by any process"""
+        return self._last_refresh()[0]
+
+    def _refresh_dir(self, conn: sqlite3.Connection, rel_path: str, known: dict, seen: set,
+                     counts: dict, full: bool) -> Tuple[int, int]:
+        """Refresh one directory and its subtree; returns (total size, total file count)"""
+        full_path = os.path.join(self.root_path, rel_path) if rel_path else self.root_path
+        try:
+            mtime_ns = os.stat(full_path).st_mtime_ns
+        except OSError as e:
+            logger.debug('Cannot stat %s: %s', full_path, e)
+            return 0, 0
+        seen.add(rel_path)
+
+        previous = known.get(rel_path)
+        if not full and previous is not None and previous[0] == mtime_ns:
+            counts['unchanged'] += 1
+            _, own_size, own_files = previous
+            subdirs = [row[0] for row in conn.execute(
+                'SELECT name FROM entries WHERE parent = ? AND is_dir = 1', (rel_path,))]
+        else:
+            counts['scanned'] += 1
+            own_size, own_files, subdirs = self._scan_dir(conn, rel_path, full_path)
+
+        total_size, total_files = own_size, own_files
+        for name in subdirs:
+            size, files = self._refresh_dir(conn, _join(rel_path, name), known, seen, counts, full)
+            total_size += size
+            total_files += files
+
+        conn.execute(
+            'INSERT OR REPLACE INTO dirs (path, mtime_ns, own_size, own_files, total_size, total_files) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (rel_path, mtime_ns, own_size, own_files, total_size, total_files))
+        if rel_path:
+            conn.execute('UPDATE entries SET size = ? WHERE path = ?', (total_size, rel_path))
+        return total_size, total_files
+
+    def _scan_dir(self, conn: sqlite3.Connection, rel_path: str, full_path: str) -> Tuple[int, int, List[str]]:
+        """Replace the indexed entries of one directory; returns (own size, own file count, subdirectories)"""
+        rows, subdirs = [], []
+        own_size = own_files = 0
+        try:
+            with os.scandir(full_path) as entries:
+                for entry in entries:
+                    if entry.name.startswith('.') and entry.name.endswith('.part'):
+                        continue  # upload in progress
+                    try:
+                        # Directory symlinks are indexed as entries but not followed, to avoid cycles
+                        st = entry.stat(follow_symlinks=False)
+                        if stat.S_ISLNK(st.st_mode):
+                            st = entry.stat()
+                    except OSError:
+                        continue
+                    is_dir = stat.S_ISDIR(st.st_mode)
+                    name = entry.name
+                    if is_dir:
+                        if not entry.is_symlink():
+                            subdirs.append(name)
+                        size, ext = 0, ''
+                    else:
+                        size, ext = st.st_size, os.path.splitext(name)[1].lower().lstrip('.')
+                        own_size += size
+                        own_files += 1
+                    rows.append((_join(rel_path, name), rel_path, name, name.lower(), ext,
+                                 int(is_dir), size, st.st_mtime))
+        except OSError as e:
+            logger.warning(f'Cannot list {full_path} for the file index: {str(e)}')
+
+        conn.execute('DELETE FROM entries WHERE parent = ?', (rel_path,))
+        conn.executemany(
+            'INSERT OR REPLACE INTO entries (path, parent, name, name_lower, ext, is_dir, size, mtime) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return own_size, own_files, subdirs
+
+    def search(self, query: str = '', mode: str = 'substring', ext: Optional[str] = None,
+               path: str = '', limit: int = 100) -> List[dict]:
+        """
+        Search indexed names
+        :param query: Case-insensitive text to match against file and folder names
+        :param mode: 'substring' or 'prefix'
+        :param ext: Only return files with this extension (e.g. 'pdf')
+        :param path: Only return entries below this folder
+        :param limit: Maximum number of results
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f'Invalid search mode: {mode}')
+        query = (query or '').strip().lower()
+        ext = (ext or '').strip().lower().lstrip('.')
+        path = (path or '').strip('/')
+        if not query and not ext:
+            raise ValueError('A search query or extension is required')
+
+        clauses, args = [], []
+        if query and mode == 'prefix':
+            # Range scan on the name index
+            clauses.append('name_lower >= ? AND name_lower < ?')
+            args += [query, query + '\uffff']
+        elif query:
+            clauses.append("name_lower LIKE ? ESCAPE '\\'")
+            args.append(f'%{_like_escape(query)}%')
+        if ext:
+            clauses.append('ext = ? AND is_dir = 0')
+            args.append(ext)
+        if path:
+            clauses.append("(parent = ? OR parent LIKE ? ESCAPE '\\')")
+            args += [path, f'{_like_escape(path)}/%']
+
+        limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f'SELECT path, name, is_dir, size, mtime FROM entries WHERE {" AND ".join(clauses)} '
+                'ORDER BY is_dir DESC, name_lower LIMIT ?', args + [limit]).fetchall()
+        return [
+            {'path': p, 'name': name, 'is_dir': bool(is_dir), 'size': size,
+             'modified': datetime.datetime.fromtimestamp(mtime).isoformat(timespec='seconds')}
+            for p, name, is_dir, size, mtime in rows
+        ]
+
+    def folder_stats(self, paths: Iterable[str]) -> Dict[str, Tuple[int, int]]:
+        """Recursive (size, file count) for indexed folders; folders not yet indexed are omitted"""
+        paths = [p.strip('/') for p in paths]
+        result = {}
+        with self._connect() as conn:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(paths), 500):
+                chunk = paths[i:i + 500]
+                result.update(
+                    (path, (size, files)) for path, size, files in conn.execute(
+                        f'SELECT path, total_size, total_files FROM dirs '
+                        f'WHERE path IN ({", ".join("?" * len(chunk))})', chunk))
+        return result
+
+    def stats(self) -> dict:
+        """Index size and the outcome of the last refresh"""
+        with self._connect() as conn:
+            entries, = conn.execute('SELECT COUNT(*) FROM entries').fetchone()
+        last_refresh, last_stats = self._last_refresh()
+        return {
+            'entries': entries,
+            'last_refresh': last_refresh.isoformat(timespec='seconds') if last_refresh else None,
+            **{f'last_{k}': v for k, v in last_stats.items()},
+        }
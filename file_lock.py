@@ -0,0 +1,55 @@
+import os
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+
+class FileLock:
+    """
+    Exclusive lock on a lock file, held for the duration of a with block. It excludes other
+    processes (wfastcgi/gunicorn workers) as well as other threads, since each FileLock opens
+    its own handle: fcntl.flock on POSIX, msvcrt.locking on Windows. Blocks until acquired.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize FileLock
+        :param path: Lock file, created if missing and left in place afterwards
+        """
+        self.path = path
+        self._fd = None
+
+    def __enter__(self) -> 'FileLock':
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                # LK_LOCK gives up after about 10 seconds; keep waiting
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        logger.debug('Still waiting for lock %s', self.path)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        fd, self._fd = self._fd, None
+        try:
+            if fcntl is None:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            # Closing the descriptor releases a flock
+            os.close(fd)
@@ -1,9 +1,13 @@
 import os
+import stat
+import time
 import datetime
 import mimetypes
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 import shutil
 import logging
 
@@ -19,23 +23,48 @@ class FileInfo:
     mime_type: Optional[str] = None
     icon_class: str = "fa-file"
 
+# Sort orders for list_directory; folders always come first
+SORT_KEYS = {
+    'name': lambda f: f.name.lower(),
+    'size': lambda f: f.size,
+    'modified': lambda f: f.modified_time,
+    'type': lambda f: (f.mime_type or '', f.name.lower()),
+}
+
+# Directories modified this recently are not cached, since coarse mtime
+# resolution could hide a change made within the same tick
+_MTIME_SETTLE_SECONDS = 2.0
+
+def _is_upload_part(name: str) -> bool:
+    """Temp files of uploads in progress are hidden from listings"""
+    return name.startswith('.') and name.endswith('.part')
+
+@dataclass
+class _Listing:
+    mtime_ns: int
+    files: List[FileInfo]
+    sorted: Dict[Tuple[str, bool], List[FileInfo]]
+
 class FileManager:
-    def __init__(self, root_path: str, base_url: str = "/D8TAVu/share"):
+    def __init__(self, root_path: str, base_url: str = "/D8TAVu/share", max_cached_dirs: int = 128):
         """
         Initialize FileManager
         :param root_path: Physical path to the directory
         :param base_url: Base URL for file access
+        :param max_cached_dirs: Number of directory listings kept in memory
         """
-        self.root_path = Path(root_path)
+        # Resolved once so relative roots (e.g. from D8TAVU_USER_FILES) compare with resolved paths
+        self.root_path = Path(root_path).resolve()
         self.base_url = base_url
-        logger.info(f'FileManager initialized with root_path: {root_path}, base_url: {base_url}')
+        self.max_cached_dirs = max_cached_dirs
+        self._listings: 'OrderedDict[str, _Listing]' = OrderedDict()
+        self._listings_lock = threading.Lock()
+        logger.info('FileManager initialized with root_path: %s, base_url: %s', root_path, base_url)
 
     def check_access(self) -> bool:
         """Check if we can access the root directory"""
         try:
-            logger.info(f'Checking access to: {self.root_path}')
-            stat_result = self.root_path.stat()
-            logger.info(f'Access check successful. Mode: {stat_result.st_mode}')
+            self.root_path.stat()
             return True
         except (PermissionError, OSError) as e:
             logger.error(f'Access check failed: {str(e)}', exc_info=True)
@@ -43,113 +72,197 @@ class FileManager:
 
     def get_safe_path(self, requested_path: str) -> Path:
         """Ensure the requested path is within the root directory"""
-        logger.info(f'Getting safe path for: {requested_path}')
         requested_path = requested_path.strip("/")
         full_path = self.root_path / requested_path
         try:
             # Resolve to absolute path and check if it's within root
             real_path = full_path.resolve()
-            if not str(real_path).startswith(str(self.root_path)):
+            if real_path != self.root_path and self.root_path not in real_path.parents:
                 logger.error(f'Access denied: Path outside root directory')
                 raise ValueError("Access denied: Path outside root directory")
-            logger.info(f'Safe path resolved to: {real_path}')
+            logger.debug('Safe path %r resolved to: %s', requested_path, real_path)
             return real_path
         except (ValueError, RuntimeError) as e:
             logger.error(f'Error resolving safe path: {str(e)}', exc_info=True)
             raise ValueError("Invalid path")
 
+    def _within_root(self, physical: str) -> bool:
+        """Whether a physical path, once symlinks are resolved, is inside the root directory"""
+        try:
+            real_path = Path(physical).resolve()
+        except (OSError, RuntimeError):
+            return False
+        return real_path == self.root_path or self.root_path in real_path.parents
+
     def get_mime_type(self, path: Path) -> str:
         """Get MIME type for a file"""
-        logger.info(f'Getting MIME type for: {path}')
         mime_type, _ = mimetypes.guess_type(str(path))
-        logger.info(f'MIME type resolved to: {mime_type}')
         return mime_type or "application/octet-stream"
 
-    def get_icon_class(self, path: Path, is_dir: bool) -> str:
-        """Get Font Awesome icon class based on file type"""
-        logger.info(f'Getting icon class for: {path}')
+    def get_icon_class(self, path: Path, is_dir: bool, mime_type: Optional[str] = None) -> str:
+        """Get Font Awesome icon class based on file type (pass mime_type if already known)"""
         if is_dir:
-            logger.info(f'Icon class resolved to: fa-folder')
             return "fa-folder"
         
-        mime_type = self.get_mime_type(path)
+        mime_type = mime_type or self.get_mime_type(path)
         if mime_type:
             if mime_type.startswith("image/"):
-                logger.info(f'Icon class resolved to: fa-file-image')
                 return "fa-file-image"
             elif mime_type.startswith("video/"):
-                logger.info(f'Icon class resolved to: fa-file-video')
                 return "fa-file-video"
             elif mime_type.startswith("audio/"):
-                logger.info(f'Icon class resolved to: fa-file-audio')
                 return "fa-file-audio"
             elif mime_type in ["application/pdf"]:
-                logger.info(f'Icon class resolved to: fa-file-pdf')
                 return "fa-file-pdf"
             elif mime_type in ["application/msword", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"]:
-                logger.info(f'Icon class resolved to: fa-file-word')
                 return "fa-file-word"
             elif mime_type in ["application/vnd.ms-excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"]:
-                logger.info(f'Icon class resolved to: fa-file-excel')
                 return "fa-file-excel"
-        logger.info(f'Icon class resolved to: fa-file')
         return "fa-file"
 
     def get_file(self, requested_path: str) -> tuple[Path, str]:
         """Get file path and mime type"""
-        logger.info(f'Getting file for: {requested_path}')
         file_path = self.get_safe_path(requested_path)
         if not file_path.is_file():
             logger.error(f'Not a file: {file_path}')
             raise ValueError("Not a file")
-        logger.info(f'File resolved to: {file_path}')
         return file_path, self.get_mime_type(file_path)
 
     def get_download_url(self, path: str) -> str:
         """Get the URL for downloading a file"""
-        logger.info(f'Getting download URL for: {path}')
-        url = f"{self.base_url}/static/{path.strip('/')}"
-        logger.info(f'Download URL resolved to: {url}')
-        return url
+        return f"{self.base_url}/static/{path.strip('/')}"
 
-    def list_directory(self, path: str = "") -> List[FileInfo]:
-        """List contents of a directory"""
+    def directory_mtime(self, path: str = "") -> datetime.datetime:
+        """Modification time of a directory; changes whenever an entry is added, removed or renamed"""
+        try:
+            return datetime.datetime.fromtimestamp(self.get_safe_path(path).stat().st_mtime)
+        except FileNotFoundError:
+            raise ValueError("Not a directory")
+
+    def list_directory(self, path: str = "", sort: str = "name", descending: bool = False) -> List[FileInfo]:
+        """
+        List contents of a directory
+        :param path: Directory path relative to the root
+        :param sort: One of SORT_KEYS
+        :param descending: Reverse the sort order (folders still come first)
+        :return: Sorted entries; callers must not modify the returned list
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Invalid sort key: {sort}")
         try:
-            logger.info(f'Listing directory: {path}')
             dir_path = self.get_safe_path(path)
-            if not dir_path.is_dir():
+            try:
+                dir_stat = dir_path.stat()
+            except FileNotFoundError:
+                raise ValueError("Not a directory")
+            if not stat.S_ISDIR(dir_stat.st_mode):
                 logger.error(f'Path is not a directory: {dir_path}')
                 raise ValueError("Not a directory")
 
-            files = []
-            for item in dir_path.iterdir():
-                try:
-                    logger.info(f'Processing entry: {item}')
-                    relative_path = str(item.relative_to(self.root_path)).replace("\\", "/")
-                    files.append(FileInfo(
-                        name=item.name,
-                        path=relative_path,
-                        is_dir=item.is_dir(),
-                        size=item.stat().st_size if item.is_file() else 0,
-                        modified_time=datetime.datetime.fromtimestamp(item.stat().st_mtime),
-                        mime_type=self.get_mime_type(item) if item.is_file() else None,
-                        icon_class=self.get_icon_class(item, item.is_dir())
-                    ))
-                except Exception as e:
-                    logger.error(f'Error processing entry {item}: {str(e)}', exc_info=True)
-                    continue
+            # Adding, removing or renaming an entry bumps the directory's mtime
+            key = str(dir_path)
+            with self._listings_lock:
+                listing = self._listings.get(key)
+                if listing is not None and listing.mtime_ns == dir_stat.st_mtime_ns:
+                    self._listings.move_to_end(key)
+                else:
+                    listing = None
+            if listing is None:
+                listing = _Listing(dir_stat.st_mtime_ns, self._scan(dir_path), {})
+                if time.time() - dir_stat.st_mtime > _MTIME_SETTLE_SECONDS:
+                    with self._listings_lock:
+                        self._listings[key] = listing
+                        while len(self._listings) > self.max_cached_dirs:
+                            self._listings.popitem(last=False)
 
-            logger.info(f'Successfully listed {len(files)} entries')
-            return sorted(files, key=lambda x: (not x.is_dir, x.name.lower()))
+            order = (sort, descending)
+            result = listing.sorted.get(order)
+            if result is None:
+                sort_key = SORT_KEYS[sort]
+                dirs = sorted((f for f in listing.files if f.is_dir), key=sort_key, reverse=descending)
+                files = sorted((f for f in listing.files if not f.is_dir), key=sort_key, reverse=descending)
+                result = listing.sorted[order] = dirs + files
+            return result
         except Exception as e:
             logger.error(f'Error listing directory: {str(e)}', exc_info=True)
             raise
 
+    def _scan(self, dir_path: Path) -> List[FileInfo]:
+        """Read a directory with os.scandir, making one stat call per entry"""
+        started = time.perf_counter()
+        rel_dir = str(dir_path.relative_to(self.root_path)).replace("\\", "/")
+        prefix = "" if rel_dir == "." else rel_dir + "/"
+
+        files = []
+        errors = 0
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if _is_upload_part(entry.name):
+                    continue
+                try:
+                    st = entry.stat()
+                    is_dir = stat.S_ISDIR(st.st_mode)
+                    mime_type = None if is_dir else self.get_mime_type(entry.name)
+                    files.append(FileInfo(
+                        name=entry.name,
+                        path=prefix + entry.name,
+                        is_dir=is_dir,
+                        size=0 if is_dir else st.st_size,
+                        modified_time=datetime.datetime.fromtimestamp(st.st_mtime),
+                        mime_type=mime_type,
+                        icon_class=self.get_icon_class(entry.name, is_dir, mime_type)
+                    ))
+                except OSError as e:
+                    errors += 1
+                    logger.debug('Error processing entry %s: %s', entry.path, e)
+
+        # One summary line per listing instead of one per entry
+        if errors:
+            logger.warning('Skipped %d unreadable entries in %s', errors, dir_path)
+        logger.debug('Scanned %s: %d entries, %d errors in %.1f ms',
+                     dir_path, len(files), errors, (time.perf_counter() - started) * 1000.0)
+        return files
+
+    def walk(self, path: str = "") -> Iterator[Tuple[str, str, os.stat_result, bool]]:
+        """
+        Lazily walk a directory tree, depth first
+        :param path: Directory path relative to the root
+        :return: Iterator of (physical path, path relative to the walked directory, stat result, is_dir);
+            directory symlinks are not followed, and file symlinks pointing outside the root are skipped
+        """
+        dir_path = self.get_safe_path(path)
+        if not dir_path.is_dir():
+            raise ValueError("Not a directory")
+        stack = [(str(dir_path), "")]
+        while stack:
+            physical, relative = stack.pop()
+            try:
+                with os.scandir(physical) as entries:
+                    children = sorted(entries, key=lambda e: e.name)
+            except OSError as e:
+                logger.warning('Skipping unreadable directory %s: %s', physical, e)
+                continue
+            subdirs = []
+            for entry in children:
+                if _is_upload_part(entry.name):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError as e:
+                    logger.debug('Error processing entry %s: %s', entry.path, e)
+                    continue
+                rel = f"{relative}/{entry.name}" if relative else entry.name
+                is_dir = stat.S_ISDIR(st.st_mode)
+                if entry.is_symlink() and (is_dir or not self._within_root(entry.path)):
+                    continue
+                yield entry.path, rel, st, is_dir
+                if is_dir:
+                    subdirs.append((entry.path, rel))
+            stack.extend(reversed(subdirs))
+
     def get_breadcrumbs(self, rel_path: str) -> List[tuple]:
         """Generate breadcrumb navigation items"""
-        logger.info(f'Getting breadcrumbs for: {rel_path}')
         if not rel_path:
-            logger.info(f'Breadcrumbs resolved to: [("Home", "")]')
             return [("Home", "")]
 
         parts = rel_path.strip("/").split("/")
@@ -161,7 +274,6 @@ class FileManager:
                 current_path = f"{current_path}/{part}" if current_path else part
                 breadcrumbs.append((part, current_path))
 
-        logger.info(f'Breadcrumbs resolved to: {breadcrumbs}')
         return breadcrumbs
 
     def create_directory(self, rel_path: str) -> None:
@@ -180,7 +292,14 @@ class FileManager:
         try:
             logger.info(f'Uploading file to: {rel_path}')
             file_path = self.get_safe_path(rel_path)
-            file.save(str(file_path))
+            # Write next to the target and rename, so a failed upload never leaves a partial file
+            tmp_path = file_path.parent / f'.{file_path.name}.{os.getpid()}.{threading.get_ident()}.part'
+            try:
+                file.save(str(tmp_path))
+                os.replace(tmp_path, file_path)
+            finally:
+                if tmp_path.exists():
+                    tmp_path.unlink()
             logger.info(f'File uploaded successfully: {file_path}')
         except ValueError as e:
             logger.error(f'Error uploading file: {str(e)}', exc_info=True)
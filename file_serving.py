@@ -0,0 +1,189 @@
+import os
+import re
+import stat
+import secrets
+import datetime
+import unicodedata
+import logging
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from flask import Response, request
+from werkzeug.http import http_date, is_resource_modified, parse_date
+
+logger = logging.getLogger(__name__)
+
+# Read size for streamed (non zero-copy) bodies; bounds memory per download
+BUFFER_SIZE = 256 * 1024
+# More ranges than this are answered with the whole file (guards against range abuse)
+MAX_RANGES = 16
+# WSGI servers whose wsgi.file_wrapper uses sendfile() from the current file position and
+# stops after Content-Length bytes, so even a single range can be sent zero-copy
+BOUNDED_SENDFILE_SERVERS = ('gunicorn',)
+
+_RANGE_SPEC = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+
+ByteRange = Tuple[int, int]  # [start, stop)
+
+
+def file_etag(st: os.stat_result) -> str:
+    """Strong validator built from the file's size and modification time"""
+    return f'{st.st_mtime_ns:x}-{st.st_size:x}'
+
+
+def parse_ranges(header: Optional[str], size: int) -> Optional[List[ByteRange]]:
+    """
+    Parse a Range header against a file size
+    :return: None to serve the whole file (no, malformed or too many ranges), an empty
+        list if no range is satisfiable, else sorted, coalesced [start, stop) ranges
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    specs = header[len('bytes='):].split(',')
+    if len(specs) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for spec in specs:
+        match = _RANGE_SPEC.match(spec)
+        if not match or match.group(1) == match.group(2) == '':
+            return None
+        first, last = match.groups()
+        if first == '':
+            # Suffix range: the last N bytes
+            start, stop = max(size - int(last), 0), size
+        else:
+            start = int(first)
+            stop = size if last == '' else min(int(last) + 1, size)
+            if last != '' and int(last) < start:
+                return None
+        if start < stop:
+            ranges.append((start, stop))
+
+    merged: List[ByteRange] = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def _read_range(path: str, start: int, stop: int) -> Iterator[bytes]:
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            buffer = f.read(min(BUFFER_SIZE, remaining))
+            if not buffer:
+                break
+            remaining -= len(buffer)
+            yield buffer
+
+
+def _multipart_body(path: str, ranges: List[ByteRange], size: int, mimetype: str,
+                    boundary: str) -> Tuple[Iterator[bytes], int]:
+    """multipart/byteranges body and its exact length"""
+    headers = [
+        (f'--{boundary}\r\nContent-Type: {mimetype}\r\n'
+         f'Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n').encode()
+        for start, stop in ranges
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode()
+    length = sum(len(h) + (stop - start) for h, (start, stop) in zip(headers, ranges))
+    length += 2 * (len(ranges) - 1) + len(closing)
+
+    def generate():
+        for i, (part_header, (start, stop)) in enumerate(zip(headers, ranges)):
+            yield (b'\r\n' if i else b'') + part_header
+            yield from _read_range(path, start, stop)
+        yield closing
+    return generate(), length
+
+
+def content_disposition(filename: str, as_attachment: bool) -> str:
+    """Content-Disposition value with an ASCII fallback and an RFC 5987 UTF-8 name"""
+    kind = 'attachment' if as_attachment else 'inline'
+    ascii_name = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+    ascii_name = ascii_name.replace('\\', '\\\\').replace('"', '\\"')
+    if ascii_name == filename:
+        return f'{kind}; filename="{ascii_name}"'
+    return f"{kind}; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+def _if_range_matches(etag: str, modified: datetime.datetime) -> bool:
+    """If-Range: honour the Range header only if the client's copy is still current"""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == f'"{etag}"'
+    since = parse_date(if_range)
+    return since is not None and int(modified.timestamp()) <= int(since.timestamp())
+
+
+def _file_body(path: str, start: int, stop: int, size: int):
+    """
+    Body for [start, stop): the server's wsgi.file_wrapper (sendfile) when it can be used
+    safely, otherwise a generator reading BUFFER_SIZE blocks
+    """
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    bounded = request.environ.get('SERVER_SOFTWARE', '').lower().startswith(BOUNDED_SENDFILE_SERVERS)
+    if file_wrapper is not None and (stop == size or bounded):
+        f = open(path, 'rb')
+        f.seek(start)
+        return file_wrapper(f, BUFFER_SIZE), True
+    return _read_range(path, start, stop), False
+
+
+def send_ranged_file(path: str, mimetype: str, as_attachment: bool = True,
+                     download_name: Optional[str] = None) -> Response:
+    """
+    Send a file with Range/multi-range support, stat-based ETag/Last-Modified validation
+    and zero-copy transfer where the WSGI server offers it
+    :param path: Physical path of the file
+    :param mimetype: Content type of the file
+    :param as_attachment: Send as an attachment (download) rather than inline (e.g. video playback)
+    :param download_name: File name presented to the client (default: the file's name)
+    """
+    st = os.stat(path)
+    if not stat.S_ISREG(st.st_mode):
+        raise ValueError('Not a file')
+    size = st.st_size
+    etag = file_etag(st)
+    modified = datetime.datetime.fromtimestamp(int(st.st_mtime), tz=datetime.timezone.utc)
+
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{etag}"',
+        'Last-Modified': http_date(modified),
+        'Content-Disposition': content_disposition(download_name or os.path.basename(path), as_attachment),
+        # Clients may keep a copy but must revalidate, which is a cheap 304 when unchanged
+        'Cache-Control': 'private, no-cache',
+    }
+    if not is_resource_modified(request.environ, etag=etag, last_modified=modified):
+        return Response(status=304, headers={k: headers[k] for k in ('ETag', 'Last-Modified', 'Cache-Control')})
+
+    ranges = parse_ranges(request.headers.get('Range'), size) if _if_range_matches(etag, modified) else None
+    if ranges == []:
+        return Response(status=416, headers={'Content-Range': f'bytes */{size}', 'Accept-Ranges': 'bytes'})
+
+    if ranges is None or ranges == [(0, size)]:
+        body, zero_copy = _file_body(path, 0, size, size)
+        response = Response(body, status=200, mimetype=mimetype, headers=headers, direct_passthrough=True)
+        response.content_length = size
+    elif len(ranges) == 1:
+        (start, stop), = ranges
+        body, zero_copy = _file_body(path, start, stop, size)
+        response = Response(body, status=206, mimetype=mimetype, headers=headers, direct_passthrough=True)
+        response.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+        response.content_length = stop - start
+    else:
+        boundary = secrets.token_hex(16)
+        body, length = _multipart_body(path, ranges, size, mimetype, boundary)
+        zero_copy = False
+        response = Response(body, status=206, headers=headers, direct_passthrough=True,
+                            content_type=f'multipart/byteranges; boundary={boundary}')
+        response.content_length = length
+    logger.debug('Serving %s: status=%d ranges=%s zero_copy=%s', path, response.status_code, ranges, zero_copy)
+    return response
@@ -0,0 +1,27 @@
+# gunicorn settings for running D8TAVu on Linux: gunicorn -c gunicorn.conf.py wsgi:application
+# Application settings (share path, caches, pools) are read by config.py from D8TAVU_* variables.
+import os
+import multiprocessing
+
+bind = os.environ.get('D8TAVU_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('D8TAVU_WORKERS') or min(multiprocessing.cpu_count() + 1, 8))
+# Threads keep long downloads, uploads and ZIP streams from tying up a whole worker
+worker_class = 'gthread'
+threads = int(os.environ.get('D8TAVU_THREADS') or 8)
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+# Import the app once in the master and fork workers from it. Importing app.py only creates
+# lazily started pools and threads, so this is fork-safe; set D8TAVU_PRELOAD=1 to also import
+# the chart stack (pandas, NumPy) here so workers share it copy-on-write instead of each
+# importing it on their first chart request.
+preload_app = True
+
+# Recycle workers now and then to bound memory growth (jitter avoids restarting all at once)
+max_requests = int(os.environ.get('D8TAVU_MAX_REQUESTS') or 5000)
+max_requests_jitter = max_requests // 10
+
+# Downloads go through wsgi.file_wrapper, which gunicorn implements with sendfile()
+sendfile = True
+accesslog = None
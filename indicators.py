@@ -0,0 +1,323 @@
+import threading
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MAX_INDICATORS = 10
+
+
+class Indicator(ABC):
+    """
+    Base class for technical indicators.
+
+    Every indicator is written as an update step: ``update(state, bars)`` computes the
+    values for ``bars`` given the state left after the previous bars, and returns the
+    new state. A full computation is simply ``update(None, bars)``, so the same
+    vectorized kernel serves both full and incremental computation.
+    """
+    name = ''
+    panel = 'price'  # 'price' overlays the price axis; anything else gets its own panel
+
+    def __init__(self, *args: float):
+        self.args = args
+
+    @property
+    def key(self) -> str:
+        """Normalized spec string, e.g. 'sma:20'"""
+        return ':'.join([self.name] + [_fmt_arg(a) for a in self.args])
+
+    @property
+    def label(self) -> str:
+        if not self.args:
+            return self.name.upper()
+        return f"{self.name.upper()}({','.join(_fmt_arg(a) for a in self.args)})"
+
+    def outputs(self) -> Dict[str, str]:
+        """{DataFrame column: payload key} for the series this indicator produces"""
+        return {self.label: self.key.replace(':', '_')}
+
+    @abstractmethod
+    def update(self, state: Any, bars: pd.DataFrame) -> Tuple[pd.DataFrame, Any]:
+        """
+        Compute values for bars, continuing from state
+        :param state: State returned for the previous bars, or None to start from scratch
+        :param bars: Bars following the ones state was computed from
+        :return: (DataFrame of the output columns indexed like bars, new state)
+        """
+
+
+def _fmt_arg(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else str(value)
+
+
+def _ema(values: pd.Series, alpha: float, prev: Optional[float]) -> pd.Series:
+    """Recursive EMA seeded with the previous value (or the first observation)"""
+    if prev is None or np.isnan(prev):
+        return values.ewm(alpha=alpha, adjust=False).mean()
+    seeded = pd.concat([pd.Series([prev]), values.reset_index(drop=True)], ignore_index=True)
+    out = seeded.ewm(alpha=alpha, adjust=False).mean().iloc[1:]
+    out.index = values.index
+    return out
+
+
+def _rolling_with_tail(tail: np.ndarray, values: pd.Series, window: int):
+    """Rolling window over the stored tail plus new values; returns (rolling, new tail)"""
+    joined = pd.Series(np.concatenate([tail, values.to_numpy(dtype=float)]))
+    rolling = joined.rolling(window=window)
+    new_tail = joined.to_numpy()[-(window - 1):] if window > 1 else joined.to_numpy()[:0]
+    return rolling, len(tail), new_tail
+
+
+class SMA(Indicator):
+    name = 'sma'
+
+    def update(self, state, bars):
+        period = int(self.args[0])
+        tail = state if state is not None else np.empty(0)
+        rolling, offset, new_tail = _rolling_with_tail(tail, bars['Close'], period)
+        values = rolling.mean().to_numpy()[offset:]
+        return pd.DataFrame({self.label: values}, index=bars.index), new_tail
+
+
+class EMA(Indicator):
+    name = 'ema'
+
+    def update(self, state, bars):
+        alpha = 2.0 / (int(self.args[0]) + 1)
+        values = _ema(bars['Close'], alpha, state)
+        last = float(values.iloc[-1]) if len(values) else state
+        return pd.DataFrame({self.label: values.to_numpy()}, index=bars.index), last
+
+
+class Bollinger(Indicator):
+    name = 'bb'
+
+    def __init__(self, period: float = 20, width: float = 2):
+        super().__init__(period, width)
+
+    def outputs(self):
+        base = self.key.replace(':', '_')
+        return {f'{self.label} {part}': f'{base}_{part}' for part in ('upper', 'middle', 'lower')}
+
+    def update(self, state, bars):
+        period, width = int(self.args[0]), float(self.args[1])
+        tail = state if state is not None else np.empty(0)
+        rolling, offset, new_tail = _rolling_with_tail(tail, bars['Close'], period)
+        middle = rolling.mean().to_numpy()[offset:]
+        std = rolling.std(ddof=0).to_numpy()[offset:]
+        cols = list(self.outputs())
+        frame = pd.DataFrame({
+            cols[0]: middle + width * std,
+            cols[1]: middle,
+            cols[2]: middle - width * std,
+        }, index=bars.index)
+        return frame, new_tail
+
+
+class RSI(Indicator):
+    """Wilder's relative strength index"""
+    name = 'rsi'
+    panel = 'rsi'
+
+    def update(self, state, bars):
+        period = int(self.args[0])
+        alpha = 1.0 / period
+        prev_close, avg_gain, avg_loss, seen = state if state is not None else (None, None, None, 0)
+
+        close = bars['Close'].astype(float)
+        previous = close.shift(1)
+        if prev_close is not None and len(close):
+            previous.iloc[0] = prev_close
+        delta = (close - previous).dropna()
+
+        gains = _ema(delta.clip(lower=0), alpha, avg_gain)
+        losses = _ema(-delta.clip(upper=0), alpha, avg_loss)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rsi = 100.0 - 100.0 / (1.0 + gains / losses)
+        rsi = rsi.where(losses != 0, 100.0)
+        # Not enough history yet for a meaningful value
+        counts = seen + np.arange(1, len(delta) + 1)
+        rsi[counts < period] = np.nan
+
+        values = rsi.reindex(bars.index)
+        if len(delta):
+            state = (float(close.iloc[-1]), float(gains.iloc[-1]), float(losses.iloc[-1]), seen + len(delta))
+        elif len(close):
+            state = (float(close.iloc[-1]), avg_gain, avg_loss, seen)
+        return pd.DataFrame({self.label: values.to_numpy()}, index=bars.index), state
+
+
+class MACD(Indicator):
+    name = 'macd'
+    panel = 'macd'
+
+    def __init__(self, fast: float = 12, slow: float = 26, signal: float = 9):
+        super().__init__(fast, slow, signal)
+
+    def outputs(self):
+        base = self.key.replace(':', '_')
+        return {f'{self.label} {part}': f'{base}_{part}' for part in ('line', 'signal', 'hist')}
+
+    def update(self, state, bars):
+        fast, slow, signal = (2.0 / (int(a) + 1) for a in self.args)
+        prev_fast, prev_slow, prev_signal = state if state is not None else (None, None, None)
+        ema_fast = _ema(bars['Close'], fast, prev_fast)
+        ema_slow = _ema(bars['Close'], slow, prev_slow)
+        line = ema_fast - ema_slow
+        sig = _ema(line, signal, prev_signal)
+        cols = list(self.outputs())
+        frame = pd.DataFrame({
+            cols[0]: line.to_numpy(),
+            cols[1]: sig.to_numpy(),
+            cols[2]: (line - sig).to_numpy(),
+        }, index=bars.index)
+        if len(bars):
+            state = (float(ema_fast.iloc[-1]), float(ema_slow.iloc[-1]), float(sig.iloc[-1]))
+        return frame, state
+
+
+class VWAP(Indicator):
+    """Volume-weighted average price, anchored at the first bar of the range"""
+    name = 'vwap'
+
+    def update(self, state, bars):
+        cum_pv, cum_vol = state if state is not None else (0.0, 0.0)
+        typical = (bars['High'] + bars['Low'] + bars['Close']).to_numpy(dtype=float) / 3.0
+        volume = bars['Volume'].to_numpy(dtype=float)
+        pv = cum_pv + np.cumsum(typical * volume)
+        vol = cum_vol + np.cumsum(volume)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(vol > 0, pv / vol, np.nan)
+        if len(bars):
+            state = (float(pv[-1]), float(vol[-1]))
+        return pd.DataFrame({self.label: values}, index=bars.index), state
+
+
+INDICATORS = {cls.name: cls for cls in (SMA, EMA, Bollinger, RSI, MACD, VWAP)}
+_DEFAULT_ARGS = {'sma': (20,), 'ema': (20,), 'bb': (20, 2), 'rsi': (14,), 'macd': (12, 26, 9), 'vwap': ()}
+
+
+def parse_indicators(value) -> List[Indicator]:
+    """
+    Parse indicator specs such as 'sma:50', 'bb:20:2', 'macd' or 'vwap'
+    :param value: List of spec strings, or one comma-separated string
+    :return: De-duplicated list of Indicator instances
+    """
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+
+    indicators: 'OrderedDict[str, Indicator]' = OrderedDict()
+    for spec in value:
+        parts = str(spec).strip().lower().split(':')
+        name = parts[0]
+        if name not in INDICATORS:
+            raise ValueError(f'Unknown indicator: {name}')
+        try:
+            args = tuple(float(a) for a in parts[1:]) or tuple(float(a) for a in _DEFAULT_ARGS[name])
+        except ValueError:
+            raise ValueError(f'Invalid indicator parameters: {spec}')
+        # Periods are whole numbers of bars; only the Bollinger band width may be fractional
+        periods = args[:1] if name == 'bb' else args
+        if (len(args) != len(_DEFAULT_ARGS[name])
+                or any(not (a.is_integer() and 1 <= a <= 500) for a in periods)
+                or (name == 'bb' and not 0 < args[1] <= 10)):
+            raise ValueError(f'Invalid indicator parameters: {spec}')
+        indicator = INDICATORS[name](*args)
+        indicators[indicator.key] = indicator
+
+    if len(indicators) > MAX_INDICATORS:
+        raise ValueError(f'At most {MAX_INDICATORS} indicators can be requested at once')
+    return list(indicators.values())
+
+
+@dataclass
+class _Checkpoint:
+    """Indicator state after all but the last bar seen, so a still-forming bar can change"""
+    length: int
+    last_date: pd.Timestamp
+    last_close: float
+    values: pd.DataFrame
+    state: Any
+
+
+class IndicatorEngine:
+    def __init__(self, max_entries: int = 256):
+        """
+        Initialize IndicatorEngine
+        :param max_entries: Number of (scope, indicator, start date) checkpoints to keep
+        """
+        self.max_entries = max_entries
+        self._checkpoints: 'OrderedDict[tuple, _Checkpoint]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.incremental_updates = 0
+        self.full_computations = 0
+
+    def apply(self, scope: str, hist: pd.DataFrame, indicators: List[Indicator]) -> pd.DataFrame:
+        """
+        Return a copy of hist with indicator columns added
+        :param scope: Identifies the series (e.g. the ticker) for incremental updates
+        :param hist: Bars indexed by date
+        :param indicators: Indicators to compute
+        """
+        result = hist.copy()
+        if hist.empty:
+            for indicator in indicators:
+                for col in indicator.outputs():
+                    result[col] = np.nan
+            return result
+        for indicator in indicators:
+            values = self._compute(scope, hist, indicator)
+            for col in values.columns:
+                result[col] = values[col].to_numpy()
+        return result
+
+    def _compute(self, scope: str, hist: pd.DataFrame, indicator: Indicator) -> pd.DataFrame:
+        key = (scope, indicator.key, hist.index[0])
+        with self._lock:
+            checkpoint = self._checkpoints.get(key)
+            if checkpoint is not None and self._extends(checkpoint, hist):
+                self.incremental_updates += 1
+            else:
+                checkpoint = None
+                self.full_computations += 1
+
+        if checkpoint is not None:
+            prefix, state = checkpoint.values, checkpoint.state
+            start = checkpoint.length
+        else:
+            prefix, state, start = None, None, 0
+
+        # Advance the checkpoint to the second-to-last bar, then compute the last bar on top
+        settled, settled_state = indicator.update(state, hist.iloc[start:-1])
+        last, _ = indicator.update(settled_state, hist.iloc[-1:])
+        settled = settled if prefix is None else pd.concat([prefix, settled])
+
+        with self._lock:
+            self._checkpoints[key] = _Checkpoint(
+                length=len(hist) - 1,
+                last_date=hist.index[-2] if len(hist) > 1 else None,
+                last_close=float(hist['Close'].iloc[-2]) if len(hist) > 1 else None,
+                values=settled,
+                state=settled_state)
+            self._checkpoints.move_to_end(key)
+            while len(self._checkpoints) > self.max_entries:
+                self._checkpoints.popitem(last=False)
+        return pd.concat([settled, last])
+
+    @staticmethod
+    def _extends(checkpoint: _Checkpoint, hist: pd.DataFrame) -> bool:
+        """True if hist starts with exactly the bars the checkpoint was built from"""
+        n = checkpoint.length
+        if n == 0 or len(hist) <= n:
+            return False
+        return (hist.index[n - 1] == checkpoint.last_date
+                and float(hist['Close'].iloc[n - 1]) == checkpoint.last_close)
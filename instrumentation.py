@@ -0,0 +1,138 @@
+import io
+import time
+import pstats
+import cProfile
+import threading
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate quantile: upper bound of the bucket holding the q-th observation"""
+        if not self.count:
+            return None
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return float('inf')
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'sum_ms': round(self.sum, 3),
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts)),
+        }
+
+
+class Metrics:
+    """Process-wide counters and latency histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name: str, value_ms: float) -> None:
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value_ms)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'counters': dict(self.counters),
+                'histograms': {name: h.snapshot() for name, h in self.histograms.items()},
+            }
+
+    def prometheus(self, prefix: str = 'd8tavu', gauges: Optional[Dict[str, float]] = None) -> str:
+        """Render counters, gauges and histograms in the Prometheus text format"""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f'{prefix}_{_metric_name(name)}_total'
+                lines += [f'# TYPE {metric} counter', f'{metric} {value}']
+            for name, histogram in sorted(self.histograms.items()):
+                metric = f'{prefix}_{_metric_name(name)}_ms'
+                lines.append(f'# TYPE {metric} histogram')
+                running = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    running += count
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {running}')
+                lines += [f'{metric}_sum {histogram.sum}', f'{metric}_count {histogram.count}']
+        for name, value in sorted((gauges or {}).items()):
+            metric = f'{prefix}_{_metric_name(name)}'
+            lines += [f'# TYPE {metric} gauge', f'{metric} {value}']
+        return '\n'.join(lines) + '\n'
+
+
+def _metric_name(name: str) -> str:
+    return ''.join(c if c.isalnum() else '_' for c in name).strip('_').lower()
+
+
+class StageTimer:
+    """Collects named stage durations for one request"""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self.stages: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000.0)
+
+    def record(self, name: str, duration_ms: float) -> None:
+        self.stages.append((name, duration_ms))
+        self.metrics.observe(f'stage_{name}', duration_ms)
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing response header"""
+        return ', '.join(f'{_metric_name(name)};dur={duration:.1f}' for name, duration in self.stages)
+
+
+class RequestProfiler:
+    """Optional cProfile run for a single request"""
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self, limit: int = 30) -> str:
+        self.profile.disable()
+        out = io.StringIO()
+        pstats.Stats(self.profile, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
@@ -0,0 +1,74 @@
+import importlib
+import threading
+import logging
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access, so requests
+    that never touch it (file share, health checks) do not pay for importing it
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self):
+        if self._module is None:
+            # import_module holds the import lock, so concurrent first uses import once
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.load(), attr)
+
+    def __repr__(self) -> str:
+        return f'<LazyModule {self._name} loaded={self.loaded}>'
+
+
+class Lazy:
+    """Proxy for an object that is built on first attribute access"""
+
+    def __init__(self, factory: Callable[[], Any], name: Optional[str] = None):
+        """
+        Initialize Lazy
+        :param factory: Builds the object; called once, under a lock
+        :param name: Name used in log messages
+        """
+        self._factory = factory
+        self._name = name or getattr(factory, '__name__', 'object')
+        self._value = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not None
+
+    def get(self) -> Any:
+        value = self._value
+        if value is None:
+            with self._lock:
+                if self._value is None:
+                    logger.info(f'Loading {self._name}')
+                    self._value = self._factory()
+                value = self._value
+        return value
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.get(), attr)
+
+    def __setattr__(self, attr: str, value: Any) -> None:
+        if attr.startswith('_'):
+            object.__setattr__(self, attr, value)
+        else:
+            setattr(self.get(), attr, value)
+
+    def __repr__(self) -> str:
+        return f'<Lazy {self._name} loaded={self.loaded}>'
@@ -0,0 +1,469 @@
+import os
+import json
+import time
+import zlib
+import queue
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from indicators import Indicator
+from price_store import UpstreamUnavailable
+from series_payload import to_columnar
+
+logger = logging.getLogger(__name__)
+
+# Bar lengths offered in live mode, in seconds (the chart API's minute-level intervals)
+INTRADAY_INTERVALS = {'1m': 60, '2m': 120, '5m': 300, '15m': 900, '30m': 1800, '60m': 3600}
+INTRADAY_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+# A new poller loads at least this much history, so a weekend or holiday still shows the last session
+MIN_LOOKBACK = pd.Timedelta(days=4)
+# While no new bars arrive (market closed), polls back off to at most this many feed seconds apart
+IDLE_MAX_WAIT = 300
+
+
+def parse_intraday_interval(value) -> str:
+    """Normalize a live interval option; missing means one minute"""
+    interval = str(value or '1m').strip().lower()
+    if interval not in INTRADAY_INTERVALS:
+        raise ValueError(f'Unsupported live interval: {value}. Use one of {", ".join(INTRADAY_INTERVALS)}')
+    return interval
+
+
+def _utc(value) -> pd.Timestamp:
+    ts = pd.Timestamp(value)
+    return ts.tz_localize('UTC') if ts.tzinfo is None else ts.tz_convert('UTC')
+
+
+def _empty_bars() -> pd.DataFrame:
+    return pd.DataFrame({c: pd.Series(dtype='float64') for c in INTRADAY_COLUMNS},
+                        index=pd.DatetimeIndex([], tz='UTC', name='Datetime'))
+
+
+class IntradaySource(ABC):
+    """Upstream provider of minute-level bars for live charts"""
+    # Feed seconds per real second; a replayed feed may run faster than real time
+    speed = 1.0
+
+    @abstractmethod
+    def fetch_intraday(self, ticker: str, interval: str, start: pd.Timestamp) -> pd.DataFrame:
+        """
+        Fetch bars from start until now
+        :param ticker: Ticker symbol
+        :param interval: One of INTRADAY_INTERVALS
+        :param start: First bar start time to fetch (UTC)
+        :return: DataFrame indexed by UTC bar start time with INTRADAY_COLUMNS; the last bar
+            may still be forming
+        :raises UpstreamUnavailable: If upstream cannot be reached
+        """
+
+    def now(self) -> pd.Timestamp:
+        """The feed's current time (UTC)"""
+        return pd.Timestamp.now(tz='UTC')
+
+
+def aggregate_bars(bars: pd.DataFrame, seconds: int) -> pd.DataFrame:
+    """Combine one-minute bars into bars of the given length, labelled by their start time"""
+    if seconds == 60 or bars.empty:
+        return bars
+    grouped = bars.groupby(bars.index.floor(f'{seconds}s'))
+    out = pd.DataFrame({
+        'Open': grouped['Open'].first(),
+        'High': grouped['High'].max(),
+        'Low': grouped['Low'].min(),
+        'Close': grouped['Close'].last(),
+        'Volume': grouped['Volume'].sum(),
+    })
+    out.index.name = bars.index.name
+    return out
+
+
+class ReplayFeed(IntradaySource):
+    """
+    Local fake feed for tests and offline development. Recorded one-minute bars are replayed
+    from the moment the feed is created, as if they were arriving live; other tickers get
+    synthetic bars generated from the ticker and day, so every replay sees the same prices.
+    """
+
+    def __init__(self, recordings: Optional[Dict[str, pd.DataFrame]] = None, speed: float = 1.0,
+                 start=None):
+        """
+        Initialize ReplayFeed
+        :param recordings: {ticker: one-minute bars}; each is shifted so its first bar starts
+            when the replay does
+        :param speed: Feed seconds per real second (60 replays a minute bar every second)
+        :param start: Feed time the replay starts at (default: now, to the minute)
+        """
+        self.speed = speed
+        self.origin = _utc(start if start is not None else pd.Timestamp.now(tz='UTC')).floor('60s')
+        self._started = time.monotonic()
+        self.recordings = {}
+        for ticker, bars in (recordings or {}).items():
+            bars = bars.sort_index()
+            index = pd.DatetimeIndex(bars.index)
+            index = index.tz_localize('UTC') if index.tz is None else index.tz_convert('UTC')
+            shifted = index - index[0] + self.origin
+            self.recordings[ticker.upper()] = bars[INTRADAY_COLUMNS].astype('float64').set_axis(
+                shifted.rename('Datetime'))
+        self._days: Dict[Tuple[str, pd.Timestamp], pd.DataFrame] = {}
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    @classmethod
+    def from_dir(cls, path: str, speed: float = 1.0) -> 'ReplayFeed':
+        """Replay every <TICKER>.csv in a directory (a timestamp column, then Open/High/Low/Close/Volume)"""
+        recordings = {}
+        for name in sorted(os.listdir(path)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() == '.csv':
+                bars = pd.read_csv(os.path.join(path, name), index_col=0)
+                bars.index = pd.to_datetime(bars.index, utc=True)
+                recordings[stem] = bars
+        logger.info(f'ReplayFeed loaded {len(recordings)} recording(s) from {path}')
+        return cls(recordings, speed)
+
+    def now(self) -> pd.Timestamp:
+        return self.origin + pd.Timedelta(seconds=(time.monotonic() - self._started) * self.speed)
+
+    def fetch_intraday(self, ticker: str, interval: str, start: pd.Timestamp) -> pd.DataFrame:
+        now = self.now()
+        seconds = INTRADAY_INTERVALS[interval]
+        begin = _utc(start).floor(f'{seconds}s')
+        with self._lock:
+            self.fetches += 1
+        ticker = ticker.upper()
+        if ticker in self.recordings:
+            minutes = self.recordings[ticker]
+        else:
+            minutes = pd.concat([self._synthetic_day(ticker, day)
+                                 for day in pd.date_range(begin.normalize(), now.normalize(), freq='D')])
+        # Bars that have started by the feed's clock; the last one is still forming
+        minutes = minutes[(minutes.index >= begin) & (minutes.index <= now)]
+        return aggregate_bars(minutes, seconds)
+
+    def _synthetic_day(self, ticker: str, day: pd.Timestamp) -> pd.DataFrame:
+        """A random walk of one-minute bars for one UTC day, seeded by ticker and day"""
+        key = (ticker, day)
+        with self._lock:
+            bars = self._days.get(key)
+        if bars is not None:
+            return bars
+        seed = zlib.crc32(ticker.encode())
+        rng = np.random.default_rng([seed, int(day.timestamp()) // 86400])
+        level = (20 + seed % 200) * np.exp(rng.normal(0, 0.02))
+        close = level * np.exp(np.cumsum(rng.normal(0, 0.0008, 1440)))
+        open_ = np.r_[level, close[:-1]]
+        spread = close * rng.uniform(0.0001, 0.001, 1440)
+        bars = pd.DataFrame({
+            'Open': open_,
+            'High': np.maximum(open_, close) + spread,
+            'Low': np.minimum(open_, close) - spread,
+            'Close': close,
+            'Volume': rng.integers(1_000, 50_000, 1440).astype('float64'),
+        }, index=pd.date_range(day, periods=1440, freq='60s', name='Datetime'))
+        with self._lock:
+            self._days[key] = bars
+            while len(self._days) > 64:
+                self._days.pop(next(iter(self._days)))
+        return bars
+
+
+def format_event(event: str, data: dict, event_id: Optional[int] = None) -> str:
+    """One Server-Sent Events message"""
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+class LiveHubFull(Exception):
+    """Raised when a process already streams to as many clients as it allows"""
+
+    def __init__(self, message: str, retry_after: int = 30):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Subscription:
+    def __init__(self, key: Tuple[str, str], indicators: List[Indicator], max_queue: int):
+        """
+        Initialize Subscription, one client's stream of preformatted events
+        :param key: (ticker, interval) streamed
+        :param indicators: Indicator values to include with the bars
+        :param max_queue: Events held for a client that is not reading; beyond that the
+            client is dropped, and reconnects with Last-Event-ID to catch up
+        """
+        self.key = key
+        self.indicators = indicators
+        # Subscribers with the same indicators share one encoded event
+        self.group = tuple(i.key for i in indicators)
+        self.dropped = False
+        self._queue: 'queue.Queue[str]' = queue.Queue(maxsize=max_queue)
+
+    def push(self, message: str) -> bool:
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except queue.Full:
+            self.dropped = True
+            return False
+
+    def next(self, timeout: float) -> Optional[str]:
+        """The next event, or None if none arrived within timeout"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class TickerPoller:
+    def __init__(self, source: IntradaySource, ticker: str, interval: str, max_bars: int,
+                 settle: float, count: Callable[[str, int], None]):
+        """
+        Initialize TickerPoller, the one upstream poller for a ticker and interval
+        :param source: Intraday bar source
+        :param max_bars: Closed bars kept for the snapshot sent to new subscribers
+        :param settle: Feed seconds to wait after a bar closes before asking for it, so
+            upstream has its final values
+        :param count: Adds to the hub's counters
+        """
+        self.source = source
+        self.ticker = ticker
+        self.interval = interval
+        self.seconds = INTRADAY_INTERVALS[interval]
+        self.max_bars = max_bars
+        self.settle = settle
+        self.count = count
+        # Subscriptions counted by the hub, including ones still waiting for the first load
+        self.users = 0
+        self.stale = False
+        self.bars = _empty_bars()
+        self.indicators: Dict[str, Tuple[Indicator, Any]] = {}
+        self.subscribers: List[Subscription] = []
+        self._idle_polls = 0
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Load recent bars and start polling (idempotent); load errors reach the caller"""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            now = self.source.now()
+            fetched = self._fetch(now - max(MIN_LOOKBACK, pd.Timedelta(seconds=self.seconds * self.max_bars)))
+            with self._lock:
+                self._append(fetched)
+            self._thread = threading.Thread(target=self._run, name=f'live-{self.ticker}-{self.interval}',
+                                            daemon=True)
+            self._thread.start()
+            logger.info(f'Live poller started for {self.ticker} {self.interval} with {len(self.bars)} bars')
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _fetch(self, start: pd.Timestamp) -> pd.DataFrame:
+        """Closed bars from start: a bar is closed once its end is settle seconds in the past"""
+        self.count('polls', 1)
+        bars = self.source.fetch_intraday(self.ticker, self.interval, start)
+        closed_before = self.source.now() - pd.Timedelta(seconds=self.seconds + self.settle)
+        return bars[bars.index <= closed_before]
+
+    def _append(self, bars: pd.DataFrame) -> pd.DataFrame:
+        """Add bars newer than the last one kept, with indicator values updated from their saved state"""
+        if len(self.bars):
+            bars = bars[bars.index > self.bars.index[-1]]
+        if bars.empty:
+            return bars
+        bars = bars[INTRADAY_COLUMNS].astype('float64')
+        for key, (indicator, state) in self.indicators.items():
+            values, state = indicator.update(state, bars)
+            self.indicators[key] = (indicator, state)
+            bars = bars.assign(**{col: values[col].to_numpy() for col in values.columns})
+        self.bars = (bars if self.bars.empty else pd.concat([self.bars, bars])).iloc[-self.max_bars:]
+        return bars
+
+    def _track(self, indicator: Indicator) -> None:
+        """Compute a newly requested indicator over the kept bars; later bars update it incrementally"""
+        values, state = indicator.update(None, self.bars[INTRADAY_COLUMNS])
+        self.bars = self.bars.assign(**{col: values[col].to_numpy() for col in values.columns})
+        self.indicators[indicator.key] = (indicator, state)
+
+    def _message(self, event: str, indicators: List[Indicator], bars: pd.DataFrame) -> str:
+        payload = {
+            'ticker': self.ticker,
+            'interval': self.interval,
+            'bars': to_columnar(bars, columns=INTRADAY_COLUMNS,
+                                extra={col: key for i in indicators for col, key in i.outputs().items()}),
+            'stale': self.stale,
+        }
+        if event == 'snapshot':
+            payload['indicators'] = [{'key': i.key, 'label': i.label, 'panel': i.panel,
+                                      'series': list(i.outputs().values())} for i in indicators]
+        event_id = int(bars.index[-1].timestamp()) if len(bars) else None
+        return format_event(event, payload, event_id)
+
+    def subscribe(self, subscription: Subscription, since: Optional[int] = None) -> None:
+        """
+        Queue a snapshot for a new subscriber and add it to the fan-out
+        :param since: Epoch seconds of the last bar the client has (Last-Event-ID); only
+            later bars are sent
+        """
+        with self._lock:
+            for indicator in subscription.indicators:
+                if indicator.key not in self.indicators:
+                    self._track(indicator)
+            bars = self.bars
+            if since is not None:
+                bars = bars[bars.index > pd.Timestamp(since, unit='s', tz='UTC')]
+            subscription.push(self._message('snapshot', subscription.indicators, bars))
+            self.subscribers.append(subscription)
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self.subscribers:
+                self.subscribers.remove(subscription)
+            # Stop updating indicators nobody is watching any more
+            wanted = {key for s in self.subscribers for key in s.group}
+            for key in [key for key in self.indicators if key not in wanted]:
+                indicator, _ = self.indicators.pop(key)
+                self.bars = self.bars.drop(columns=[c for c in indicator.outputs() if c in self.bars])
+
+    def _publish(self, event: str, bars: Optional[pd.DataFrame] = None, data: Optional[dict] = None) -> None:
+        """Send an event to every subscriber, encoding it once per distinct set of indicators (under _lock)"""
+        messages = {}
+        for subscription in list(self.subscribers):
+            message = messages.get(subscription.group)
+            if message is None:
+                if bars is not None:
+                    message = self._message(event, subscription.indicators, bars)
+                else:
+                    message = format_event(event, data)
+                messages[subscription.group] = message
+            if not subscription.push(message):
+                logger.warning(f'Dropping slow live subscriber for {self.ticker} {self.interval}')
+                self.subscribers.remove(subscription)
+                self.count('dropped', 1)
+        self.count('events', len(messages))
+
+    def _delay(self) -> float:
+        """Real seconds until the next poll: just after the next bar closes, backing off while none arrive"""
+        now = self.source.now()
+        bars_ahead = min(2 ** self._idle_polls, max(1, IDLE_MAX_WAIT // self.seconds))
+        next_close = now.floor(f'{self.seconds}s') + pd.Timedelta(seconds=self.seconds * bars_ahead)
+        return max(0.0, (next_close - now).total_seconds() + self.settle) / self.source.speed
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._delay()):
+            with self._lock:
+                last = self.bars.index[-1] if len(self.bars) else None
+            start = last + pd.Timedelta(seconds=self.seconds) if last is not None else self.source.now() - MIN_LOOKBACK
+            try:
+                fetched = self._fetch(start)
+            except UpstreamUnavailable as e:
+                logger.warning(f'Live bars unavailable for {self.ticker}: {e}')
+                with self._lock:
+                    if not self.stale:
+                        self.stale = True
+                        self._publish('status', data={'stale': True, 'error': str(e), 'retry_after': e.retry_after})
+                self._stop.wait(e.retry_after)
+                continue
+            except Exception as e:
+                logger.error(f'Error polling live bars for {self.ticker}: {str(e)}', exc_info=True)
+                continue
+            with self._lock:
+                if self.stale:
+                    self.stale = False
+                    self._publish('status', data={'stale': False})
+                appended = self._append(fetched)
+                if len(appended):
+                    self._publish('bars', bars=appended)
+            self._idle_polls = 0 if len(appended) else self._idle_polls + 1
+        logger.info(f'Live poller stopped for {self.ticker} {self.interval}')
+
+
+class LiveHub:
+    def __init__(self, source: IntradaySource, max_subscribers: int = 64, max_bars: int = 500,
+                 settle: float = 5.0, max_queue: int = 64):
+        """
+        Initialize LiveHub: one upstream poller per (ticker, interval), fanned out to every
+        subscriber watching it, and stopped when the last one leaves
+        :param source: Intraday bar source
+        :param max_subscribers: Streams open at once in this process (each holds a server thread)
+        :param max_bars: Closed bars kept per poller for the snapshot sent to new subscribers
+        :param settle: Feed seconds after a bar closes before it is fetched
+        :param max_queue: Events buffered per subscriber before a slow client is dropped
+        """
+        self.source = source
+        self.max_subscribers = max_subscribers
+        self.max_bars = max_bars
+        self.settle = settle
+        self.max_queue = max_queue
+        self.subscribers = 0
+        self._pollers: Dict[Tuple[str, str], TickerPoller] = {}
+        self._lock = threading.Lock()
+        self._counts: Counter = Counter()
+        self._count_lock = threading.Lock()
+        logger.info(f'LiveHub initialized with source: {type(source).__name__}, '
+                    f'max_subscribers: {max_subscribers}, max_bars: {max_bars}')
+
+    def _count(self, name: str, n: int) -> None:
+        with self._count_lock:
+            self._counts[name] += n
+
+    def subscribe(self, ticker: str, interval: str, indicators: List[Indicator],
+                  since: Optional[int] = None) -> Subscription:
+        """
+        Start streaming a ticker to a new client; its first event is a snapshot of recent bars
+        :param since: Epoch seconds of the last bar the client already has
+        :raises LiveHubFull: If the process streams to max_subscribers clients already
+        :raises UpstreamUnavailable: If the ticker's first bars cannot be loaded
+        """
+        key = (ticker.upper(), interval)
+        subscription = Subscription(key, indicators, self.max_queue)
+        with self._lock:
+            if self.subscribers >= self.max_subscribers:
+                raise LiveHubFull(f'Too many live streams (limit {self.max_subscribers}); try again later')
+            poller = self._pollers.get(key)
+            if poller is None:
+                poller = self._pollers[key] = TickerPoller(self.source, key[0], interval, self.max_bars,
+                                                           self.settle, self._count)
+            poller.users += 1
+            self.subscribers += 1
+        try:
+            poller.start()
+            poller.subscribe(subscription, since)
+        except BaseException:
+            self.unsubscribe(subscription)
+            raise
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self.subscribers -= 1
+            poller = self._pollers[subscription.key]
+            poller.unsubscribe(subscription)
+            poller.users -= 1
+            if poller.users == 0:
+                del self._pollers[subscription.key]
+                poller.stop()
+
+    def stats(self) -> dict:
+        """Pollers and streams open, and upstream polls, events and dropped clients since startup"""
+        with self._lock:
+            pollers, subscribers = len(self._pollers), self.subscribers
+        with self._count_lock:
+            counts = dict(self._counts)
+        return {
+            'pollers': pollers,
+            'subscribers': subscribers,
+            'polls': counts.get('polls', 0),
+            'events': counts.get('events', 0),
+            'dropped': counts.get('dropped', 0),
+        }
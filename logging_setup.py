@@ -0,0 +1,91 @@
+import os
+import atexit
+import queue
+import random
+import logging
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def configure_logging(log_file: str, level: str = 'INFO', max_bytes: int = 10 * 1024 * 1024,
+                      backup_count: int = 5) -> QueueListener:
+    """
+    Route all logging through a queue so file I/O happens on a background thread
+    :param log_file: Path of the rotating log file
+    :param level: Root log level name (DEBUG, INFO, WARNING, ...)
+    :param max_bytes: Size at which the log file is rotated
+    :param backup_count: Number of rotated files to keep
+    :return: The running QueueListener (stopped automatically at exit)
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count)
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    listener = _start_listener(file_handler, stream_handler)
+    # A pre-fork server (gunicorn with preload_app) forks after this ran; the listener
+    # thread does not survive the fork, so each worker starts its own
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=lambda: _start_listener(file_handler, stream_handler))
+    logging.getLogger().setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    return listener
+
+
+def _start_listener(*handlers: logging.Handler) -> QueueListener:
+    """Start a listener thread for handlers and make the root logger enqueue to it"""
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    return listener
+
+
+class RequestSummary:
+    """Counts and timings collected during one request, logged as a single key=value line"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.start = time.perf_counter()
+        self.status = None
+        self.duration_ms = None
+        self.fields = {}
+
+    def add(self, **fields) -> None:
+        """Record extra fields (counts, timings) for this request's summary"""
+        self.fields.update(fields)
+
+    def finish(self, status: int) -> None:
+        self.status = status
+        self.duration_ms = (time.perf_counter() - self.start) * 1000.0
+
+    def __str__(self) -> str:
+        # Only formatted when a handler actually emits the record
+        parts = [f'method={self.method}', f'path={self.path}', f'status={self.status}',
+                 f'duration_ms={self.duration_ms:.1f}']
+        parts += [f'{k}={v:.1f}' if isinstance(v, float) else f'{k}={v}' for k, v in self.fields.items()]
+        return 'request ' + ' '.join(parts)
+
+
+def log_request_summary(logger: logging.Logger, summary: RequestSummary, sample_rate: float = 1.0,
+                        slow_ms: float = 1000.0) -> None:
+    """
+    Log a finished request summary. Errors and slow requests are always logged;
+    other requests are logged with probability sample_rate.
+    """
+    if summary.status >= 400 or summary.duration_ms >= slow_ms:
+        level = logging.WARNING
+    elif sample_rate >= 1.0 or random.random() < sample_rate:
+        level = logging.INFO
+    else:
+        return
+    if logger.isEnabledFor(level):
+        logger.log(level, '%s', summary)
@@ -0,0 +1,285 @@
+import time
+import random
+import datetime
+import threading
+import logging
+from typing import Callable, Optional
+from urllib.parse import quote
+
+import pandas as pd
+
+from price_store import PriceSource, UpstreamUnavailable, BAR_COLUMNS
+from live_feed import IntradaySource, INTRADAY_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BASE_URL = 'https://query2.finance.yahoo.com'
+# Answers worth retrying: throttling and server-side failures
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Answers meaning the symbol is unknown or invalid (not an upstream problem)
+NO_DATA_STATUSES = frozenset({400, 404, 422})
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/124.0 Safari/537.36')
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        """
+        Initialize TokenBucket
+        :param rate: Tokens added per second (sustained requests per second)
+        :param burst: Bucket size (requests allowed back to back)
+        """
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: float) -> bool:
+        """Take one token, waiting up to timeout seconds; returns False if none became available"""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+def default_session():
+    """
+    A pooled HTTP session: curl_cffi with browser impersonation when installed (as yfinance
+    uses, since Yahoo throttles plain clients), otherwise requests with a connection pool
+    """
+    try:
+        from curl_cffi import requests as curl_requests
+        return curl_requests.Session(impersonate='chrome')
+    except ImportError:
+        import requests
+        from requests.adapters import HTTPAdapter
+        session = requests.Session()
+        session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+
+def parse_chart(payload: dict) -> pd.DataFrame:
+    """
+    Daily bars from a Yahoo chart API response, as upstream reports them: split-adjusted but
+    not dividend-adjusted (the PriceStore applies dividends when reading, so cached bars stay
+    on one scale). The adjusted close is ignored
+    :return: DataFrame indexed by exchange-local dates with BAR_COLUMNS (empty if no bars)
+    """
+    result = (payload.get('chart') or {}).get('result') or []
+    if not result or not result[0].get('timestamp'):
+        return pd.DataFrame(columns=BAR_COLUMNS)
+    result = result[0]
+    bars = result['indicators']['quote'][0]
+    tz = result.get('meta', {}).get('exchangeTimezoneName') or 'UTC'
+    index = pd.to_datetime(result['timestamp'], unit='s', utc=True).tz_convert(tz).normalize()
+    hist = pd.DataFrame({
+        'Open': bars.get('open'),
+        'High': bars.get('high'),
+        'Low': bars.get('low'),
+        'Close': bars.get('close'),
+        'Volume': bars.get('volume'),
+    }, index=pd.DatetimeIndex(index, name='Date'), dtype='float64')
+
+    events = result.get('events') or {}
+    hist['Dividends'] = 0.0
+    hist['Stock Splits'] = 0.0
+    for event, column, value in (('dividends', 'Dividends', lambda e: e['amount']),
+                                 ('splits', 'Stock Splits', lambda e: e['numerator'] / e['denominator'])):
+        for item in (events.get(event) or {}).values():
+            day = pd.Timestamp(item['date'], unit='s', tz='UTC').tz_convert(tz).normalize()
+            if day in hist.index:
+                hist.loc[day, column] = value(item)
+
+    # Rows without a close are days the exchange reported but did not trade
+    hist = hist[hist['Close'].notna()]
+    hist = hist[~hist.index.duplicated(keep='last')]
+    hist['Volume'] = hist['Volume'].fillna(0)
+    return hist[BAR_COLUMNS]
+
+
+def parse_intraday(payload: dict) -> pd.DataFrame:
+    """
+    Minute-level bars from a chart API response (unadjusted, as upstream reports them intraday)
+    :return: DataFrame indexed by UTC bar start time with INTRADAY_COLUMNS (empty if no bars)
+    """
+    result = (payload.get('chart') or {}).get('result') or []
+    if not result or not result[0].get('timestamp'):
+        return pd.DataFrame(columns=INTRADAY_COLUMNS)
+    result = result[0]
+    bars = result['indicators']['quote'][0]
+    index = pd.DatetimeIndex(pd.to_datetime(result['timestamp'], unit='s', utc=True), name='Datetime')
+    hist = pd.DataFrame({
+        'Open': bars.get('open'),
+        'High': bars.get('high'),
+        'Low': bars.get('low'),
+        'Close': bars.get('close'),
+        'Volume': bars.get('volume'),
+    }, index=index, dtype='float64')
+    hist = hist[hist['Close'].notna()]
+    hist = hist[~hist.index.duplicated(keep='last')]
+    hist['Volume'] = hist['Volume'].fillna(0)
+    return hist[INTRADAY_COLUMNS]
+
+
+class MarketDataClient(PriceSource, IntradaySource):
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, rate: float = 2.0, burst: int = 5,
+                 max_concurrency: int = 4, retries: int = 3, timeout: float = 10.0,
+                 backoff: float = 0.5, max_backoff: float = 8.0, cooldown: float = 30.0,
+                 session_factory: Callable[[], object] = default_session):
+        """
+        Initialize MarketDataClient, the process-wide source of daily and intraday bars
+        :param base_url: Chart API root; point it at a local stand-in server for testing
+        :param rate: Sustained upstream requests per second (token bucket refill rate)
+        :param burst: Requests allowed back to back before the rate applies
+        :param max_concurrency: Upstream requests in flight at once
+        :param retries: Retries of a throttled or failed request
+        :param timeout: Seconds per HTTP request, and the longest wait for a rate-limit token
+        :param backoff: Base of the exponential backoff between retries, in seconds
+        :param max_backoff: Longest single backoff
+        :param cooldown: After retries are exhausted, fail fast for this many seconds so
+            callers fall back to cached data immediately
+        :param session_factory: Builds the shared HTTP session (created on first use)
+        """
+        self.base_url = base_url.rstrip('/')
+        self.retries = retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cooldown = cooldown
+        self._bucket = TokenBucket(rate, burst)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._session_factory = session_factory
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._unavailable_until = 0.0
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.throttled = 0
+        logger.info(f'MarketDataClient initialized with base_url: {self.base_url}, rate: {rate}/s, '
+                    f'burst: {burst}, max_concurrency: {max_concurrency}, retries: {retries}')
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._session_factory()
+        return self._session
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After if it asks for longer"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), self.max_backoff))
+        return delay
+
+    def _get(self, url: str, params: dict):
+        """One HTTP GET under the rate limit and concurrency cap"""
+        if not self._bucket.acquire(self.timeout):
+            self._count('throttled')
+            raise UpstreamUnavailable('Market data rate limit reached', retry_after=int(self.timeout))
+        with self._slots:
+            self._count('requests')
+            return self.session.get(url, params=params, timeout=self.timeout)
+
+    def _request(self, ticker: str, params: dict) -> Optional[dict]:
+        """
+        GET a ticker's chart with retries
+        :return: The decoded response, or None if upstream does not know the ticker
+        :raises UpstreamUnavailable: If upstream cannot be reached or keeps failing
+        """
+        remaining = self._unavailable_until - time.monotonic()
+        if remaining > 0:
+            raise UpstreamUnavailable('Market data temporarily unavailable', retry_after=int(remaining) + 1)
+
+        url = f"{self.base_url}/v8/finance/chart/{quote(ticker, safe='')}"
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count('retried')
+            retry_after = None
+            try:
+                response = self._get(url, params)
+            except UpstreamUnavailable:
+                raise
+            except Exception as e:
+                # Connection errors and timeouts (requests and curl_cffi raise different types)
+                error = f'{type(e).__name__}: {e}'
+            else:
+                if response.status_code in NO_DATA_STATUSES:
+                    logger.info(f'Upstream has no data for {ticker} (HTTP {response.status_code})')
+                    return None
+                if response.status_code == 200:
+                    return response.json()
+                error = f'HTTP {response.status_code}'
+                if response.status_code not in RETRY_STATUSES:
+                    break
+                retry_after = response.headers.get('Retry-After')
+            if attempt < self.retries:
+                delay = self._delay(attempt, retry_after)
+                logger.warning(f'Market data request for {ticker} failed ({error}); retrying in {delay:.2f}s')
+                time.sleep(delay)
+
+        self._count('failures')
+        self._unavailable_until = time.monotonic() + self.cooldown
+        logger.error(f'Market data unavailable for {ticker} after {self.retries + 1} attempts: {error}')
+        raise UpstreamUnavailable(f'Market data unavailable ({error})', retry_after=int(self.cooldown))
+
+    def fetch(self, ticker: str, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+        """
+        Fetch daily bars for [start, end)
+        :return: Bars, or an empty DataFrame if upstream does not know the ticker
+        :raises UpstreamUnavailable: If upstream cannot be reached or keeps failing
+        """
+        payload = self._request(ticker, {
+            'period1': int(pd.Timestamp(start, tz='UTC').timestamp()),
+            'period2': int(pd.Timestamp(end, tz='UTC').timestamp()),
+            'interval': '1d',
+            'events': 'div,splits',
+            'includeAdjustedClose': 'false',
+        })
+        return parse_chart(payload) if payload is not None else pd.DataFrame(columns=BAR_COLUMNS)
+
+    def fetch_intraday(self, ticker: str, interval: str, start: pd.Timestamp) -> pd.DataFrame:
+        """
+        Fetch minute-level bars from start until now, including the bar still forming
+        :param interval: One of live_feed.INTRADAY_INTERVALS, e.g. '1m'
+        :return: Bars indexed by UTC bar start time, or an empty DataFrame for an unknown ticker
+        :raises UpstreamUnavailable: If upstream cannot be reached or keeps failing
+        """
+        payload = self._request(ticker, {
+            'period1': int(pd.Timestamp(start).timestamp()),
+            'period2': int(time.time()) + 60,
+            'interval': interval,
+            'includePrePost': 'false',
+        })
+        return parse_intraday(payload) if payload is not None else pd.DataFrame(columns=INTRADAY_COLUMNS)
+
+    def stats(self) -> dict:
+        """Upstream requests, retries, failures and rate-limit rejections since startup"""
+        return {
+            'requests': self.requests,
+            'retried': self.retried,
+            'failures': self.failures,
+            'throttled': self.throttled,
+            'available': time.monotonic() >= self._unavailable_until,
+        }
@@ -0,0 +1,432 @@
+import os
+import time
+import sqlite3
+import datetime
+import threading
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from resample import DAILY, ROLLUP_INTERVALS, period_bounds, period_starts, resample_bars
+
+logger = logging.getLogger(__name__)
+
+DateRange = Tuple[datetime.date, datetime.date]
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Dividends', 'Stock Splits']
+_DB_COLUMNS = ['open', 'high', 'low', 'close', 'volume', 'dividends', 'splits']
+_PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+_TICKER_TABLES = ('bars', 'coverage', 'rollups', 'rollup_state', 'tail_checks')
+# Bump to drop every cached bar on startup (stored bars changed meaning)
+BARS_VERSION = 1
+# Bump to rebuild every ticker's stored weekly/monthly/quarterly bars on next use
+ROLLUP_VERSION = 1
+
+
+class UpstreamUnavailable(Exception):
+    """Raised by a PriceSource that cannot reach upstream (outage, throttling, retries exhausted)"""
+
+    def __init__(self, message: str, retry_after: int = 30):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class PriceSource(ABC):
+    """
+    Upstream provider of daily OHLCV bars. Prices are split-adjusted but not dividend-adjusted
+    (as the chart API reports them), with the Dividends and Stock Splits paid on each day
+    """
+
+    @abstractmethod
+    def fetch(self, ticker: str, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+        """
+        Fetch daily bars for a ticker
+        :param ticker: Ticker symbol
+        :param start: First date to fetch (inclusive)
+        :param end: Last date to fetch (exclusive)
+        :return: DataFrame indexed by date with (a subset of) BAR_COLUMNS
+        :raises UpstreamUnavailable: If upstream cannot be reached
+        """
+
+
+def _to_date(value) -> datetime.date:
+    return pd.Timestamp(value).date()
+
+
+def _to_frame(rows: pd.DataFrame) -> pd.DataFrame:
+    """Bars read from SQLite (date column first) as a date-indexed frame with BAR_COLUMNS"""
+    rows.columns = ['Date'] + BAR_COLUMNS
+    rows['Date'] = pd.to_datetime(rows['Date'])
+    return rows.set_index('Date')
+
+
+def _day_strings(index: pd.Index) -> pd.Index:
+    index = pd.DatetimeIndex(index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.strftime('%Y-%m-%d')
+
+
+def subtract_ranges(start: datetime.date, end: datetime.date,
+                    covered: List[DateRange]) -> List[DateRange]:
+    """Return the parts of [start, end) not covered by any of the (sorted) covered ranges"""
+    gaps = []
+    cursor = start
+    for cov_start, cov_end in covered:
+        if cov_end <= cursor:
+            continue
+        if cov_start >= end:
+            break
+        if cov_start > cursor:
+            gaps.append((cursor, cov_start))
+        cursor = max(cursor, cov_end)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def merge_ranges(ranges: List[DateRange]) -> List[DateRange]:
+    """Merge overlapping or touching date ranges"""
+    merged: List[DateRange] = []
+    for range_start, range_end in sorted(ranges):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+        else:
+            merged.append((range_start, range_end))
+    return merged
+
+
+class PriceStore:
+    def __init__(self, db_path: str, source: PriceSource, tail_ttl: float = 0.0):
+        """
+        Initialize PriceStore
+        :param db_path: Path to the SQLite database holding cached bars
+        :param source: Upstream source used to fill missing date ranges
+        :param tail_ttl: Seconds a fetch of today's still-forming bar is reused before upstream
+            is asked again (0 asks on every request that reaches today)
+        """
+        self.db_path = db_path
+        self.source = source
+        self.tail_ttl = tail_ttl
+        self._write_lock = threading.Lock()
+        self.upstream_calls = 0
+        self.upstream_bars = 0
+        self.stale_served = 0
+        self.tail_reused = 0
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS bars (
+                    ticker TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL,
+                    volume INTEGER, dividends REAL, splits REAL,
+                    PRIMARY KEY (ticker, date)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS coverage (
+                    ticker TEXT NOT NULL,
+                    start TEXT NOT NULL,
+                    end TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS coverage_ticker ON coverage (ticker);
+                CREATE TABLE IF NOT EXISTS rollups (
+                    ticker TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    period TEXT NOT NULL,
+                    open REAL, high REAL, low REAL, close REAL,
+                    volume INTEGER, dividends REAL, splits REAL,
+                    PRIMARY KEY (ticker, interval, period)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS rollup_state (
+                    ticker TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS tail_checks (
+                    ticker TEXT PRIMARY KEY,
+                    checked_at REAL NOT NULL,
+                    end TEXT NOT NULL
+                );
+            ''')
+            if conn.execute('PRAGMA user_version').fetchone()[0] < BARS_VERSION:
+                # Bars cached before version 1 were stored dividend-adjusted
+                for table in _TICKER_TABLES:
+                    conn.execute(f'DELETE FROM {table}')
+                conn.execute(f'PRAGMA user_version = {BARS_VERSION}')
+        logger.info(f'PriceStore initialized with db_path: {db_path}')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def covered_ranges(self, ticker: str) -> List[DateRange]:
+        """Date ranges that have already been fetched for a ticker"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT start, end FROM coverage WHERE ticker = ? ORDER BY start',
+                (ticker,)).fetchall()
+        return [(datetime.date.fromisoformat(s), datetime.date.fromisoformat(e)) for s, e in rows]
+
+    def missing_ranges(self, ticker: str, start, end) -> List[DateRange]:
+        """Sub-ranges of [start, end) that must be fetched from upstream"""
+        ticker = ticker.strip().upper()
+        return subtract_ranges(_to_date(start), _to_date(end), self.covered_ranges(ticker))
+
+    def get_history(self, ticker: str, start, end, interval: str = DAILY) -> pd.DataFrame:
+        """
+        Get bars for [start, end), fetching only missing ranges from upstream
+        :param ticker: Ticker symbol
+        :param start: First date (inclusive)
+        :param end: Last date (exclusive)
+        :param interval: 'daily', or a coarser interval from resample.ROLLUP_INTERVALS. Coarser
+            bars are read from stored rollups and cover whole periods, so the first and last
+            bar may include days outside [start, end)
+        :return: DataFrame indexed by date with BAR_COLUMNS, prices adjusted for splits and
+            dividends. If upstream is unavailable, the cached bars are returned with attrs['stale'] set
+        :raises UpstreamUnavailable: If upstream is unavailable and nothing is cached
+        """
+        ticker = ticker.strip().upper()
+        start, end = _to_date(start), _to_date(end)
+        if interval != DAILY:
+            # Whole periods are needed for complete first and last bars
+            start, end = period_bounds(start, end, interval)
+        unavailable = self._fill_gaps(ticker, start, end)
+        if interval == DAILY:
+            hist = self._read(ticker, start, end)
+        else:
+            self._ensure_rollups(ticker)
+            hist = self._read_rollups(ticker, interval, start, end)
+        if unavailable is not None:
+            if hist.empty:
+                raise unavailable
+            logger.warning(f'Serving stale data for {ticker}: {unavailable}')
+            with self._write_lock:
+                self.stale_served += 1
+            hist.attrs['stale'] = True
+        return hist
+
+    def _fill_gaps(self, ticker: str, start: datetime.date, end: datetime.date) -> Optional[UpstreamUnavailable]:
+        """Fetch the missing parts of [start, end); returns the error that stopped it, if any"""
+        gaps = self.missing_ranges(ticker, start, end)
+        if gaps and self.tail_ttl > 0:
+            gaps = self._skip_recent_tail(ticker, gaps)
+        if gaps:
+            logger.info(f'Fetching {len(gaps)} missing range(s) for {ticker}: {gaps}')
+        rescaled = False
+        while gaps:
+            gap_start, gap_end = gaps.pop(0)
+            try:
+                if self._fill(ticker, gap_start, gap_end) and not rescaled:
+                    # A new split dropped the bars cached on the old scale: fetch them again, once
+                    rescaled = True
+                    gaps = self.missing_ranges(ticker, start, end)
+            except UpstreamUnavailable as e:
+                return e
+        return None
+
+    def _skip_recent_tail(self, ticker: str, gaps: List[DateRange]) -> List[DateRange]:
+        """Drop a gap of only today (and later) if it was fetched less than tail_ttl seconds ago"""
+        tail_start, tail_end = gaps[-1]
+        if tail_start < datetime.date.today():
+            return gaps
+        with self._connect() as conn:
+            row = conn.execute('SELECT checked_at, end FROM tail_checks WHERE ticker = ?', (ticker,)).fetchone()
+        if row and time.time() - row[0] < self.tail_ttl and datetime.date.fromisoformat(row[1]) >= tail_end:
+            with self._write_lock:
+                self.tail_reused += 1
+            return gaps[:-1]
+        return gaps
+
+    def _fill(self, ticker: str, start: datetime.date, end: datetime.date) -> bool:
+        """
+        Fetch one gap from upstream and persist it
+        :return: True if the gap held a new split and every other cached bar of the ticker was dropped
+        """
+        hist = self.source.fetch(ticker, start, end)
+        # Today's bar is still forming, so never mark it (or the future) as covered
+        covered_end = min(end, datetime.date.today())
+
+        rescaled = False
+        with self._write_lock, self._connect() as conn:
+            self.upstream_calls += 1
+            self.upstream_bars += 0 if hist is None else len(hist)
+            if hist is not None and not hist.empty:
+                if self._has_new_event(conn, ticker, hist, 'Stock Splits'):
+                    # Upstream rescaled every bar before the split; the cached ones are on the old scale
+                    logger.info(f'New split for {ticker}; dropping its cached bars')
+                    self._drop(conn, ticker)
+                    rescaled = True
+                elif self._has_new_event(conn, ticker, hist, 'Dividends'):
+                    # Reads adjust daily bars for it, but stored rollups hold the old adjustment
+                    conn.execute('DELETE FROM rollups WHERE ticker = ?', (ticker,))
+                    conn.execute('DELETE FROM rollup_state WHERE ticker = ?', (ticker,))
+                self._write_bars(conn, ticker, hist)
+                self._update_rollups(conn, ticker, hist.index)
+            elif not conn.execute('SELECT 1 FROM bars WHERE ticker = ? LIMIT 1', (ticker,)).fetchone():
+                # Upstream may answer an unknown symbol and a transient failure the same way,
+                # so an empty answer for a ticker we have never seen is not cached
+                logger.warning(f'No upstream data for unknown ticker {ticker}; not caching')
+                return False
+            if start < covered_end:
+                self._add_coverage(conn, ticker, start, covered_end)
+            if end > covered_end:
+                conn.execute('INSERT OR REPLACE INTO tail_checks (ticker, checked_at, end) VALUES (?, ?, ?)',
+                             (ticker, time.time(), end.isoformat()))
+        return rescaled
+
+    @staticmethod
+    def _has_new_event(conn: sqlite3.Connection, ticker: str, hist: pd.DataFrame, column: str) -> bool:
+        """Whether hist holds a split or dividend that cached bars before it were fetched without"""
+        db_column = _DB_COLUMNS[BAR_COLUMNS.index(column)]
+        values = hist[column].fillna(0.0).to_numpy()
+        for day, value in zip(_day_strings(hist.index)[values != 0], values[values != 0]):
+            stored = conn.execute(f'SELECT {db_column} FROM bars WHERE ticker = ? AND date = ?',
+                                  (ticker, day)).fetchone()
+            if stored and abs((stored[0] or 0.0) - value) < 1e-9:
+                continue
+            if conn.execute('SELECT 1 FROM bars WHERE ticker = ? AND date < ? LIMIT 1', (ticker, day)).fetchone():
+                return True
+        return False
+
+    def _write_bars(self, conn: sqlite3.Connection, ticker: str, hist: pd.DataFrame) -> None:
+        frame = hist.reindex(columns=BAR_COLUMNS).fillna({'Dividends': 0.0, 'Stock Splits': 0.0})
+        rows = zip(
+            [ticker] * len(frame),
+            _day_strings(hist.index),
+            *(frame[col].astype(float).tolist() for col in _PRICE_COLUMNS),
+            frame['Volume'].fillna(0).astype('int64').tolist(),
+            frame['Dividends'].astype(float).tolist(),
+            frame['Stock Splits'].astype(float).tolist(),
+        )
+        conn.executemany(
+            f'INSERT OR REPLACE INTO bars (ticker, date, {", ".join(_DB_COLUMNS)}) '
+            f'VALUES (?, ?, {", ".join("?" * len(_DB_COLUMNS))})',
+            rows)
+
+    def _ensure_rollups(self, ticker: str) -> None:
+        """Build a ticker's rollups from its cached bars, once (bars cached before rollups existed)"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT version FROM rollup_state WHERE ticker = ?', (ticker,)).fetchone()
+        if row and row[0] == ROLLUP_VERSION:
+            return
+        with self._write_lock, self._connect() as conn:
+            row = conn.execute('SELECT version FROM rollup_state WHERE ticker = ?', (ticker,)).fetchone()
+            if row and row[0] == ROLLUP_VERSION:
+                return
+            conn.execute('DELETE FROM rollups WHERE ticker = ?', (ticker,))
+            hist = self._read_bars(conn, ticker, datetime.date.min, datetime.date.max)
+            for interval in ROLLUP_INTERVALS:
+                self._write_rollups(conn, ticker, interval, resample_bars(hist, interval))
+            conn.execute('INSERT OR REPLACE INTO rollup_state (ticker, version) VALUES (?, ?)',
+                         (ticker, ROLLUP_VERSION))
+            logger.info(f'Built rollups for {ticker} from {len(hist)} bars')
+
+    def _update_rollups(self, conn: sqlite3.Connection, ticker: str, dates: pd.Index) -> None:
+        """Recompute the rollup periods touched by newly written bars"""
+        if not conn.execute('SELECT 1 FROM rollup_state WHERE ticker = ?', (ticker,)).fetchone():
+            # Built in full by _ensure_rollups on first use
+            return
+        index = pd.DatetimeIndex(dates)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        first, last = index.min().date(), index.max().date() + datetime.timedelta(days=1)
+        bounds = [period_bounds(first, last, interval) for interval in ROLLUP_INTERVALS]
+        hist = self._read_bars(conn, ticker, min(b[0] for b in bounds), max(b[1] for b in bounds))
+        for interval, (period_start, period_end) in zip(ROLLUP_INTERVALS, bounds):
+            bars = resample_bars(hist, interval)
+            # The read window spans the widest interval; other intervals' edge periods may be cut
+            self._write_rollups(conn, ticker, interval,
+                                bars[(bars.index >= pd.Timestamp(period_start)) & (bars.index < pd.Timestamp(period_end))])
+
+    def _write_rollups(self, conn: sqlite3.Connection, ticker: str, interval: str, bars: pd.DataFrame) -> None:
+        rows = zip(
+            [ticker] * len(bars),
+            [interval] * len(bars),
+            bars.index.strftime('%Y-%m-%d'),
+            *(bars[col].astype(float).tolist() for col in _PRICE_COLUMNS),
+            bars['Volume'].astype('int64').tolist(),
+            bars['Dividends'].astype(float).tolist(),
+            bars['Stock Splits'].astype(float).tolist(),
+        )
+        conn.executemany(
+            f'INSERT OR REPLACE INTO rollups (ticker, interval, period, {", ".join(_DB_COLUMNS)}) '
+            f'VALUES (?, ?, ?, {", ".join("?" * len(_DB_COLUMNS))})',
+            rows)
+
+    def _add_coverage(self, conn: sqlite3.Connection, ticker: str,
+                      start: datetime.date, end: datetime.date) -> None:
+        rows = conn.execute('SELECT start, end FROM coverage WHERE ticker = ?', (ticker,)).fetchall()
+        ranges = [(datetime.date.fromisoformat(s), datetime.date.fromisoformat(e)) for s, e in rows]
+        merged = merge_ranges(ranges + [(start, end)])
+        conn.execute('DELETE FROM coverage WHERE ticker = ?', (ticker,))
+        conn.executemany(
+            'INSERT INTO coverage (ticker, start, end) VALUES (?, ?, ?)',
+            [(ticker, s.isoformat(), e.isoformat()) for s, e in merged])
+
+    def _read(self, ticker: str, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+        with self._connect() as conn:
+            return self._read_bars(conn, ticker, start, end)
+
+    @staticmethod
+    def _read_bars(conn: sqlite3.Connection, ticker: str, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+        """Cached daily bars in [start, end), adjusted for dividends"""
+        hist = pd.read_sql_query(
+            f'SELECT date, {", ".join(_DB_COLUMNS)} FROM bars '
+            'WHERE ticker = ? AND date >= ? AND date < ? ORDER BY date',
+            conn, params=(ticker, start.isoformat(), end.isoformat()))
+        hist = _to_frame(hist)
+        if hist.empty:
+            return hist
+        # Like upstream's adjusted close: each ex-dividend day scales every earlier bar by
+        # 1 - dividend / previous close, so the series has no drop on the ex-date
+        ex_dates, multipliers = [], []
+        for day, amount in conn.execute(
+                'SELECT date, dividends FROM bars WHERE ticker = ? AND date > ? AND dividends > 0 ORDER BY date',
+                (ticker, start.isoformat())).fetchall():
+            previous = conn.execute('SELECT close FROM bars WHERE ticker = ? AND date < ? ORDER BY date DESC LIMIT 1',
+                                    (ticker, day)).fetchone()
+            if previous and previous[0]:
+                ex_dates.append(day)
+                multipliers.append(1.0 - amount / previous[0])
+        if not ex_dates:
+            return hist
+        # Factor of a bar: the product of the multipliers of every later ex-date
+        factors = np.append(np.cumprod(multipliers[::-1])[::-1], 1.0)
+        later = pd.DatetimeIndex(pd.to_datetime(ex_dates)).searchsorted(hist.index, side='right')
+        hist[_PRICE_COLUMNS] = hist[_PRICE_COLUMNS].mul(factors[later], axis=0)
+        return hist
+
+    def _read_rollups(self, ticker: str, interval: str, start: datetime.date, end: datetime.date) -> pd.DataFrame:
+        with self._connect() as conn:
+            hist = pd.read_sql_query(
+                f'SELECT period, {", ".join(_DB_COLUMNS)} FROM rollups '
+                'WHERE ticker = ? AND interval = ? AND period >= ? AND period < ? ORDER BY period',
+                conn, params=(ticker, interval, start.isoformat(), end.isoformat()))
+        return _to_frame(hist)
+
+    def stats(self) -> dict:
+        """Upstream call and bar counts, and stale answers, since startup"""
+        stats = {'upstream_calls': self.upstream_calls, 'upstream_bars': self.upstream_bars,
+                 'stale_served': self.stale_served, 'tail_reused': self.tail_reused}
+        if hasattr(self.source, 'stats'):
+            stats.update({f'source_{k}': v for k, v in self.source.stats().items()})
+        return stats
+
+    def invalidate(self, ticker: Optional[str] = None) -> None:
+        """Drop cached bars for one ticker, or for all tickers"""
+        with self._write_lock, self._connect() as conn:
+            if ticker:
+                self._drop(conn, ticker.strip().upper())
+            else:
+                for table in _TICKER_TABLES:
+                    conn.execute(f'DELETE FROM {table}')
+
+    @staticmethod
+    def _drop(conn: sqlite3.Connection, ticker: str) -> None:
+        for table in _TICKER_TABLES:
+            conn.execute(f'DELETE FROM {table} WHERE ticker = ?', (ticker,))
@@ -0,0 +1,106 @@
+import datetime
+import logging
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DAILY = 'daily'
+AUTO = 'auto'
+INTERVALS = ('daily', 'weekly', 'monthly', 'quarterly')
+# Coarser intervals stored by the price store next to the daily bars
+ROLLUP_INTERVALS = ('weekly', 'monthly', 'quarterly')
+# Average calendar days per bar, used to estimate bar counts
+_DAYS_PER_BAR = {'daily': 365.25 / 252, 'weekly': 7.0, 'monthly': 365.25 / 12, 'quarterly': 365.25 / 4}
+# 'auto' picks the finest interval that keeps a chart at or below this many bars
+AUTO_MAX_BARS = 400
+
+
+def parse_interval(value) -> str:
+    """Normalize an interval option; missing means daily"""
+    interval = str(value or DAILY).strip().lower()
+    if interval != AUTO and interval not in INTERVALS:
+        raise ValueError(f'Unsupported interval: {value}. Use one of {", ".join(INTERVALS + (AUTO,))}')
+    return interval
+
+
+def choose_interval(start, end, max_bars: int = AUTO_MAX_BARS) -> str:
+    """The finest interval that shows [start, end) in at most max_bars bars"""
+    days = (pd.Timestamp(end) - pd.Timestamp(start)).days
+    for interval in INTERVALS:
+        if days / _DAYS_PER_BAR[interval] <= max_bars:
+            return interval
+    return INTERVALS[-1]
+
+
+def period_starts(dates: np.ndarray, interval: str) -> np.ndarray:
+    """
+    First day of the period holding each date
+    :param dates: datetime64 values
+    :param interval: One of INTERVALS
+    :return: datetime64[D] array (weeks start on Monday)
+    """
+    days = dates.astype('datetime64[D]')
+    if interval == 'weekly':
+        # 1970-01-01 was a Thursday; (days + 3) % 7 is the weekday with Monday = 0
+        ordinal = days.astype('int64')
+        return (ordinal - (ordinal + 3) % 7).astype('datetime64[D]')
+    if interval == 'monthly':
+        return days.astype('datetime64[M]').astype('datetime64[D]')
+    if interval == 'quarterly':
+        months = days.astype('datetime64[M]').astype('int64')
+        return (months - months % 3).astype('datetime64[M]').astype('datetime64[D]')
+    return days
+
+
+def period_bounds(start: datetime.date, end: datetime.date, interval: str) -> Tuple[datetime.date, datetime.date]:
+    """Widen [start, end) to whole periods: from the first day of start's period to the end of end's"""
+    if interval == DAILY:
+        return start, end
+    first, last = period_starts(np.array([start, end - datetime.timedelta(days=1)], dtype='datetime64[D]'), interval)
+    # Stepping this far from a period's first day always lands in the next period
+    step = {'weekly': 7, 'monthly': 31, 'quarterly': 92}[interval]
+    following = period_starts(np.array([last + np.timedelta64(step, 'D')], dtype='datetime64[D]'), interval)[0]
+    return first.astype(datetime.date), following.astype(datetime.date)
+
+
+def resample_bars(hist: pd.DataFrame, interval: str) -> pd.DataFrame:
+    """
+    Aggregate daily OHLCV bars into weekly, monthly or quarterly bars, labelled by the first
+    day of each period: first open, highest high, lowest low, last close, summed volume and
+    dividends, and the combined split ratio. Bars must be sorted by date.
+    """
+    if interval == DAILY or hist.empty:
+        return hist
+    index = pd.DatetimeIndex(hist.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    labels = period_starts(index.values, interval)
+    # Offsets of the first and last bar of each period
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(labels)] - 1
+
+    def column(name):
+        return hist[name].to_numpy(dtype='float64')
+
+    out = {}
+    if 'Open' in hist:
+        out['Open'] = column('Open')[starts]
+    if 'High' in hist:
+        out['High'] = np.fmax.reduceat(column('High'), starts)
+    if 'Low' in hist:
+        out['Low'] = np.fmin.reduceat(column('Low'), starts)
+    out['Close'] = column('Close')[ends]
+    for name in ('Volume', 'Dividends'):
+        if name in hist:
+            out[name] = np.add.reduceat(np.nan_to_num(column(name)), starts)
+    if 'Stock Splits' in hist:
+        # 0 means no split; ratios within a period multiply
+        splits = column('Stock Splits')
+        combined = np.multiply.reduceat(np.where(splits > 0, splits, 1.0), starts)
+        out['Stock Splits'] = np.where(combined != 1.0, combined, 0.0)
+
+    result = pd.DataFrame(out, index=pd.DatetimeIndex(labels[starts].astype('datetime64[ns]'), name=hist.index.name or 'Date'))
+    return result[[c for c in hist.columns if c in result.columns]]
@@ -49,6 +49,8 @@ foreach ($dir in $directories) {
 Write-ConfigLog "Copying static files..."
 $filesToCopy = @{
     (Join-Path $sourcePath "static\js\app.js") = (Join-Path $destPath "static\js\app.js")
+    (Join-Path $sourcePath "static\js\stockForm.js") = (Join-Path $destPath "static\js\stockForm.js")
+    (Join-Path $sourcePath "static\js\liveChart.js") = (Join-Path $destPath "static\js\liveChart.js")
     (Join-Path $sourcePath "templates\index.html") = (Join-Path $destPath "templates\index.html")
 }
 
@@ -64,6 +66,16 @@ foreach ($source in $filesToCopy.Keys) {
     }
 }
 
+# Copy the front-end build (python build_assets.py); without it pages compile the JSX in the browser
+$distSource = Join-Path $sourcePath "static\dist"
+if (Test-Path $distSource) {
+    Invoke-WithWhatIf -Command "Copy-Item '$distSource' '$(Join-Path $destPath "static")' -Recurse -Force" `
+                     -Description "Copying front-end build: $distSource" `
+                     -Target (Join-Path $destPath "static\dist")
+} else {
+    Write-ConfigLog "Front-end build not found: $distSource (run build_assets.py)" "Warning"
+}
+
 # Set permissions
 $paths = @(
     (Join-Path $destPath "static"),
@@ -0,0 +1,135 @@
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DOWNSAMPLE_METHODS = ('lttb', 'minmax')
+
+# DataFrame column -> key in the columnar payload
+PAYLOAD_COLUMNS = {
+    'Open': 'open',
+    'High': 'high',
+    'Low': 'low',
+    'Close': 'close',
+    'Volume': 'volume',
+}
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling
+    :param x: Monotonic x values (e.g. epoch seconds)
+    :param y: Series values
+    :param threshold: Number of points to keep
+    :return: Sorted indices of the points to keep
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = x.astype(float)
+    y = y.astype(float)
+    # Bucket edges for the n - 2 interior points; first and last points are always kept
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    prev = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket (or the last point for the final bucket)
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+        areas = np.abs((x[prev] - avg_x) * (bucket_y - y[prev])
+                       - (x[prev] - bucket_x) * (avg_y - y[prev]))
+        prev = start + int(np.nanargmax(areas)) if np.isfinite(areas).any() else start
+        selected[i + 1] = prev
+    return selected
+
+
+def minmax_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Min/max bucketing: keep the lowest and highest point of each bucket
+    :param y: Series values
+    :param threshold: Approximate number of points to keep
+    :return: Sorted, unique indices of the points to keep
+    """
+    n = len(y)
+    buckets = threshold // 2
+    if threshold >= n or buckets < 1:
+        return np.arange(n)
+
+    bucket_ids = (np.arange(n) * buckets) // n
+    # Sort by (bucket, value); the first and last row of each bucket are its min and max
+    order = np.lexsort((np.nan_to_num(y.astype(float), nan=np.inf), bucket_ids))
+    boundaries = np.flatnonzero(np.diff(bucket_ids[order])) + 1
+    firsts = np.concatenate(([0], boundaries))
+    lasts = np.concatenate((boundaries - 1, [n - 1]))
+    return np.unique(np.concatenate((order[firsts], order[lasts], [0, n - 1])))
+
+
+def _to_json_list(values: np.ndarray) -> list:
+    """Convert an array to a JSON-safe list with NaN mapped to None"""
+    if values.dtype.kind in 'iub':
+        return values.tolist()
+    values = values.astype(float)
+    mask = np.isnan(values)
+    if not mask.any():
+        return values.tolist()
+    out = values.astype(object)
+    out[mask] = None
+    return out.tolist()
+
+
+def to_columnar(hist: pd.DataFrame, columns: Optional[List[str]] = None,
+                extra: Optional[Dict[str, str]] = None, max_points: Optional[int] = None,
+                method: str = 'lttb') -> dict:
+    """
+    Build a columnar payload of parallel arrays from price history
+    :param hist: DataFrame indexed by date
+    :param columns: DataFrame columns to include (defaults to OHLCV)
+    :param extra: Additional {DataFrame column: payload key} pairs, e.g. indicators
+    :param max_points: Downsample to about this many points, or None to send every bar
+    :param method: Downsampling method, one of DOWNSAMPLE_METHODS
+    :return: Dict with 'timestamp' (epoch seconds) and one array per column
+    """
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f'Unsupported downsampling method: {method}')
+
+    mapping = {col: PAYLOAD_COLUMNS[col] for col in (columns or PAYLOAD_COLUMNS) if col in hist}
+    mapping.update({col: key for col, key in (extra or {}).items() if col in hist})
+
+    timestamps = pd.DatetimeIndex(hist.index).values.astype('datetime64[s]').astype(np.int64)
+    total = len(timestamps)
+
+    if max_points and max_points < total:
+        close = hist['Close'].to_numpy()
+        if method == 'lttb':
+            keep = lttb_indices(timestamps, close, max_points)
+        else:
+            keep = minmax_indices(close, max_points)
+    else:
+        keep = slice(None)
+
+    payload = {'timestamp': timestamps[keep].tolist()}
+    for col, key in mapping.items():
+        payload[key] = _to_json_list(hist[col].to_numpy()[keep])
+    payload['points'] = len(payload['timestamp'])
+    payload['total_points'] = total
+    return payload
+
+
+def relative_performance(close: pd.Series) -> pd.Series:
+    """Percentage change of a price series relative to its first valid value"""
+    first = close.dropna()
+    if first.empty:
+        return close * np.nan
+    return (close / first.iloc[0] - 1.0) * 100.0
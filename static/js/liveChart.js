@@ -0,0 +1,85 @@
+// LiveChart Component: draws streamed intraday bars as SVG, so new bars only redraw in the browser
+const LIVE_COLORS = ['#1f77b4', '#ff7f0e', '#9467bd', '#8c564b', '#e377c2', '#17becf'];
+
+const LiveChart = ({ bars, indicators, plotType, showVolume, width, height }) => {
+    const count = bars ? bars.timestamp.length : 0;
+    if (!count) {
+        return <div className="notice">Waiting for the first closed bar...</div>;
+    }
+
+    const margin = { top: 10, right: 60, bottom: 24, left: 10 };
+    const plotWidth = width - margin.left - margin.right;
+    const volumeHeight = showVolume ? Math.round((height - margin.top - margin.bottom) * 0.2) : 0;
+    const priceHeight = height - margin.top - margin.bottom - volumeHeight;
+    // Only indicators drawn on the price axis (e.g. moving averages) are overlaid
+    const overlays = (indicators || [])
+        .filter((indicator) => indicator.panel === 'price')
+        .reduce((keys, indicator) => keys.concat(indicator.series), []);
+
+    let low = Infinity;
+    let high = -Infinity;
+    [bars.low, bars.high].concat(overlays.map((key) => bars[key] || [])).forEach((values) => {
+        values.forEach((value) => {
+            if (value !== null) {
+                low = Math.min(low, value);
+                high = Math.max(high, value);
+            }
+        });
+    });
+    const range = high - low || 1;
+    const step = plotWidth / count;
+    const x = (i) => margin.left + step * (i + 0.5);
+    const y = (value) => margin.top + (high - value) / range * priceHeight;
+    const line = (values) => values
+        .map((value, i) => (value === null ? null : `${x(i).toFixed(1)},${y(value).toFixed(1)}`))
+        .filter(Boolean)
+        .join(' ');
+
+    let priceMarks;
+    if (plotType === 'line') {
+        priceMarks = <polyline points={line(bars.close)} fill="none" stroke="#333" strokeWidth="1.5" />;
+    } else {
+        const body = Math.max(1, step * 0.7);
+        priceMarks = bars.close.map((close, i) => {
+            const open = bars.open[i];
+            const color = close >= open ? '#2e7d32' : '#c62828';
+            return (
+                <g key={bars.timestamp[i]} stroke={color} fill={color}>
+                    <line x1={x(i)} x2={x(i)} y1={y(bars.high[i])} y2={y(bars.low[i])} />
+                    <rect x={x(i) - body / 2} width={body} y={y(Math.max(open, close))}
+                          height={Math.max(1, Math.abs(y(open) - y(close)))} />
+                </g>
+            );
+        });
+    }
+
+    let volumeMarks = null;
+    if (showVolume) {
+        const maxVolume = Math.max(...bars.volume) || 1;
+        const base = height - margin.bottom;
+        volumeMarks = bars.volume.map((volume, i) => (
+            <rect key={bars.timestamp[i]} x={x(i) - step * 0.35} width={Math.max(1, step * 0.7)}
+                  y={base - volume / maxVolume * volumeHeight} height={volume / maxVolume * volumeHeight}
+                  fill="#b0bec5" />
+        ));
+    }
+
+    const last = bars.close[count - 1];
+    const lastTime = new Date(bars.timestamp[count - 1] * 1000);
+    const firstTime = new Date(bars.timestamp[0] * 1000);
+    return (
+        <svg viewBox={`0 0 ${width} ${height}`} style={{ width: '100%', background: '#fff' }}>
+            {volumeMarks}
+            {priceMarks}
+            {overlays.map((key, i) => (
+                <polyline key={key} points={line(bars[key] || [])} fill="none"
+                          stroke={LIVE_COLORS[i % LIVE_COLORS.length]} strokeWidth="1.2" />
+            ))}
+            <text x={width - margin.right + 4} y={y(high) + 4} fontSize="11">{high.toFixed(2)}</text>
+            <text x={width - margin.right + 4} y={y(low)} fontSize="11">{low.toFixed(2)}</text>
+            <text x={width - margin.right + 4} y={y(last) + 4} fontSize="12" fontWeight="bold">{last.toFixed(2)}</text>
+            <text x={margin.left} y={height - 6} fontSize="11">{firstTime.toLocaleString()}</text>
+            <text x={width - margin.right} y={height - 6} fontSize="11" textAnchor="end">{lastTime.toLocaleString()}</text>
+        </svg>
+    );
+};
@@ -1,20 +1,113 @@
+// Closed bars kept in the browser for a live chart
+const LIVE_MAX_BARS = 500;
+
+// Append streamed bars (parallel arrays) that are newer than the last bar already shown
+const appendBars = (current, incoming) => {
+    if (!current || !current.timestamp.length) {
+        return incoming;
+    }
+    const last = current.timestamp[current.timestamp.length - 1];
+    const start = incoming.timestamp.findIndex((timestamp) => timestamp > last);
+    if (start < 0) {
+        return current;
+    }
+    const merged = {};
+    Object.keys(current).forEach((key) => {
+        if (Array.isArray(current[key])) {
+            merged[key] = current[key].concat((incoming[key] || []).slice(start)).slice(-LIVE_MAX_BARS);
+        }
+    });
+    return merged;
+};
+
 // StockForm Component
-const StockForm = () => {
+const StockForm = ({ liveEnabled }) => {
+    const [mode, setMode] = React.useState('history');
     const [ticker, setTicker] = React.useState('');
+    const [source, setSource] = React.useState('');
     const [startDate, setStartDate] = React.useState('');
     const [endDate, setEndDate] = React.useState('');
     const [plotImage, setPlotImage] = React.useState('');
     const [error, setError] = React.useState('');
+    const [stale, setStale] = React.useState(false);
     const [loading, setLoading] = React.useState(false);
     const [plotType, setPlotType] = React.useState('line');
+    const [barInterval, setBarInterval] = React.useState('auto');
     const [showMA, setShowMA] = React.useState(false);
     const [showVolume, setShowVolume] = React.useState(false);
     const [maPeriod, setMaPeriod] = React.useState(20);
+    const [liveInterval, setLiveInterval] = React.useState('1m');
+    const [liveBars, setLiveBars] = React.useState(null);
+    const [liveIndicators, setLiveIndicators] = React.useState([]);
+    const [liveStatus, setLiveStatus] = React.useState('');
+    const stream = React.useRef(null);
+
+    const stopLive = () => {
+        if (stream.current) {
+            stream.current.close();
+            stream.current = null;
+        }
+        setLiveStatus('');
+    };
+
+    // Close the stream when the form goes away
+    React.useEffect(() => () => {
+        if (stream.current) {
+            stream.current.close();
+        }
+    }, []);
+
+    const startLive = () => {
+        stopLive();
+        setPlotImage('');
+        setLiveBars(null);
+        const query = new URLSearchParams({ ticker, interval: liveInterval });
+        if (showMA) {
+            query.set('indicators', `sma:${maPeriod}`);
+        }
+        // The server sends a snapshot of recent bars, then each bar as it closes. After a
+        // dropped connection EventSource reconnects with Last-Event-ID and gets only missed bars.
+        const source = new EventSource(`/D8TAVu/stock-live?${query}`);
+        stream.current = source;
+        setLiveStatus('Connecting...');
+        source.addEventListener('snapshot', (event) => {
+            const data = JSON.parse(event.data);
+            setLiveIndicators(data.indicators);
+            setLiveBars((current) => appendBars(current, data.bars));
+            setStale(Boolean(data.stale));
+            setLiveStatus('Live');
+        });
+        source.addEventListener('bars', (event) => {
+            const data = JSON.parse(event.data);
+            setLiveBars((current) => appendBars(current, data.bars));
+        });
+        source.addEventListener('status', (event) => {
+            setStale(Boolean(JSON.parse(event.data).stale));
+        });
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) {
+                stream.current = null;
+                setLiveStatus('');
+                setError('The live stream could not be opened');
+            } else {
+                setLiveStatus('Reconnecting...');
+            }
+        };
+    };
 
     const handleSubmit = async (e) => {
         e.preventDefault();
         setError('');
+        setStale(false);
+        if (mode === 'live') {
+            startLive();
+            return;
+        }
+        stopLive();
+        setLiveBars(null);
         setLoading(true);
+        const container = document.querySelector('.container');
+        const chartWidth = Math.round((container ? container.clientWidth : 800) * (window.devicePixelRatio || 1));
         try {
             const response = await fetch('/D8TAVu/stock-data', {
                 method: 'POST',
@@ -23,19 +116,26 @@ const StockForm = () => {
                 },
                 body: JSON.stringify({
                     ticker,
+                    source,
                     startDate,
                     endDate,
                     plotType,
+                    interval: barInterval,
                     showMA,
                     showVolume,
-                    maPeriod
+                    maPeriod,
+                    // Ask for a chart sized to what is actually displayed: 800x533 in the 800 px
+                    // container, 1600x1067 on 2x displays (the sizes warmer.example.json pre-renders)
+                    width: chartWidth,
+                    height: Math.round(chartWidth * 2 / 3)
                 })
             });
             
             const data = await response.json();
             
             if (response.ok) {
-                setPlotImage(`data:image/png;base64,${data.plot}`);
+                setPlotImage(data.chart_url);
+                setStale(Boolean(data.stale));
             } else {
                 setError(data.error || 'Failed to fetch stock data');
             }
@@ -51,6 +151,15 @@ const StockForm = () => {
         <div className="container">
             <h1>Stock Data Visualization</h1>
             <form onSubmit={handleSubmit}>
+                <div className="form-group">
+                    <label>Mode:</label>
+                    <select value={mode} onChange={(e) => { stopLive(); setMode(e.target.value); }}>
+                        <option value="history">Historical</option>
+                        <option value="live" disabled={!liveEnabled}>
+                            {liveEnabled ? 'Live (intraday)' : 'Live (intraday) - not available on this server'}
+                        </option>
+                    </select>
+                </div>
                 <div className="form-group">
                     <label>Ticker Symbol:</label>
                     <input
@@ -58,27 +167,38 @@ const StockForm = () => {
                         value={ticker}
                         onChange={(e) => setTicker(e.target.value.toUpperCase())}
                         placeholder="e.g., AAPL"
-                        required
-                    />
-                </div>
-                <div className="form-group">
-                    <label>Start Date:</label>
-                    <input
-                        type="date"
-                        value={startDate}
-                        onChange={(e) => setStartDate(e.target.value)}
-                        required
-                    />
-                </div>
-                <div className="form-group">
-                    <label>End Date:</label>
-                    <input
-                        type="date"
-                        value={endDate}
-                        onChange={(e) => setEndDate(e.target.value)}
-                        required
+                        required={!source || mode === 'live'}
                     />
                 </div>
+                {mode === 'history' && (<React.Fragment>
+                    <div className="form-group">
+                        <label>Or Share File (CSV/Parquet):</label>
+                        <input
+                            type="text"
+                            value={source}
+                            onChange={(e) => setSource(e.target.value)}
+                            placeholder="e.g., data/prices.csv"
+                        />
+                    </div>
+                    <div className="form-group">
+                        <label>Start Date:</label>
+                        <input
+                            type="date"
+                            value={startDate}
+                            onChange={(e) => setStartDate(e.target.value)}
+                            required
+                        />
+                    </div>
+                    <div className="form-group">
+                        <label>End Date:</label>
+                        <input
+                            type="date"
+                            value={endDate}
+                            onChange={(e) => setEndDate(e.target.value)}
+                            required
+                        />
+                    </div>
+                </React.Fragment>)}
                 <div className="form-group">
                     <label>Plot Type:</label>
                     <select value={plotType} onChange={(e) => setPlotType(e.target.value)}>
@@ -87,6 +207,27 @@ const StockForm = () => {
                         <option value="ohlc">OHLC</option>
                     </select>
                 </div>
+                <div className="form-group">
+                    <label>Interval:</label>
+                    {mode === 'live' ? (
+                        <select value={liveInterval} onChange={(e) => setLiveInterval(e.target.value)}>
+                            <option value="1m">1 minute</option>
+                            <option value="2m">2 minutes</option>
+                            <option value="5m">5 minutes</option>
+                            <option value="15m">15 minutes</option>
+                            <option value="30m">30 minutes</option>
+                            <option value="60m">1 hour</option>
+                        </select>
+                    ) : (
+                        <select value={barInterval} onChange={(e) => setBarInterval(e.target.value)}>
+                            <option value="auto">Auto (by date range)</option>
+                            <option value="daily">Daily</option>
+                            <option value="weekly">Weekly</option>
+                            <option value="monthly">Monthly</option>
+                            <option value="quarterly">Quarterly</option>
+                        </select>
+                    )}
+                </div>
                 <div className="form-group">
                     <label>
                         <input
@@ -119,12 +260,30 @@ const StockForm = () => {
                     </label>
                 </div>
                 <button type="submit" disabled={loading}>
-                    {loading ? 'Loading...' : 'Generate Plot'}
+                    {loading ? 'Loading...' : mode === 'live' ? 'Start Live Chart' : 'Generate Plot'}
                 </button>
+                {liveStatus && (
+                    <button type="button" className="stop-live" onClick={stopLive}>Stop</button>
+                )}
             </form>
             
             {error && <div className="error">{error}</div>}
+            {stale && <div className="notice">Market data is temporarily unavailable; showing the most recent cached prices.</div>}
             
+            {liveStatus && <div className="notice">{liveStatus}</div>}
+            {liveBars && (
+                <div id="plot-container">
+                    <LiveChart
+                        bars={liveBars}
+                        indicators={liveIndicators}
+                        plotType={plotType}
+                        showVolume={showVolume}
+                        width={800}
+                        height={533}
+                    />
+                </div>
+            )}
+
             {plotImage && (
                 <div id="plot-container">
                     <img src={plotImage} alt="Stock Plot" style={{width: '100%'}} />
@@ -134,5 +293,3 @@ const StockForm = () => {
     );
 };
 
-// Render the app
-ReactDOM.render(<StockForm />, document.getElementById('root'));
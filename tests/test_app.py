@@ -0,0 +1,127 @@
+import os
+import base64
+import hashlib
+import tempfile
+
+import pytest
+
+AUTH = {'Authorization': 'Basic ' + base64.b64encode(b'admin:admin').decode()}
+
+
+@pytest.fixture(scope='module')
+def client():
+    # config reads the environment once, on the first import of the app
+    root = tempfile.mkdtemp(prefix='d8tavu-tests-')
+    share = os.path.join(root, 'share')
+    os.makedirs(share)
+    os.environ.update({
+        'D8TAVU_USER_FILES': share,
+        'D8TAVU_CACHE_DIR': os.path.join(root, 'cache'),
+        'D8TAVU_LOG_FILE': os.path.join(root, 'app.log'),
+        'D8TAVU_RENDER_WORKERS': '0',
+        # Nothing listens here, so a test that reaches upstream fails fast
+        'D8TAVU_MARKET_DATA_URL': 'http://127.0.0.1:9',
+        'D8TAVU_UPSTREAM_RETRIES': '0',
+    })
+    import app
+    app.app.config['TESTING'] = True
+    return app.app.test_client()
+
+
+CHART = {'ticker': 'AAA', 'startDate': '2020-01-01', 'endDate': '2020-06-01', 'dataFormat': 'columnar'}
+COMPARE = {'tickers': 'AAA,BBB', 'startDate': '2020-01-01', 'endDate': '2020-06-01'}
+
+
+@pytest.mark.parametrize('path, body', [('/D8TAVu/stock-data', CHART), ('/D8TAVu/stock-data/compare', COMPARE)])
+@pytest.mark.parametrize('max_points', ['x', [5], -10, 2, 10 ** 9])
+def test_invalid_max_points_is_a_bad_request(client, path, body, max_points):
+    response = client.post(path, json=dict(body, maxPoints=max_points), headers=AUTH)
+    assert response.status_code == 400
+    assert 'maxPoints' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('path, body', [('/D8TAVu/stock-data', CHART), ('/D8TAVu/stock-data/compare', COMPARE)])
+def test_invalid_downsample_is_a_bad_request(client, path, body):
+    response = client.post(path, json=dict(body, maxPoints=500, downsample='median'), headers=AUTH)
+    assert response.status_code == 400
+
+
+def test_valid_max_points_reaches_upstream(client):
+    # Parameters are accepted; the unreachable upstream then answers 503
+    response = client.post('/D8TAVu/stock-data', json=dict(CHART, maxPoints='500'), headers=AUTH)
+    assert response.status_code == 503
+
+
+@pytest.mark.parametrize('path', ['/D8TAVu/metrics', '/metrics'])
+def test_metrics_require_auth(client, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path + '?format=prometheus').status_code == 401
+    response = client.get(path, headers=AUTH)
+    assert response.status_code == 200
+    assert 'chart_cache' in response.get_json()
+
+
+@pytest.mark.parametrize('path', ['/D8TAVu/warmer/status', '/warmer/status'])
+def test_warmer_status_requires_auth(client, path):
+    assert client.get(path).status_code == 401
+    # No watchlist is configured in the tests
+    assert client.get(path, headers=AUTH).status_code == 404
+
+
+def test_chunked_upload_protocol(client):
+    data = b'chunked upload ' * 1000
+    response = client.post('/D8TAVu/share/uploads', headers=AUTH, json={
+        'filename': 'chunked.bin', 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest()})
+    assert response.status_code == 201
+    url = f"/D8TAVu/share/uploads/{response.get_json()['upload_id']}"
+
+    assert client.put(f'{url}?offset=0', data=data[:6000], headers=AUTH).get_json()['offset'] == 6000
+    # A retried chunk is a conflict that tells the client where to continue
+    response = client.put(f'{url}?offset=0', data=data[:6000], headers=AUTH)
+    assert response.status_code == 409 and response.get_json()['offset'] == 6000
+    response = client.put(f'{url}?offset=6000', data=data[6000:7000], headers=dict(AUTH, **{'X-Chunk-SHA256': '0' * 64}))
+    assert response.status_code == 400
+
+    offset = client.get(url, headers=AUTH).get_json()['offset']
+    assert offset == 6000
+    client.put(f'{url}?offset={offset}', data=data[offset:], headers=AUTH)
+    response = client.post(f'{url}/finalize', headers=AUTH)
+    assert response.status_code == 200 and response.get_json()['size'] == len(data)
+    assert client.get(url, headers=AUTH).status_code == 404
+
+
+def test_chunked_upload_outside_the_share_is_rejected(client):
+    response = client.post('/D8TAVu/share/uploads', headers=AUTH,
+                           json={'path': '../..', 'filename': 'escape.bin', 'size': 10})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('size', ['abc', None, -1, 1.5, [10], True])
+def test_chunked_upload_size_is_validated(client, size):
+    response = client.post('/D8TAVu/share/uploads', headers=AUTH, json={'filename': 'sized.bin', 'size': size})
+    assert response.status_code == 400
+    error = response.get_json()['error']
+    assert 'size' in error and 'literal' not in error
+
+
+def test_chunk_offset_is_validated(client):
+    upload_id = client.post('/D8TAVu/share/uploads', headers=AUTH,
+                            json={'filename': 'offset.bin', 'size': 10}).get_json()['upload_id']
+    response = client.put(f'/D8TAVu/share/uploads/{upload_id}?offset=abc', data=b'x', headers=AUTH)
+    assert response.status_code == 400 and response.get_json()['error'] == 'Invalid offset: must be a whole number of bytes'
+    client.delete(f'/D8TAVu/share/uploads/{upload_id}', headers=AUTH)
+
+
+@pytest.mark.parametrize('path', ['/D8TAVu/stock-chart', '/D8TAVu/stock-chart/compare'])
+@pytest.mark.parametrize('field', ['width', 'height', 'dpi'])
+def test_non_numeric_image_options_are_a_bad_request(client, path, field):
+    query = dict(CHART if path.endswith('stock-chart') else COMPARE, **{field: 'abc'})
+    response = client.get(path, query_string=query, headers=AUTH)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == f'Invalid {field} option: must be a whole number'
+
+
+def test_non_numeric_ma_period_is_a_bad_request(client):
+    response = client.post('/D8TAVu/stock-data', json=dict(CHART, showMA=True, maPeriod='x'), headers=AUTH)
+    assert response.status_code == 400
+    assert 'maPeriod' in response.get_json()['error']
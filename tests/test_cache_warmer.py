@@ -0,0 +1,43 @@
+import os
+import json
+import datetime
+
+import pytest
+
+from cache_warmer import Preset, WarmerConfig
+
+EXAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'warmer.example.json')
+TODAY = datetime.date(2026, 3, 2)
+
+
+def ui_size(container_width, device_pixel_ratio):
+    """The chart size static/js/stockForm.js asks for"""
+    width = round(container_width * device_pixel_ratio)
+    return width, round(width * 2 / 3)
+
+
+def test_example_presets_use_the_sizes_the_front_end_requests():
+    config = WarmerConfig.load(EXAMPLE)
+    bodies = config.requests('AAPL', TODAY)
+    assert len(bodies) == 2 * len(config.presets)
+    assert {(body['width'], body['height']) for body in bodies} == {ui_size(800, 1), ui_size(800, 2)}
+
+
+def test_preset_sizes_override_the_default_sizes():
+    config = WarmerConfig(['AAPL'], [datetime.time(9)], [
+        Preset('sized', 30, {'width': 640, 'height': 427}),
+        Preset('default', 30, {'plotType': 'line'}),
+    ], sizes=[(800, 533), (1600, 1067)])
+    bodies = config.requests('AAPL', TODAY)
+    assert [(body['width'], body['height']) for body in bodies] == [(640, 427), (800, 533), (1600, 1067)]
+    assert all(body['startDate'] == '2026-01-31' and body['endDate'] == '2026-03-02' for body in bodies)
+
+
+def test_invalid_sizes_are_rejected(tmp_path):
+    with open(EXAMPLE) as f:
+        raw = json.load(f)
+    raw['sizes'] = [[800]]
+    path = tmp_path / 'warmer.json'
+    path.write_text(json.dumps(raw))
+    with pytest.raises(ValueError):
+        WarmerConfig.load(str(path))
@@ -0,0 +1,69 @@
+import os
+import time
+import threading
+
+import pytest
+
+from chart_renderer import RenderPool, RendererBusy, RenderTimeout
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return str(os.getpid()).encode()
+
+
+@pytest.fixture
+def pool():
+    pool = RenderPool(workers=2, max_queue=2, timeout=2.0)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def test_render_runs_in_worker_processes(pool):
+    assert pool.render(_sleep, 0) != str(os.getpid()).encode()
+
+
+def test_timeout_replaces_the_pool_and_kills_the_stuck_worker(pool):
+    pool.timeout = 0.5
+    stuck = pool._executor
+    workers = list(stuck._processes.values())
+    with pytest.raises(RenderTimeout):
+        pool.render(_sleep, 60)
+    assert pool._executor is not stuck
+    for process in workers:
+        process.join(timeout=5)
+        assert not process.is_alive()
+
+    # The new pool renders, and every slot of the killed job was released
+    pool.timeout = 30
+    for _ in range(4):
+        assert pool.render(_sleep, 0)
+    assert all(pool._slots.acquire(blocking=False) for _ in range(4))
+
+
+def test_jobs_on_a_replaced_pool_are_told_to_retry(pool):
+    pool.timeout = 1.0
+    errors = []
+
+    def neighbour():
+        time.sleep(0.3)
+        try:
+            pool.render(_sleep, 5)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=neighbour)
+    thread.start()
+    with pytest.raises(RenderTimeout):
+        pool.render(_sleep, 60)
+    thread.join(timeout=10)
+    # The neighbour's worker was killed with the pool before its own timeout
+    assert len(errors) == 1 and isinstance(errors[0], RendererBusy)
+
+
+def test_full_queue_is_rejected():
+    pool = RenderPool(workers=0, max_queue=0)
+    pool._slots.acquire()
+    with pytest.raises(RendererBusy):
+        pool.render(_sleep, 0)
@@ -0,0 +1,170 @@
+import io
+import os
+import time
+import hashlib
+import threading
+
+import pytest
+
+from chunked_upload import ChunkedUploads, UploadConflict
+from file_manager import FileManager
+
+DATA = bytes(range(256)) * 64
+
+
+@pytest.fixture
+def share(tmp_path):
+    root = tmp_path / 'share'
+    (root / 'docs').mkdir(parents=True)
+    return root
+
+
+def uploads_for(share, tmp_path, **options):
+    return ChunkedUploads(FileManager(str(share)), str(tmp_path / 'uploads'), **options)
+
+
+@pytest.fixture
+def uploads(share, tmp_path):
+    return uploads_for(share, tmp_path)
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_chunks_are_appended_and_committed(uploads, share):
+    status = uploads.init('docs/data.bin', len(DATA), sha256(DATA))
+    upload_id = status['upload_id']
+    assert status['offset'] == 0
+    uploads.write_chunk(upload_id, 0, io.BytesIO(DATA[:5000]), sha256=sha256(DATA[:5000]))
+    assert uploads.write_chunk(upload_id, 5000, io.BytesIO(DATA[5000:]))['offset'] == len(DATA)
+    result = uploads.finalize(upload_id)
+    assert result == {'path': 'docs/data.bin', 'size': len(DATA), 'sha256': sha256(DATA)}
+    assert (share / 'docs' / 'data.bin').read_bytes() == DATA
+    assert os.listdir(uploads.state_dir) == [] and os.listdir(share / 'docs') == ['data.bin']
+
+
+def test_chunk_at_the_wrong_offset_is_a_conflict(uploads):
+    upload_id = uploads.init('docs/data.bin', len(DATA))['upload_id']
+    uploads.write_chunk(upload_id, 0, io.BytesIO(DATA[:100]))
+    # A retried chunk that already arrived is rejected, not appended twice
+    with pytest.raises(UploadConflict) as error:
+        uploads.write_chunk(upload_id, 0, io.BytesIO(DATA[:100]))
+    assert error.value.offset == 100
+    assert uploads.status(upload_id)['offset'] == 100
+
+
+def test_chunk_checksum_mismatch_truncates_the_chunk(uploads):
+    upload_id = uploads.init('docs/data.bin', len(DATA))['upload_id']
+    uploads.write_chunk(upload_id, 0, io.BytesIO(DATA[:100]))
+    with pytest.raises(ValueError, match='checksum'):
+        uploads.write_chunk(upload_id, 100, io.BytesIO(DATA[100:200]), sha256=sha256(b'other'))
+    assert uploads.status(upload_id)['offset'] == 100
+    uploads.write_chunk(upload_id, 100, io.BytesIO(DATA[100:200]), sha256=sha256(DATA[100:200]))
+    assert uploads.status(upload_id)['offset'] == 200
+
+
+def test_upload_resumes_from_the_status_offset(uploads, share, tmp_path):
+    upload_id = uploads.init('docs/data.bin', len(DATA))['upload_id']
+    uploads.write_chunk(upload_id, 0, io.BytesIO(DATA[:3000]))
+    # Another worker (or a restarted one) picks the upload up from its state file
+    resumed = uploads_for(share, tmp_path)
+    offset = resumed.status(upload_id)['offset']
+    assert offset == 3000
+    resumed.write_chunk(upload_id, offset, io.BytesIO(DATA[offset:]))
+    assert resumed.finalize(upload_id)['sha256'] == sha256(DATA)
+
+
+def test_chunk_past_the_declared_size_is_rejected(uploads):
+    upload_id = uploads.init('docs/data.bin', 10)['upload_id']
+    with pytest.raises(ValueError):
+        uploads.write_chunk(upload_id, 0, io.BytesIO(b'x' * 11))
+    assert uploads.status(upload_id)['offset'] == 0
+
+
+def test_finalize_verifies_the_whole_file(uploads, share):
+    upload_id = uploads.init('docs/data.bin', len(DATA), sha256(b'other'))['upload_id']
+    uploads.write_chunk(upload_id, 0, io.BytesIO(DATA))
+    with pytest.raises(ValueError, match='Checksum mismatch'):
+        uploads.finalize(upload_id)
+    # The upload is discarded and nothing reaches the target
+    with pytest.raises(KeyError):
+        uploads.status(upload_id)
+    assert os.listdir(share / 'docs') == []
+
+
+def test_finalize_of_an_incomplete_upload_is_rejected(uploads):
+    upload_id = uploads.init('docs/data.bin', len(DATA))['upload_id']
+    uploads.write_chunk(upload_id, 0, io.BytesIO(DATA[:10]))
+    with pytest.raises(ValueError, match='incomplete'):
+        uploads.finalize(upload_id, sha256(DATA))
+
+
+@pytest.mark.parametrize('path', ['../escape.bin', 'docs/../../escape.bin', '/etc/passwd'])
+def test_init_rejects_paths_outside_the_share(uploads, share, path):
+    with pytest.raises(ValueError):
+        uploads.init(path, 10)
+    assert not (share.parent / 'escape.bin').exists()
+
+
+def test_invalid_upload_ids_are_rejected(uploads):
+    with pytest.raises(ValueError):
+        uploads.status('../../etc')
+    with pytest.raises(KeyError):
+        uploads.status('0' * 32)
+
+
+class SlowStream:
+    """A chunk body that arrives only after `release` is set"""
+
+    def __init__(self, data, started, release):
+        self.data = io.BytesIO(data)
+        self.started, self.release = started, release
+
+    def read(self, size):
+        self.started.set()
+        self.release.wait(5)
+        return self.data.read(size)
+
+
+def test_retried_chunk_on_another_worker_is_not_appended_twice(share, tmp_path):
+    # Two instances share only the state directory, like two worker processes
+    first, second = uploads_for(share, tmp_path), uploads_for(share, tmp_path)
+    upload_id = first.init('docs/data.bin', len(DATA))['upload_id']
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def put(uploads, stream):
+        try:
+            results.append(uploads.write_chunk(upload_id, 0, stream)['offset'])
+        except UploadConflict as e:
+            results.append(e)
+
+    slow = threading.Thread(target=put, args=(first, SlowStream(DATA[:100], started, release)))
+    slow.start()
+    started.wait(5)
+    retry = threading.Thread(target=put, args=(second, io.BytesIO(DATA[:100])))
+    retry.start()
+    time.sleep(0.2)
+    release.set()
+    slow.join(5)
+    retry.join(5)
+    assert results[0] == 100 and isinstance(results[1], UploadConflict)
+    assert first.status(upload_id)['offset'] == 100
+
+
+def test_expired_uploads_and_their_locks_are_removed(share, tmp_path, monkeypatch):
+    uploads = uploads_for(share, tmp_path, ttl_seconds=60)
+    stale = uploads.init('docs/old.bin', 10)['upload_id']
+    uploads.write_chunk(stale, 0, io.BytesIO(b'12345'))
+    fresh = uploads.init('docs/new.bin', 10)['upload_id']
+    later = time.time() + 120
+    uploads.write_chunk(fresh, 0, io.BytesIO(b'12345'))
+    state = uploads._load(fresh)
+    state['updated'] = later
+    uploads._save(state)
+
+    monkeypatch.setattr('chunked_upload.time.time', lambda: later)
+    assert uploads.cleanup() == 1
+    assert sorted(os.listdir(uploads.state_dir)) == [f'{fresh}.json', f'{fresh}.lock']
+    assert os.listdir(share / 'docs') == [f'.new.bin.{fresh}.part']
@@ -0,0 +1,135 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import dataset_store
+from dataset_store import DatasetStore
+from file_manager import FileManager
+
+
+def write_csv(path, dates, closes):
+    pd.DataFrame({'Date': dates, 'Close': closes, 'Volume': range(len(closes))}).to_csv(path, index=False)
+
+
+@pytest.fixture
+def share(tmp_path):
+    root = tmp_path / 'share'
+    root.mkdir()
+    dates = pd.bdate_range('2020-01-01', '2020-12-31')
+    write_csv(root / 'prices.csv', dates.strftime('%Y-%m-%d'), np.arange(len(dates), dtype=float))
+    return root, dates
+
+
+@pytest.fixture
+def store(tmp_path, share):
+    root, _ = share
+    return DatasetStore(FileManager(str(root)), str(tmp_path / 'datasets'))
+
+
+def cache_dirs(store):
+    return sorted(name for name in os.listdir(store.cache_dir) if not name.endswith('.lock'))
+
+
+def test_csv_is_converted_once_and_read_from_the_columnar_copy(store, share):
+    _, dates = share
+    hist = store.get_history('prices.csv', '2020-01-01', '2021-01-01')
+    assert list(hist.index) == list(dates)
+    assert hist['Close'].tolist() == list(range(len(dates)))
+    # Columns the file does not have are filled in
+    assert hist['Open'].tolist() == hist['Close'].tolist() and (hist['Dividends'] == 0).all()
+    store.get_history('prices.csv', '2020-03-01', '2020-04-01')
+    assert store.conversions == 1
+    assert len(cache_dirs(store)) == 1
+
+
+def test_date_range_is_sliced_half_open(store, share):
+    _, dates = share
+    hist = store.get_history('prices.csv', '2020-03-02', '2020-03-09')
+    assert [ts.strftime('%Y-%m-%d') for ts in hist.index] == [
+        '2020-03-02', '2020-03-03', '2020-03-04', '2020-03-05', '2020-03-06']
+    assert hist['Close'].tolist() == [float(dates.get_loc(ts)) for ts in hist.index]
+    assert store.get_history('prices.csv', '2021-01-01', '2021-02-01').empty
+
+
+def test_changed_file_is_converted_again_and_the_old_copy_dropped(store, share):
+    root, _ = share
+    store.get_history('prices.csv', '2020-01-01', '2021-01-01')
+    old = cache_dirs(store)
+    write_csv(root / 'prices.csv', ['2020-01-02', '2020-01-03'], [7.0, 8.0])
+    st = os.stat(root / 'prices.csv')
+    os.utime(root / 'prices.csv', ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    hist = store.get_history('prices.csv', '2020-01-01', '2021-01-01')
+    assert hist['Close'].tolist() == [7.0, 8.0]
+    assert store.conversions == 2
+    assert len(cache_dirs(store)) == 1 and cache_dirs(store) != old
+
+
+def test_unsorted_rows_are_sorted_across_chunks(store, share, monkeypatch):
+    root, dates = share
+    order = np.random.default_rng(0).permutation(len(dates))
+    write_csv(root / 'shuffled.csv', dates[order].strftime('%Y-%m-%d'), order.astype(float))
+    monkeypatch.setattr(dataset_store, 'CSV_CHUNK_ROWS', 50)
+    hist = store.get_history('shuffled.csv', '2020-01-01', '2021-01-01')
+    assert list(hist.index) == list(dates)
+    assert hist['Close'].tolist() == list(range(len(dates)))
+
+
+def test_rows_with_bad_dates_are_skipped(store, share):
+    root, _ = share
+    write_csv(root / 'messy.csv', ['2020-01-02', 'n/a', '2020-01-06'], [1.0, 2.0, 3.0])
+    hist = store.get_history('messy.csv', '2020-01-01', '2021-01-01')
+    assert hist['Close'].tolist() == [1.0, 3.0]
+
+
+def test_cleanup_keeps_conversions_in_progress(store, share):
+    root, _ = share
+    path = str(root / 'prices.csv')
+    prefix = os.path.basename(store._cache_path(path, os.stat(path))).split('-')[0]
+    in_progress = os.path.join(store.cache_dir, f'{prefix}-1-2-v1.123.456.tmp')
+    os.makedirs(in_progress)
+    store.get_history('prices.csv', '2020-01-01', '2021-01-01')
+    assert os.path.isdir(in_progress)
+
+
+def test_copy_finished_by_another_worker_is_used(store, share):
+    root, _ = share
+    path = str(root / 'prices.csv')
+    st = os.stat(path)
+    convert = store._convert_csv
+
+    def raced(source, out_dir):
+        # Another worker renames its finished copy into place first
+        convert(source, store._cache_path(path, st))
+        convert(source, out_dir)
+
+    store._convert_csv = raced
+    assert store._ensure_converted(path, st) == store._cache_path(path, st)
+    assert not any(name.endswith('.tmp') for name in os.listdir(store.cache_dir))
+    assert len(store.get_history('prices.csv', '2020-01-01', '2021-01-01')) == 262
+
+
+def test_workers_convert_a_file_once(tmp_path, share):
+    root, _ = share
+    # Separate stores stand in for worker processes: they share only the cache directory
+    stores = [DatasetStore(FileManager(str(root)), str(tmp_path / 'datasets')) for _ in range(4)]
+    results = []
+    threads = [threading.Thread(target=lambda s=s: results.append(s.get_history('prices.csv', '2020-01-01', '2021-01-01')))
+               for s in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 4 and all(len(hist) == 262 for hist in results)
+    assert sum(s.conversions for s in stores) == 1
+
+
+def test_unsupported_or_outside_paths_are_rejected(store):
+    with pytest.raises(ValueError):
+        store.get_history('notes.txt', '2020-01-01', '2021-01-01')
+    with pytest.raises(ValueError):
+        store.get_history('../prices.csv', '2020-01-01', '2021-01-01')
+    with pytest.raises(ValueError):
+        store.get_history('missing.csv', '2020-01-01', '2021-01-01')
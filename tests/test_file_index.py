@@ -0,0 +1,70 @@
+import os
+import time
+
+import pytest
+
+import file_index
+from file_index import FileIndex
+
+
+@pytest.fixture
+def share(tmp_path):
+    root = tmp_path / 'share'
+    (root / 'docs').mkdir(parents=True)
+    (root / 'docs' / 'report.pdf').write_bytes(b'x' * 100)
+    (root / 'notes.txt').write_bytes(b'x' * 10)
+    return root
+
+
+def test_refresh_indexes_names_and_folder_sizes(share, tmp_path):
+    index = FileIndex(str(share), str(tmp_path / 'index.db'), interval=0)
+    assert index.last_refresh is None
+    index.refresh()
+    assert [r['path'] for r in index.search('report')] == ['docs/report.pdf']
+    assert index.folder_stats(['docs', '']) == {'docs': (100, 1), '': (110, 2)}
+
+
+def test_refresh_is_visible_to_every_process(share, tmp_path):
+    db_path = str(tmp_path / 'index.db')
+    first, second = FileIndex(str(share), db_path, interval=0), FileIndex(str(share), db_path, interval=0)
+    first.refresh()
+    assert second.last_refresh == first.last_refresh
+    assert second.stats()['last_scanned'] == 2
+
+
+def test_each_interval_is_claimed_once(share, tmp_path):
+    db_path = str(tmp_path / 'index.db')
+    indexes = [FileIndex(str(share), db_path, interval=60) for _ in range(3)]
+    assert [index._claim(100) for index in indexes] == [True, False, False]
+    assert indexes[1]._claim(101)
+
+
+def test_old_claims_are_removed(share, tmp_path):
+    index = FileIndex(str(share), str(tmp_path / 'index.db'), interval=60)
+    index._claim(1)
+    index._claim(2 + file_index.CLAIM_RETENTION_INTERVALS)
+    assert sorted(os.listdir(index.claim_dir)) == [f'refresh-{2 + file_index.CLAIM_RETENTION_INTERVALS}.claim']
+
+
+def test_background_threads_share_the_refreshes(share, tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'index.db')
+    refreshes = []
+    original = FileIndex.refresh
+
+    def counting(self, full=False):
+        refreshes.append(self)
+        return original(self, full)
+
+    monkeypatch.setattr(FileIndex, 'refresh', counting)
+    interval = 0.2
+    indexes = [FileIndex(str(share), db_path, interval=interval) for _ in range(4)]
+    started = time.time()
+    for index in indexes:
+        index.start()
+    time.sleep(1.0)
+    for index in indexes:
+        index.stop()
+    intervals = int(time.time() // interval) - int(started // interval) + 1
+    # One refresh per interval between all of them, not one per index
+    assert 1 <= len(refreshes) <= intervals
+    assert indexes[0].last_refresh is not None
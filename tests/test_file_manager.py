@@ -0,0 +1,173 @@
+import os
+
+import pytest
+from flask import Flask
+
+import file_serving
+from file_manager import FileManager
+from file_serving import file_etag, parse_ranges, send_ranged_file
+
+CONTENT = bytes(range(256)) * 4
+
+
+@pytest.fixture
+def share(tmp_path):
+    root = tmp_path / 'share'
+    outside = tmp_path / 'outside'
+    (root / 'docs').mkdir(parents=True)
+    outside.mkdir()
+    (root / 'docs' / 'report.txt').write_text('report')
+    (root / 'readme.txt').write_text('readme')
+    (outside / 'secret.txt').write_text('secret')
+    return root, outside
+
+
+def walked(manager, path=''):
+    return {rel: is_dir for _, rel, _, is_dir in manager.walk(path)}
+
+
+def test_walk_lists_the_tree(share):
+    root, _ = share
+    assert walked(FileManager(str(root))) == {
+        'docs': True, 'docs/report.txt': False, 'readme.txt': False}
+
+
+def test_walk_skips_file_symlinks_outside_the_root(share):
+    root, outside = share
+    os.symlink(outside / 'secret.txt', root / 'docs' / 'secret.txt')
+    entries = list(FileManager(str(root)).walk())
+    assert 'docs/secret.txt' not in {rel for _, rel, _, _ in entries}
+    assert all(not physical.startswith(str(outside)) for physical, _, _, _ in entries)
+
+
+def test_walk_keeps_file_symlinks_inside_the_root(share):
+    root, _ = share
+    os.symlink(root / 'readme.txt', root / 'docs' / 'readme-link.txt')
+    assert walked(FileManager(str(root)))['docs/readme-link.txt'] is False
+
+
+def test_walk_does_not_follow_directory_symlinks(share):
+    root, outside = share
+    os.symlink(outside, root / 'linked')
+    os.symlink(root / 'docs', root / 'loop')
+    assert set(walked(FileManager(str(root)))) == {'docs', 'docs/report.txt', 'readme.txt'}
+
+
+def test_walk_rejects_paths_outside_the_root(share):
+    root, _ = share
+    with pytest.raises(ValueError):
+        list(FileManager(str(root)).walk('../outside'))
+
+
+@pytest.fixture
+def download(tmp_path):
+    """Test client of an app serving one 1024-byte file through send_ranged_file"""
+    path = tmp_path / 'data.bin'
+    path.write_bytes(CONTENT)
+    app = Flask(__name__)
+    app.add_url_rule('/data.bin', 'data', lambda: send_ranged_file(str(path), 'application/octet-stream'))
+    return app.test_client(), path
+
+
+def test_parse_ranges_suffix_and_open_ended():
+    assert parse_ranges('bytes=-100', 1024) == [(924, 1024)]
+    assert parse_ranges('bytes=-5000', 1024) == [(0, 1024)]
+    assert parse_ranges('bytes=1000-', 1024) == [(1000, 1024)]
+    assert parse_ranges('bytes=1000-5000', 1024) == [(1000, 1024)]
+
+
+def test_parse_ranges_merges_overlapping_and_adjacent():
+    assert parse_ranges('bytes=500-599, 0-99,50-149,150-199', 1024) == [(0, 200), (500, 600)]
+    assert parse_ranges('bytes=-24,0-9,1000-', 1024) == [(0, 10), (1000, 1024)]
+
+
+def test_parse_ranges_serves_the_whole_file_for_bad_or_too_many_ranges():
+    assert parse_ranges(None, 1024) is None
+    assert parse_ranges('items=0-9', 1024) is None
+    assert parse_ranges('bytes=abc', 1024) is None
+    assert parse_ranges('bytes=-', 1024) is None
+    assert parse_ranges('bytes=9-0', 1024) is None
+    many = ','.join(f'{i * 10}-{i * 10 + 1}' for i in range(file_serving.MAX_RANGES + 1))
+    assert parse_ranges(f'bytes={many}', 1024) is None
+    most = ','.join(f'{i * 10}-{i * 10 + 1}' for i in range(file_serving.MAX_RANGES))
+    assert len(parse_ranges(f'bytes={most}', 1024)) == file_serving.MAX_RANGES
+
+
+def test_parse_ranges_unsatisfiable():
+    assert parse_ranges('bytes=2000-3000', 1024) == []
+    assert parse_ranges('bytes=-0', 1024) == []
+
+
+def test_whole_file_without_range(download):
+    client, _ = download
+    response = client.get('/data.bin')
+    assert response.status_code == 200
+    assert response.data == CONTENT and response.content_length == len(CONTENT)
+    assert response.headers['Accept-Ranges'] == 'bytes'
+
+
+def test_single_range(download):
+    client, _ = download
+    response = client.get('/data.bin', headers={'Range': 'bytes=-100'})
+    assert response.status_code == 206
+    assert response.data == CONTENT[-100:] and response.content_length == 100
+    assert response.headers['Content-Range'] == 'bytes 924-1023/1024'
+
+
+def test_multiple_ranges_are_sent_as_multipart_byteranges(download):
+    client, _ = download
+    response = client.get('/data.bin', headers={'Range': 'bytes=900-,0-9,5-19'})
+    assert response.status_code == 206
+    mimetype, boundary = response.headers['Content-Type'].split('; boundary=')
+    assert mimetype == 'multipart/byteranges'
+    body = response.data
+    assert response.content_length == len(body) == int(response.headers['Content-Length'])
+
+    parts = body.split(f'--{boundary}'.encode())
+    assert parts[0] == b'' and parts[-1] == b'--\r\n'
+    found = []
+    for part in parts[1:-1]:
+        head, data = part.strip(b'\r\n').split(b'\r\n\r\n', 1)
+        lines = head.decode().split('\r\n')
+        assert 'Content-Type: application/octet-stream' in lines
+        content_range = next(line for line in lines if line.startswith('Content-Range: '))
+        found.append((content_range[len('Content-Range: '):], data))
+    # Overlapping ranges are merged and the parts come in file order
+    assert found == [('bytes 0-19/1024', CONTENT[:20]), ('bytes 900-1023/1024', CONTENT[900:])]
+
+
+def test_unsatisfiable_range_is_416(download):
+    client, _ = download
+    response = client.get('/data.bin', headers={'Range': 'bytes=5000-'})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == 'bytes */1024'
+
+
+def test_if_range_with_a_stale_etag_sends_the_whole_file(download):
+    client, path = download
+    etag = f'"{file_etag(os.stat(path))}"'
+    response = client.get('/data.bin', headers={'Range': 'bytes=0-9', 'If-Range': '"stale"'})
+    assert response.status_code == 200 and response.data == CONTENT
+    response = client.get('/data.bin', headers={'Range': 'bytes=0-9', 'If-Range': etag})
+    assert response.status_code == 206 and response.data == CONTENT[:10]
+
+
+def test_if_range_with_a_date(download):
+    client, _ = download
+    last_modified = client.get('/data.bin').headers['Last-Modified']
+    response = client.get('/data.bin', headers={'Range': 'bytes=0-9', 'If-Range': last_modified})
+    assert response.status_code == 206
+    response = client.get('/data.bin', headers={'Range': 'bytes=0-9', 'If-Range': 'Thu, 01 Jan 1998 00:00:00 GMT'})
+    assert response.status_code == 200
+
+
+def test_if_none_match_is_304(download):
+    client, path = download
+    etag = client.get('/data.bin').headers['ETag']
+    response = client.get('/data.bin', headers={'If-None-Match': etag, 'Range': 'bytes=0-9'})
+    assert response.status_code == 304 and response.data == b''
+    assert response.headers['ETag'] == etag
+    # A changed file no longer matches
+    path.write_bytes(CONTENT[::-1])
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1_000_000_000))
+    assert client.get('/data.bin', headers={'If-None-Match': etag}).status_code == 200
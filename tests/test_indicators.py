@@ -0,0 +1,46 @@
+import datetime
+import threading
+
+import pandas as pd
+import pytest
+
+from indicators import Indicator, IndicatorEngine, parse_indicators
+from synthetic import SyntheticSource
+
+HIST = SyntheticSource().fetch('AAA', datetime.date(2020, 1, 1), datetime.date(2021, 1, 1))
+SPECS = 'sma:20,ema:9,bb:20:2,rsi,macd,vwap'
+
+
+def test_indicator_subclasses_must_implement_update():
+    class Incomplete(Indicator):
+        name = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_incremental_update_matches_full_computation():
+    engine = IndicatorEngine()
+    indicators = parse_indicators(SPECS)
+    engine.apply('AAA', HIST.iloc[:200], indicators)
+    incremental = engine.apply('AAA', HIST, indicators)
+    full = IndicatorEngine().apply('AAA', HIST, indicators)
+    assert engine.incremental_updates == len(indicators)
+    pd.testing.assert_frame_equal(incremental, full)
+
+
+def test_counters_are_exact_under_concurrency():
+    engine = IndicatorEngine()
+    indicators = parse_indicators(SPECS)
+    rounds, threads = 10, 4
+
+    def work():
+        for i in range(rounds):
+            engine.apply('AAA', HIST.iloc[:150 + i], indicators)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert engine.incremental_updates + engine.full_computations == rounds * threads * len(indicators)
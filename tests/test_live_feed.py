@@ -0,0 +1,214 @@
+import json
+import time
+
+import pandas as pd
+import pytest
+
+from indicators import parse_indicators
+from live_feed import LiveHub, LiveHubFull, ReplayFeed, format_event, parse_intraday_interval
+from price_store import UpstreamUnavailable
+
+# Feed seconds per real second: one-minute bars close every 0.1 s
+SPEED = 600
+
+
+def parse(message):
+    """(event, data) of one Server-Sent Events message"""
+    fields = dict(line.split(': ', 1) for line in message.strip().split('\n'))
+    return fields['event'], json.loads(fields['data'])
+
+
+def drain(subscription, timeout=0.0):
+    events = []
+    message = subscription.next(timeout)
+    while message is not None:
+        events.append(parse(message))
+        message = subscription.next(0)
+    return events
+
+
+def bar_times(events):
+    return [t for _, data in events if 'bars' in data for t in data['bars']['timestamp']]
+
+
+class FlakyFeed(ReplayFeed):
+    """ReplayFeed whose polls can be made to fail"""
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.down = False
+
+    def fetch_intraday(self, ticker, interval, start):
+        if self.down:
+            raise UpstreamUnavailable('feed is down', retry_after=0)
+        return super().fetch_intraday(ticker, interval, start)
+
+
+@pytest.fixture
+def feed():
+    return ReplayFeed(speed=SPEED)
+
+
+@pytest.fixture
+def hub(feed):
+    hub = LiveHub(feed, max_subscribers=16, max_bars=50, settle=0.0, max_queue=100)
+    yield hub
+    for poller in list(hub._pollers.values()):
+        poller.stop()
+
+
+def test_parse_intraday_interval():
+    assert parse_intraday_interval(None) == '1m'
+    assert parse_intraday_interval(' 5M ') == '5m'
+    with pytest.raises(ValueError):
+        parse_intraday_interval('1d')
+
+
+def test_format_event():
+    assert format_event('bars', {'a': 1}, 60) == 'id: 60\nevent: bars\ndata: {"a":1}\n\n'
+    assert format_event('status', {'stale': True}) == 'event: status\ndata: {"stale":true}\n\n'
+
+
+def test_replay_feed_is_deterministic():
+    start = pd.Timestamp('2026-01-05 14:00', tz='UTC')
+    now = start + pd.Timedelta(hours=2)
+    first = ReplayFeed(start=now).fetch_intraday('AAA', '5m', start)
+    second = ReplayFeed(start=now).fetch_intraday('aaa', '5m', start)
+    pd.testing.assert_frame_equal(first, second)
+    assert len(first) == 25
+    assert (first.index[1:] - first.index[:-1] == pd.Timedelta(minutes=5)).all()
+
+
+def test_one_poller_per_ticker_and_interval(hub, feed):
+    subs = [hub.subscribe('AAA', '1m', []) for _ in range(5)]
+    subs += [hub.subscribe('aaa', '1m', parse_indicators('sma:5')) for _ in range(3)]
+    subs.append(hub.subscribe('BBB', '1m', []))
+    subs.append(hub.subscribe('AAA', '5m', []))
+    stats = hub.stats()
+    assert stats['pollers'] == 3 and stats['subscribers'] == 10
+    # One initial load per poller, however many subscribers share it
+    assert stats['polls'] == 3 and feed.fetches == 3
+
+
+def test_snapshot_then_new_bars_fan_out_to_every_subscriber(hub, feed):
+    subs = [hub.subscribe('AAA', '1m', []) for _ in range(4)]
+    time.sleep(6 * 60 / SPEED)
+    histories = []
+    for subscription in subs:
+        events = drain(subscription)
+        assert events[0][0] == 'snapshot'
+        assert events[0][1]['bars']['timestamp']
+        assert any(event == 'bars' for event, _ in events[1:])
+        times = bar_times(events)
+        # One bar a minute, none missed or repeated
+        assert all(b - a == 60 for a, b in zip(times, times[1:]))
+        histories.append(times)
+    assert all(times[-1] == histories[0][-1] for times in histories)
+    # Polls follow the bars, not the number of subscribers
+    feed_minutes = (feed.now() - feed.origin).total_seconds() / 60
+    assert hub.stats()['polls'] <= feed_minutes + 2
+
+
+def test_events_are_encoded_once_per_indicator_set(hub):
+    plain = [hub.subscribe('AAA', '1m', []) for _ in range(3)]
+    with_sma = [hub.subscribe('AAA', '1m', parse_indicators('sma:5')) for _ in range(3)]
+    time.sleep(4 * 60 / SPEED)
+    stats = hub.stats()
+    bar_events = [event for event, _ in drain(plain[0]) if event == 'bars']
+    assert bar_events
+    # Each published bar event is encoded for two indicator sets, not for six subscribers
+    assert stats['events'] <= 2 * (len(bar_events) + 1)
+
+    sma_columns = list(parse_indicators('sma:5')[0].outputs().values())
+    snapshot = drain(with_sma[0])[0][1]
+    assert snapshot['indicators'][0]['key'] == 'sma:5'
+    assert all(column in snapshot['bars'] for column in sma_columns)
+    assert not any(column in parse(plain[1].next(0))[1]['bars'] for column in sma_columns)
+
+
+def test_reconnect_resumes_after_last_event_id(hub):
+    first = hub.subscribe('AAA', '1m', [])
+    times = bar_times(drain(first))
+    since = times[-5]
+    resumed = hub.subscribe('AAA', '1m', [], since=since)
+    event, data = drain(resumed)[0]
+    assert event == 'snapshot'
+    assert data['bars']['timestamp'] == times[-4:]
+
+
+def test_unsubscribe_stops_the_poller_when_the_last_subscriber_leaves(hub):
+    subs = [hub.subscribe('AAA', '1m', parse_indicators('sma:5')) for _ in range(2)]
+    other = hub.subscribe('AAA', '1m', parse_indicators('rsi'))
+    poller = hub._pollers[('AAA', '1m')]
+    assert set(poller.indicators) == {'sma:5', 'rsi:14'}
+
+    # Indicators nobody watches any more stop being updated
+    hub.unsubscribe(other)
+    assert set(poller.indicators) == {'sma:5'}
+    assert poller.subscribers == subs
+
+    hub.unsubscribe(subs[0])
+    assert hub.stats()['pollers'] == 1
+    hub.unsubscribe(subs[1])
+    assert hub.stats()['pollers'] == 0 and hub.stats()['subscribers'] == 0
+    poller._thread.join(timeout=5)
+    assert not poller._thread.is_alive()
+
+    # A new subscriber gets a fresh poller
+    hub.subscribe('AAA', '1m', [])
+    assert hub._pollers[('AAA', '1m')] is not poller
+
+
+def test_subscriber_limit(feed):
+    hub = LiveHub(feed, max_subscribers=2, settle=0.0)
+    subs = [hub.subscribe('AAA', '1m', []), hub.subscribe('BBB', '1m', [])]
+    with pytest.raises(LiveHubFull):
+        hub.subscribe('AAA', '1m', [])
+    hub.unsubscribe(subs[0])
+    subs.append(hub.subscribe('AAA', '1m', []))
+    for subscription in subs[1:]:
+        hub.unsubscribe(subscription)
+    assert hub.stats()['pollers'] == 0
+
+
+def test_slow_subscriber_is_dropped(feed):
+    hub = LiveHub(feed, max_subscribers=4, settle=0.0, max_queue=2)
+    slow = hub.subscribe('AAA', '1m', [])
+    fast = hub.subscribe('AAA', '1m', [])
+    received = []
+    deadline = time.monotonic() + 5 * 60 / SPEED
+    while time.monotonic() < deadline:
+        message = fast.next(0.01)
+        if message is not None:
+            received.append(message)
+    assert slow.dropped and not fast.dropped
+    assert hub.stats()['dropped'] == 1
+    assert slow not in hub._pollers[('AAA', '1m')].subscribers
+    hub.unsubscribe(slow)
+    hub.unsubscribe(fast)
+    assert hub.stats()['pollers'] == 0
+
+
+def test_failed_first_load_releases_the_slot():
+    feed = FlakyFeed(speed=SPEED)
+    feed.down = True
+    hub = LiveHub(feed, max_subscribers=4, settle=0.0)
+    with pytest.raises(UpstreamUnavailable):
+        hub.subscribe('AAA', '1m', [])
+    assert hub.stats()['pollers'] == 0 and hub.stats()['subscribers'] == 0
+
+
+def test_outage_and_recovery_are_reported():
+    feed = FlakyFeed(speed=SPEED)
+    hub = LiveHub(feed, max_subscribers=4, settle=0.0, max_queue=100)
+    subscription = hub.subscribe('AAA', '1m', [])
+    drain(subscription)
+    feed.down = True
+    time.sleep(3 * 60 / SPEED)
+    feed.down = False
+    time.sleep(3 * 60 / SPEED)
+    events = drain(subscription)
+    statuses = [data['stale'] for event, data in events if event == 'status']
+    assert statuses == [True, False]
+    assert any(event == 'bars' for event, _ in events)
+    hub.unsubscribe(subscription)
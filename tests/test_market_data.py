@@ -0,0 +1,223 @@
+import time
+import datetime
+import threading
+
+import pandas as pd
+import pytest
+
+import market_data
+from live_feed import INTRADAY_COLUMNS
+from market_data import MarketDataClient, TokenBucket, default_session, parse_chart
+from price_store import BAR_COLUMNS, UpstreamUnavailable
+from synthetic import SyntheticSource
+from upstream_standin import StandInState, make_server
+
+START, END = datetime.date(2020, 1, 1), datetime.date(2020, 4, 1)
+
+
+@pytest.fixture
+def standin():
+    state = StandInState()
+    server = make_server('127.0.0.1', 0, state, SyntheticSource())
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield state, f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff sleeps instead of sleeping, with the jitter pinned to its upper bound"""
+    recorded = []
+    monkeypatch.setattr(market_data.random, 'uniform', lambda low, high: high)
+    monkeypatch.setattr(market_data.time, 'sleep', recorded.append)
+    return recorded
+
+
+def client_for(url, **options):
+    settings = dict(rate=100, burst=20, retries=3, timeout=5, backoff=0.05, max_backoff=0.2, cooldown=60)
+    settings.update(options)
+    return MarketDataClient(url, **settings)
+
+
+def test_fetch_parses_daily_bars(standin):
+    state, url = standin
+    hist = client_for(url).fetch('AAA', START, END)
+    expected = SyntheticSource().fetch('AAA', START, END)
+    assert list(hist.columns) == BAR_COLUMNS
+    assert [ts.date() for ts in hist.index] == [ts.date() for ts in expected.index]
+    assert hist['Close'].tolist() == pytest.approx(expected['Close'].tolist(), abs=1e-4)
+    assert state.requests == 1
+
+
+def test_parse_chart_keeps_unadjusted_prices_and_events():
+    day = 86400
+    first = int(pd.Timestamp('2020-03-02 14:30', tz='UTC').timestamp())
+    payload = {'chart': {'result': [{
+        'meta': {'exchangeTimezoneName': 'America/New_York'},
+        'timestamp': [first, first + day, first + 2 * day],
+        'indicators': {
+            'quote': [{'open': [10.0, 11.0, 12.0], 'high': [11.0, 12.0, 13.0], 'low': [9.0, 10.0, 11.0],
+                       'close': [10.5, 11.5, None], 'volume': [100, None, 300]}],
+            'adjclose': [{'adjclose': [9.5, 11.5, None]}],
+        },
+        'events': {
+            'dividends': {str(first + day): {'amount': 0.25, 'date': first + day}},
+            'splits': {str(first): {'numerator': 3, 'denominator': 2, 'date': first}},
+        },
+    }], 'error': None}}
+    hist = parse_chart(payload)
+    assert list(hist.columns) == BAR_COLUMNS
+    assert [ts.strftime('%Y-%m-%d') for ts in hist.index] == ['2020-03-02', '2020-03-03']
+    # The adjusted close is ignored; a day without a close is dropped
+    assert hist['Close'].tolist() == [10.5, 11.5]
+    assert hist['Open'].tolist() == [10.0, 11.0]
+    assert hist['Volume'].tolist() == [100, 0]
+    assert hist['Dividends'].tolist() == [0.0, 0.25]
+    assert hist['Stock Splits'].tolist() == [1.5, 0.0]
+
+
+def test_fetch_intraday_parses_minute_bars(standin):
+    _, url = standin
+    start = pd.Timestamp.now(tz='UTC').floor('60s') - pd.Timedelta(minutes=30)
+    hist = client_for(url).fetch_intraday('AAA', '1m', start)
+    assert list(hist.columns) == INTRADAY_COLUMNS
+    assert 25 <= len(hist) <= 32
+    assert hist.index.min() >= start
+
+
+def test_failed_requests_are_retried_with_exponential_backoff(standin, sleeps):
+    state, url = standin
+    state.fail_next = 3
+    client = client_for(url, max_backoff=1.0)
+    assert not client.fetch('AAA', START, END).empty
+    assert state.requests == 4
+    assert client.stats()['retried'] == 3 and client.stats()['failures'] == 0
+    assert sleeps == pytest.approx([0.05, 0.1, 0.2])
+
+
+def test_backoff_is_capped(standin, sleeps):
+    state, url = standin
+    state.fail_next = 3
+    client_for(url, backoff=0.1, max_backoff=0.25).fetch('AAA', START, END)
+    assert sleeps == pytest.approx([0.1, 0.2, 0.25])
+
+
+def test_throttled_requests_honour_retry_after(standin, sleeps):
+    state, url = standin
+    state.status, state.fail_next = 429, 1
+    client_for(url, max_backoff=5).fetch('AAA', START, END)
+    # The stand-in asks for Retry-After: 1, longer than the backoff
+    assert sleeps == [1.0]
+
+
+def test_retry_after_is_capped_by_max_backoff(sleeps):
+    client = client_for('http://unused')
+    assert client._delay(0, '3600') == client.max_backoff
+    assert client._delay(1, 'soon') == pytest.approx(0.1)
+
+
+def test_exhausted_retries_start_a_cooldown(standin, sleeps):
+    state, url = standin
+    state.down = True
+    client = client_for(url, retries=2, cooldown=60)
+    with pytest.raises(UpstreamUnavailable) as error:
+        client.fetch('AAA', START, END)
+    assert error.value.retry_after == 60
+    assert state.requests == 3
+    assert client.stats()['failures'] == 1 and not client.stats()['available']
+
+    # During the cooldown requests fail fast, without reaching upstream
+    state.down = False
+    with pytest.raises(UpstreamUnavailable):
+        client.fetch('BBB', START, END)
+    assert state.requests == 3
+
+
+def test_requests_resume_after_the_cooldown(standin):
+    state, url = standin
+    state.down = True
+    client = client_for(url, retries=0, cooldown=0.2)
+    with pytest.raises(UpstreamUnavailable):
+        client.fetch('AAA', START, END)
+    state.down = False
+    time.sleep(0.25)
+    assert client.stats()['available']
+    assert not client.fetch('AAA', START, END).empty
+
+
+def test_other_errors_are_not_retried(standin, sleeps):
+    state, url = standin
+    state.status, state.down = 401, True
+    client = client_for(url)
+    with pytest.raises(UpstreamUnavailable):
+        client.fetch('AAA', START, END)
+    assert state.requests == 1 and sleeps == []
+
+
+def test_unknown_ticker_is_empty_not_a_failure(standin):
+    state, url = standin
+    state.status, state.fail_next = 404, 1
+    client = client_for(url)
+    hist = client.fetch('NOPE', START, END)
+    assert hist.empty and list(hist.columns) == BAR_COLUMNS
+    assert client.stats()['failures'] == 0 and client.stats()['available']
+
+
+def test_connection_errors_are_retried(sleeps):
+    client = client_for('http://127.0.0.1:9', retries=2, timeout=1)
+    with pytest.raises(UpstreamUnavailable):
+        client.fetch('AAA', START, END)
+    assert client.stats()['requests'] == 3 and client.stats()['retried'] == 2
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    bucket = TokenBucket(rate=20, burst=3)
+    started = time.monotonic()
+    assert all(bucket.acquire(0) for _ in range(3))
+    assert time.monotonic() - started < 0.02
+    assert not bucket.acquire(0)
+    assert bucket.acquire(1)
+    assert time.monotonic() - started >= 0.04
+
+
+def test_rate_limit_rejects_without_reaching_upstream(standin):
+    state, url = standin
+    # The timeout bounds the token wait (a token takes 5 s) and the HTTP request alike
+    client = client_for(url, rate=0.2, burst=1, timeout=1)
+    client.fetch('AAA', START, END)
+    with pytest.raises(UpstreamUnavailable):
+        client.fetch('BBB', START, END)
+    assert state.requests == 1
+    assert client.stats()['throttled'] == 1
+
+
+def test_concurrent_requests_are_capped(standin):
+    state, url = standin
+    state.latency = 0.05
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    class CountingSession:
+        def __init__(self):
+            self.session = default_session()
+
+        def get(self, *args, **kwargs):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            try:
+                return self.session.get(*args, **kwargs)
+            finally:
+                with lock:
+                    in_flight[0] -= 1
+
+    client = client_for(url, max_concurrency=2, session_factory=CountingSession)
+    threads = [threading.Thread(target=client.fetch, args=(f'T{i}', START, END)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert state.requests == 8
+    assert peak[0] == 2
@@ -0,0 +1,237 @@
+import time
+import datetime
+
+import pandas as pd
+import pytest
+
+from price_store import PriceStore, UpstreamUnavailable, merge_ranges, subtract_ranges
+from resample import period_bounds, resample_bars
+from synthetic import SyntheticSource
+
+D = datetime.date
+
+
+class RecordingSource(SyntheticSource):
+    """SyntheticSource that records the ranges asked for and can be taken down"""
+
+    def __init__(self):
+        super().__init__()
+        self.ranges = []
+        self.down = False
+
+    def fetch(self, ticker, start, end):
+        if self.down:
+            raise UpstreamUnavailable('upstream is down')
+        self.ranges.append((ticker, start, end))
+        return super().fetch(ticker, start, end)
+
+
+class EmptySource(RecordingSource):
+    def fetch(self, ticker, start, end):
+        super().fetch(ticker, start, end)
+        return pd.DataFrame()
+
+
+class EventSource(RecordingSource):
+    """RecordingSource with a 2:1 split and a dividend, reported by upstream once `now` reaches them"""
+
+    SPLIT, DIVIDEND = D(2020, 4, 15), D(2020, 5, 1)
+
+    def __init__(self):
+        super().__init__()
+        self.now = D(2020, 4, 1)
+
+    def fetch(self, ticker, start, end):
+        hist = super().fetch(ticker, start, end).copy()
+        if self.now >= self.SPLIT:
+            # Upstream reports the whole history on the post-split scale
+            hist[['Open', 'High', 'Low', 'Close']] /= 2
+            hist.loc[hist.index == pd.Timestamp(self.SPLIT), 'Stock Splits'] = 2.0
+        if self.now >= self.DIVIDEND:
+            hist.loc[hist.index == pd.Timestamp(self.DIVIDEND), 'Dividends'] = 1.0
+        return hist
+
+
+@pytest.fixture
+def source():
+    return RecordingSource()
+
+
+@pytest.fixture
+def store(tmp_path, source):
+    return PriceStore(str(tmp_path / 'prices.db'), source)
+
+
+def test_subtract_ranges():
+    covered = [(D(2020, 2, 1), D(2020, 3, 1)), (D(2020, 4, 1), D(2020, 5, 1))]
+    assert subtract_ranges(D(2020, 1, 1), D(2020, 6, 1), covered) == [
+        (D(2020, 1, 1), D(2020, 2, 1)), (D(2020, 3, 1), D(2020, 4, 1)), (D(2020, 5, 1), D(2020, 6, 1))]
+    assert subtract_ranges(D(2020, 2, 10), D(2020, 2, 20), covered) == []
+    assert subtract_ranges(D(2020, 2, 10), D(2020, 3, 10), covered) == [(D(2020, 3, 1), D(2020, 3, 10))]
+
+
+def test_merge_ranges_joins_overlapping_and_touching():
+    assert merge_ranges([(D(2020, 3, 1), D(2020, 4, 1)), (D(2020, 1, 1), D(2020, 2, 1)),
+                         (D(2020, 2, 1), D(2020, 2, 15)), (D(2020, 3, 15), D(2020, 5, 1))]) == [
+        (D(2020, 1, 1), D(2020, 2, 15)), (D(2020, 3, 1), D(2020, 5, 1))]
+
+
+def test_cached_range_is_not_fetched_again(store, source):
+    first = store.get_history('aapl', '2020-01-01', '2020-07-01')
+    again = store.get_history('AAPL', '2020-02-01', '2020-03-01')
+    assert source.ranges == [('AAPL', D(2020, 1, 1), D(2020, 7, 1))]
+    expected = source.fetch('AAPL', D(2020, 2, 1), D(2020, 3, 1))
+    pd.testing.assert_frame_equal(again, first.loc['2020-02-01':'2020-02-29'], check_freq=False)
+    assert list(again.index) == list(expected.index)
+    assert again['Close'].tolist() == pytest.approx(expected['Close'].tolist())
+
+
+def test_only_gaps_are_fetched_and_coverage_merges(store, source):
+    store.get_history('AAPL', '2020-03-01', '2020-04-01')
+    store.get_history('AAPL', '2020-06-01', '2020-07-01')
+    assert store.missing_ranges('AAPL', '2020-01-01', '2020-08-01') == [
+        (D(2020, 1, 1), D(2020, 3, 1)), (D(2020, 4, 1), D(2020, 6, 1)), (D(2020, 7, 1), D(2020, 8, 1))]
+
+    source.ranges.clear()
+    hist = store.get_history('AAPL', '2020-01-01', '2020-08-01')
+    assert source.ranges == [('AAPL', D(2020, 1, 1), D(2020, 3, 1)), ('AAPL', D(2020, 4, 1), D(2020, 6, 1)),
+                             ('AAPL', D(2020, 7, 1), D(2020, 8, 1))]
+    assert store.covered_ranges('AAPL') == [(D(2020, 1, 1), D(2020, 8, 1))]
+    assert len(hist) == len(source.fetch('AAPL', D(2020, 1, 1), D(2020, 8, 1)))
+    assert hist.index.is_monotonic_increasing and hist.index.is_unique
+    assert store.stats()['upstream_calls'] == 5
+
+
+def test_stale_bars_are_served_when_upstream_is_down(store, source):
+    store.get_history('AAPL', '2020-01-01', '2020-02-01')
+    source.down = True
+    hist = store.get_history('AAPL', '2020-01-01', '2020-03-01')
+    assert hist.attrs.get('stale') is True
+    assert hist.index.max() < pd.Timestamp('2020-02-01')
+    assert store.stats()['stale_served'] == 1
+    with pytest.raises(UpstreamUnavailable):
+        store.get_history('MSFT', '2020-01-01', '2020-02-01')
+
+
+def test_empty_answer_for_unknown_ticker_is_not_cached(tmp_path):
+    source = EmptySource()
+    store = PriceStore(str(tmp_path / 'prices.db'), source)
+    assert store.get_history('NOPE', '2020-01-01', '2020-02-01').empty
+    assert store.covered_ranges('NOPE') == []
+    store.get_history('NOPE', '2020-01-01', '2020-02-01')
+    assert len(source.ranges) == 2
+
+
+def test_todays_bar_is_never_covered_and_reused_for_tail_ttl(tmp_path, source):
+    today = datetime.date.today()
+    start, end = today - datetime.timedelta(days=30), today + datetime.timedelta(days=1)
+    store = PriceStore(str(tmp_path / 'prices.db'), source, tail_ttl=60)
+    store.get_history('AAPL', start, end)
+    assert store.covered_ranges('AAPL') == [(start, today)]
+
+    store.get_history('AAPL', start, end)
+    assert len(source.ranges) == 1
+    assert store.stats()['tail_reused'] == 1
+
+    # Without a TTL every request reaching today asks upstream for it again
+    uncached = PriceStore(str(tmp_path / 'prices.db'), source)
+    uncached.get_history('AAPL', start, end)
+    assert source.ranges[-1] == ('AAPL', today, end)
+
+
+def test_tail_ttl_expires(tmp_path, source, monkeypatch):
+    today = datetime.date.today()
+    start, end = today - datetime.timedelta(days=30), today + datetime.timedelta(days=1)
+    store = PriceStore(str(tmp_path / 'prices.db'), source, tail_ttl=60)
+    store.get_history('AAPL', start, end)
+    later = time.time() + 61
+    monkeypatch.setattr('price_store.time.time', lambda: later)
+    store.get_history('AAPL', start, end)
+    assert source.ranges[-1] == ('AAPL', today, end)
+    assert store.stats()['tail_reused'] == 0
+
+
+@pytest.mark.parametrize('interval', ['weekly', 'monthly', 'quarterly'])
+def test_rollups_match_resampled_daily_bars(store, source, interval):
+    rolled = store.get_history('AAPL', '2019-01-01', '2021-01-01', interval)
+    # Rolled-up bars cover whole periods, so the first and last may reach past the range
+    start, end = period_bounds(D(2019, 1, 1), D(2021, 1, 1), interval)
+    expected = resample_bars(store.get_history('AAPL', start, end), interval)
+    assert list(rolled.index) == list(expected.index)
+    for column in ('Open', 'High', 'Low', 'Close', 'Volume'):
+        assert rolled[column].tolist() == pytest.approx(expected[column].astype(float).tolist())
+
+
+def test_rollups_are_updated_by_later_fetches(store, source):
+    store.get_history('AAPL', '2020-01-01', '2020-03-18')
+    partial = store.get_history('AAPL', '2020-01-01', '2020-03-10', 'monthly')
+    # Monthly bars cover whole months, so that read fetched the rest of March
+    assert store.covered_ranges('AAPL') == [(D(2020, 1, 1), D(2020, 4, 1))]
+    assert len(partial) == 3
+    # Daily fetches after the rollups exist update the months they touch
+    store.get_history('AAPL', '2020-01-01', '2020-07-01')
+    rolled = store.get_history('AAPL', '2020-01-01', '2020-07-01', 'monthly')
+    daily = source.fetch('AAPL', D(2020, 1, 1), D(2020, 7, 1))
+    expected = resample_bars(daily, 'monthly')
+    assert list(rolled.index) == list(expected.index)
+    assert rolled['Close'].tolist() == pytest.approx(expected['Close'].tolist())
+    assert rolled['High'].tolist() == pytest.approx(expected['High'].tolist())
+
+
+def test_invalidate_drops_cached_bars(store, source):
+    store.get_history('AAPL', '2020-01-01', '2020-02-01', 'weekly')
+    store.get_history('MSFT', '2020-01-01', '2020-02-01')
+    store.invalidate('aapl')
+    assert store.covered_ranges('AAPL') == []
+    assert store.covered_ranges('MSFT') != []
+    source.ranges.clear()
+    store.get_history('AAPL', '2020-01-01', '2020-02-01')
+    assert len(source.ranges) == 1
+
+
+def test_new_split_in_a_refetched_range_drops_bars_on_the_old_scale(tmp_path):
+    source = EventSource()
+    store = PriceStore(str(tmp_path / 'prices.db'), source)
+    store.get_history('AAPL', '2020-01-01', '2020-04-01', 'monthly')
+    source.now = EventSource.SPLIT
+    source.ranges.clear()
+    hist = store.get_history('AAPL', '2020-01-01', '2020-07-01')
+    # The gap held the split, so the bars cached before it were fetched again on the new scale
+    assert source.ranges == [('AAPL', D(2020, 4, 1), D(2020, 7, 1)), ('AAPL', D(2020, 1, 1), D(2020, 4, 1))]
+    expected = source.fetch('AAPL', D(2020, 1, 1), D(2020, 7, 1))
+    assert hist['Close'].tolist() == pytest.approx(expected['Close'].tolist())
+    assert store.covered_ranges('AAPL') == [(D(2020, 1, 1), D(2020, 7, 1))]
+    monthly = store.get_history('AAPL', '2020-01-01', '2020-07-01', 'monthly')
+    assert monthly['Close'].tolist() == pytest.approx(resample_bars(expected, 'monthly')['Close'].tolist())
+
+    # The split is cached now: later fetches around it drop nothing
+    source.ranges.clear()
+    store.get_history('AAPL', '2020-01-01', '2020-08-01')
+    assert source.ranges == [('AAPL', D(2020, 7, 1), D(2020, 8, 1))]
+
+
+def test_bars_are_stored_unadjusted_and_adjusted_for_later_dividends_on_read(tmp_path):
+    source = EventSource()
+    source.now = EventSource.SPLIT
+    store = PriceStore(str(tmp_path / 'prices.db'), source)
+    # The cached range holds the split, so the dividend is the only new event
+    before = store.get_history('AAPL', '2020-01-01', '2020-04-20')
+    store.get_history('AAPL', '2020-01-01', '2020-04-20', 'monthly')
+    source.now = EventSource.DIVIDEND
+    source.ranges.clear()
+    hist = store.get_history('AAPL', '2020-01-01', '2020-07-01')
+    assert source.ranges == [('AAPL', D(2020, 5, 1), D(2020, 7, 1))]
+
+    raw = source.fetch('AAPL', D(2020, 1, 1), D(2020, 7, 1))
+    ex_date = pd.Timestamp(EventSource.DIVIDEND)
+    factor = 1 - 1.0 / raw.loc[raw.index < ex_date, 'Close'].iloc[-1]
+    expected = raw['Close'].where(raw.index >= ex_date, raw['Close'] * factor)
+    assert hist['Close'].tolist() == pytest.approx(expected.tolist())
+    # Bars cached before the dividend was paid are adjusted for it without a refetch
+    assert hist.loc[:'2020-04-19', 'Close'].tolist() == pytest.approx((before['Close'] * factor).tolist())
+    assert hist.loc['2020-05-01', 'Dividends'] == 1.0
+
+    # Rollups built before the dividend are rebuilt with it
+    monthly = store.get_history('AAPL', '2020-01-01', '2020-07-01', 'monthly')
+    adjusted = raw.assign(Close=expected)
+    assert monthly['Close'].tolist() == pytest.approx(resample_bars(adjusted, 'monthly')['Close'].tolist())
@@ -0,0 +1,230 @@
+import os
+import io
+import csv
+import hashlib
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from xml.sax.saxutils import escape
+
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Bump to invalidate every cached thumbnail after a rendering change
+THUMBNAIL_VERSION = 1
+# Longest edge of generated thumbnails, in pixels
+THUMBNAIL_SIZE = 256
+# CSV previews read at most this much of the file
+CSV_PREVIEW_BYTES = 64 * 1024
+CSV_PREVIEW_ROWS = 12
+CSV_PREVIEW_COLUMNS = 6
+
+IMAGE_TYPES = frozenset({'image/jpeg', 'image/png', 'image/gif', 'image/bmp', 'image/webp', 'image/tiff'})
+PDF_TYPES = frozenset({'application/pdf'})
+CSV_TYPES = frozenset({'text/csv'})
+
+
+def _pillow_available() -> bool:
+    try:
+        import PIL  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _pdf_renderer() -> Optional[str]:
+    """Name of the optional PDF rasterizer that is installed, if any"""
+    for module in ('pypdfium2', 'fitz'):
+        try:
+            __import__(module)
+            return module
+        except ImportError:
+            continue
+    return None
+
+
+def thumbnail_key(rel_path: str, st: os.stat_result) -> str:
+    """Content address of a thumbnail: changes whenever the file's path, mtime or size changes"""
+    source = f'{rel_path}|{st.st_mtime_ns}|{st.st_size}|{THUMBNAIL_SIZE}|{THUMBNAIL_VERSION}'
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def _image_thumbnail(image) -> Tuple[bytes, str]:
+    from PIL import Image, ImageOps
+
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE), Image.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, format='WEBP', quality=80, method=4)
+    return buffer.getvalue(), 'image/webp'
+
+
+def render_image(path: str) -> Tuple[bytes, str]:
+    from PIL import Image
+
+    with Image.open(path) as image:
+        # JPEG decoders can scale down while decoding, which is much faster for large photos
+        image.draft('RGB', (THUMBNAIL_SIZE * 2, THUMBNAIL_SIZE * 2))
+        image.load()
+        return _image_thumbnail(image)
+
+
+def render_pdf(path: str) -> Tuple[bytes, str]:
+    """First page of a PDF, through pypdfium2 or PyMuPDF"""
+    from PIL import Image
+
+    renderer = _pdf_renderer()
+    if renderer == 'pypdfium2':
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(path)
+        try:
+            page = pdf[0]
+            width, height = page.get_size()
+            image = page.render(scale=THUMBNAIL_SIZE / max(width, height, 1)).to_pil()
+        finally:
+            pdf.close()
+    elif renderer == 'fitz':
+        import fitz
+        with fitz.open(path) as pdf:
+            page = pdf[0]
+            scale = THUMBNAIL_SIZE / max(page.rect.width, page.rect.height, 1)
+            pixmap = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
+            image = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+    else:
+        raise ValueError('No PDF renderer installed')
+    return _image_thumbnail(image)
+
+
+def render_csv(path: str) -> Tuple[bytes, str]:
+    """The first rows and columns of a CSV file as a small SVG table"""
+    with open(path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        head = f.read(CSV_PREVIEW_BYTES)
+    lines = head.splitlines()
+    if len(head) == CSV_PREVIEW_BYTES and lines:
+        lines = lines[:-1]  # the last line may be cut off
+    try:
+        dialect = csv.Sniffer().sniff(head[:4096], delimiters=',;\t|')
+    except csv.Error:
+        dialect = csv.excel
+    rows = [row[:CSV_PREVIEW_COLUMNS] for _, row in zip(range(CSV_PREVIEW_ROWS), csv.reader(lines, dialect))]
+
+    line_height = THUMBNAIL_SIZE // (CSV_PREVIEW_ROWS + 1)
+    column_width = THUMBNAIL_SIZE // CSV_PREVIEW_COLUMNS
+    max_chars = max(column_width // 6, 3)
+    text = []
+    for i, row in enumerate(rows):
+        y = (i + 1) * line_height
+        weight = ' font-weight="bold"' if i == 0 else ''
+        for j, cell in enumerate(row):
+            cell = cell.strip()
+            if len(cell) > max_chars:
+                cell = cell[:max_chars - 1] + '…'
+            text.append(f'<text x="{j * column_width + 3}" y="{y}"{weight}>{escape(cell)}</text>')
+    svg = (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{THUMBNAIL_SIZE}" height="{THUMBNAIL_SIZE}" '
+        f'font-family="monospace" font-size="{line_height - 5}">'
+        f'<rect width="100%" height="100%" fill="#fff" stroke="#dee2e6"/>'
+        f'<rect width="100%" height="{line_height + 3}" fill="#e9ecef"/>'
+        + ''.join(text) + '</svg>')
+    return svg.encode('utf-8'), 'image/svg+xml'
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir: str, workers: int = 2, timeout: float = 20.0):
+        """
+        Initialize ThumbnailCache
+        :param cache_dir: Directory holding generated thumbnails, addressed by thumbnail_key
+        :param workers: Size of the thread pool that renders thumbnails
+        :param timeout: Seconds a request waits for a thumbnail to be rendered
+        """
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+        self._flight = SingleFlight('thumbnail')
+        self.hits = 0
+        self.renders = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self._renderers = {}
+        if _pillow_available():
+            self._renderers.update(dict.fromkeys(IMAGE_TYPES, render_image))
+            if _pdf_renderer():
+                self._renderers.update(dict.fromkeys(PDF_TYPES, render_pdf))
+        self._renderers.update(dict.fromkeys(CSV_TYPES, render_csv))
+        logger.info(f'ThumbnailCache initialized with cache_dir: {cache_dir}, '
+                    f'types: {sorted(self._renderers)}')
+
+    def _renderer(self, name: str, mime_type: Optional[str]):
+        # Windows maps .csv to an Excel MIME type, so CSV is also recognised by extension
+        if name.lower().endswith('.csv'):
+            return render_csv
+        return self._renderers.get(mime_type)
+
+    def supports(self, name: str, mime_type: Optional[str]) -> bool:
+        """Whether a thumbnail can be generated for this file on this server"""
+        return self._renderer(name, mime_type) is not None
+
+    def _paths(self, key: str) -> Tuple[str, str]:
+        base = os.path.join(self.cache_dir, key[:2], key)
+        return base, base + '.type'
+
+    def _read(self, key: str) -> Optional[Tuple[bytes, str]]:
+        data_path, type_path = self._paths(key)
+        try:
+            with open(type_path) as f:
+                content_type = f.read()
+            with open(data_path, 'rb') as f:
+                return f.read(), content_type
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, data: bytes, content_type: str) -> None:
+        data_path, type_path = self._paths(key)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        suffix = f'.{os.getpid()}.{threading.get_ident()}.tmp'
+        for path, content, mode in ((data_path, data, 'wb'), (type_path, content_type, 'w')):
+            with open(path + suffix, mode) as f:
+                f.write(content)
+            os.replace(path + suffix, path)
+
+    def get(self, rel_path: str, path: str, st: os.stat_result, mime_type: str) -> Tuple[bytes, str, str]:
+        """
+        Return a thumbnail, rendering it in the worker pool on a cache miss
+        :return: (image bytes, content type, cache key)
+        :raises ValueError: If the type is not supported or the file cannot be rendered
+        """
+        renderer = self._renderer(rel_path, mime_type)
+        if renderer is None:
+            raise ValueError(f'No preview available for {mime_type}')
+        key = thumbnail_key(rel_path, st)
+        cached = self._read(key)
+        if cached is not None:
+            with self._lock:
+                self.hits += 1
+            return cached + (key,)
+
+        def render():
+            cached = self._read(key)
+            if cached is not None:
+                return cached
+            try:
+                data, content_type = self._executor.submit(renderer, path).result(timeout=self.timeout)
+            except ValueError:
+                raise
+            except Exception as e:
+                logger.warning(f'Cannot render thumbnail for {rel_path}: {str(e)}')
+                raise ValueError('Preview could not be generated')
+            self._write(key, data, content_type)
+            with self._lock:
+                self.renders += 1
+            return data, content_type
+        return self._flight.do(key, render) + (key,)
+
+    def stats(self) -> dict:
+        """Cache hits and renders since startup"""
+        return {'hits': self.hits, 'renders': self.renders, **self._flight.stats()}
@@ -0,0 +1,10 @@
+"""
+WSGI entry point for Linux pre-fork servers:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+IIS/wfastcgi keeps using app.app (see web.config).
+"""
+from app import app
+
+application = app
@@ -0,0 +1,95 @@
+import os
+import io
+import time
+import zipfile
+import logging
+from typing import Iterable, Iterator, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Source read size; also the most data buffered before it is handed to the client
+BUFFER_SIZE = 1024 * 1024
+
+# Formats that are already compressed; deflating them again costs CPU for no gain
+STORED_EXTENSIONS = frozenset({
+    'zip', '7z', 'rar', 'gz', 'tgz', 'bz2', 'xz', 'zst', 'lz4',
+    'jpg', 'jpeg', 'png', 'gif', 'webp', 'heic', 'avif',
+    'mp3', 'aac', 'm4a', 'ogg', 'opus', 'flac',
+    'mp4', 'm4v', 'mov', 'mkv', 'avi', 'webm', 'wmv',
+    'docx', 'xlsx', 'pptx', 'odt', 'ods', 'odp', 'epub', 'jar', 'apk',
+    'pdf', 'parquet',
+})
+
+# ZIP timestamps cannot represent dates before 1980
+_MIN_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink; zipfile writes into it and we drain it between reads"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _zip_info(arcname: str, st: os.stat_result, is_dir: bool) -> zipfile.ZipInfo:
+    date_time = max(time.localtime(st.st_mtime)[:6], _MIN_DATE_TIME)
+    info = zipfile.ZipInfo(arcname + ('/' if is_dir else ''), date_time)
+    info.external_attr = (st.st_mode & 0xFFFF) << 16
+    if is_dir:
+        info.external_attr |= 0x10  # MS-DOS directory flag
+    else:
+        ext = os.path.splitext(arcname)[1].lower().lstrip('.')
+        info.compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+        info.file_size = st.st_size
+    return info
+
+
+def stream_zip(entries: Iterable[Tuple[str, str, os.stat_result, bool]]) -> Iterator[bytes]:
+    """
+    Generate a ZIP archive incrementally, holding at most about BUFFER_SIZE in memory
+    :param entries: (physical path, archive name, stat result, is_dir) tuples, e.g. from
+        FileManager.walk; consumed lazily as the archive is produced
+    :return: Iterator of archive byte chunks
+    """
+    sink = _StreamBuffer()
+    # A non-seekable sink makes zipfile write sizes and CRCs in data descriptors after each file
+    with zipfile.ZipFile(sink, mode='w', allowZip64=True) as archive:
+        for path, arcname, st, is_dir in entries:
+            info = _zip_info(arcname, st, is_dir)
+            if is_dir:
+                archive.writestr(info, b'')
+                continue
+            try:
+                source = open(path, 'rb')
+            except OSError as e:
+                logger.warning(f'Skipping unreadable file {path} in ZIP download: {str(e)}')
+                continue
+            # file_size is set from the stat result, so zipfile switches to ZIP64 for large files
+            with source, archive.open(info, mode='w') as target:
+                for block in iter(lambda: source.read(BUFFER_SIZE), b''):
+                    target.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    # Central directory
+    yield sink.drain()